@@ -0,0 +1,372 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from sentiment_engine import ScoringPool, compile_sentiment_dict, collapse_texts, score_unique_parallel, scorer_key
+from vector_kernel import label_scores
+from stream_analysis import StreamingAggregates, analyze_csv_stream, read_spill_preview
+from perf_metrics import current_recorder, activate, deactivate
+from progressive_estimate import ProgressiveEstimate, stratified_order, unit_first_positions
+
+# ==========================================
+# 后台分析任务 + 检查点
+# 评分在后台线程中按块执行，每完成一块就把结果写入本地任务目录（键 = 分析结果键的哈希），
+# 页面只轮询任务进度，刷新页面 / 断线不影响任务；任务表按进程共享，其他会话上传同一文件时直接看到同一个任务
+# 中断（暂停、出错、服务重启）后再次提交同一分析键，从最后一个完成的块继续；已全部完成的任务目录可直接读回结果
+# 完整模式：不重复文本按其在分层随机行顺序中首次出现的先后分块（首块 FIRST_CHUNK_TEXTS 条，逐块翻倍到 JOB_CHUNK_TEXTS），
+#   每块保存得分 / 维度得分 / 命中掩码和分词结果（npz，不含 pickle）；分块顺序不影响结果，只让评分中途可给出渐进式估计
+# 流式模式：逐行结果本来就追加写入任务目录中的 CSV，检查点记录已完成块数、源文件读到的字节偏移、结果文件大小和汇总量
+# ==========================================
+
+DEFAULT_JOB_DIR = Path.home() / '.cache' / 'sentiment-analysis-app' / 'jobs'
+JOB_FORMAT_VERSION = 3
+JOB_CHUNK_TEXTS = 50000
+FIRST_CHUNK_TEXTS = 2000
+MAX_JOB_DIRS = 16
+MANIFEST_NAME = 'manifest.json'
+STREAM_RESULT_NAME = '电商评论情感分析结果.csv'
+
+class JobStopped(Exception):
+    pass
+
+def job_path(key, job_dir=DEFAULT_JOB_DIR):
+    digest = hashlib.blake2b(json.dumps(list(key), ensure_ascii=False).encode('utf-8'), digest_size=16).hexdigest()
+    return Path(job_dir) / digest
+
+def read_manifest(path):
+    try:
+        with open(Path(path) / MANIFEST_NAME, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get('format') == JOB_FORMAT_VERSION else None
+
+def write_manifest(path, manifest):
+    target = Path(path) / MANIFEST_NAME
+    tmp_path = target.with_name(f'{target.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp_path, target)
+
+def prepare_job_dir(path, manifest):
+    # 已有检查点与本次任务口径（数据规模、分块大小等）一致时沿用，否则清空目录重新开始；返回生效的任务描述
+    path = Path(path)
+    saved = read_manifest(path)
+    if saved is not None and all(saved.get(name) == value for name, value in manifest.items()):
+        os.utime(path)
+        return saved
+    if path.exists():
+        shutil.rmtree(path)
+    path.mkdir(parents=True)
+    manifest = {**manifest, 'format': JOB_FORMAT_VERSION}
+    write_manifest(path, manifest)
+    return manifest
+
+def saved_progress(key, job_dir=DEFAULT_JOB_DIR):
+    # 磁盘上该分析键的检查点概况：{'finished', 'done_chunks', 'total_chunks'（流式为 None）, 'rows'}，没有时为 None
+    path = job_path(key, job_dir)
+    manifest = read_manifest(path)
+    if manifest is None:
+        return None
+    if manifest['mode'] == 'full':
+        done = len(list(path.glob('chunk-*.npz')))
+        total = len(chunk_bounds(manifest['unique'], manifest['chunk_texts'])) - 1
+        rows = manifest['rows']
+    else:
+        state = manifest.get('state') or {}
+        done, total = state.get('chunks', 0), None
+        rows = state['aggregates']['rows'] if state else 0
+    return {'finished': manifest.get('finished', False), 'done_chunks': done, 'total_chunks': total, 'rows': rows}
+
+def prune_job_dirs(job_dir=DEFAULT_JOB_DIR, keep=MAX_JOB_DIRS, exclude=()):
+    # 按最近使用时间只保留 keep 个任务目录（正在运行的除外）
+    job_dir = Path(job_dir)
+    if not job_dir.is_dir():
+        return
+    exclude = {Path(path) for path in exclude}
+    dirs = sorted((p for p in job_dir.iterdir() if p.is_dir()), key=lambda p: p.stat().st_mtime, reverse=True)
+    for stale in dirs[keep:]:
+        if stale not in exclude:
+            shutil.rmtree(stale, ignore_errors=True)
+
+# ==========================================
+# 任务与任务表
+# ==========================================
+
+class AnalysisJob:
+    # 状态字段只由任务线程写入，页面线程只读
+    def __init__(self, key, path):
+        self.key = key
+        self.path = Path(path)
+        self.status = 'pending'    # pending / running / done / stopped / failed
+        self.progress = 0.0
+        self.done_chunks = 0
+        self.total_chunks = None
+        self.resumed_chunks = 0    # 从检查点读回、未重新评分的块数
+        self.estimate = None       # 渐进式估计（progressive_estimate.ProgressiveEstimate），未启用时为 None
+        self.error = None
+        self.started_at = time.time()
+        self.finished_at = None
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    @property
+    def running(self):
+        return self.status in ('pending', 'running')
+
+    @property
+    def elapsed(self):
+        return (self.finished_at or time.time()) - self.started_at
+
+    def report(self, done_chunks, total_chunks=None, fraction=0.0):
+        # 已完成 done_chunks 块、当前块完成 fraction；总块数未知（流式）时进度由 set_progress 给出
+        self.done_chunks = done_chunks
+        if total_chunks is not None:
+            self.total_chunks = total_chunks
+            self.progress = min(1.0, (done_chunks + fraction) / max(total_chunks, 1))
+
+    def set_progress(self, fraction):
+        self.progress = min(1.0, fraction)
+
+    def stop(self):
+        # 请求暂停：当前块写完检查点后停止
+        self.stop_event.set()
+
+    def check_stop(self):
+        if self.stop_event.is_set():
+            raise JobStopped()
+
+    def wait(self, timeout=None):
+        if self.thread is not None:
+            self.thread.join(timeout)
+        return self.status
+
+class JobManager:
+    # 进程内共享的任务表：同一分析键同时只有一个任务在运行
+    def __init__(self, job_dir=DEFAULT_JOB_DIR):
+        self.job_dir = Path(job_dir)
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            return self.jobs.get(key)
+
+    def submit(self, key, run, on_done=None, recorder=None):
+        # run(job) 在后台线程中执行并返回结果，随后交给 on_done(结果)；该键已有任务在运行时直接返回它
+        # recorder 为任务线程使用的性能记录器（提交任务的会话的记录器）
+        with self.lock:
+            job = self.jobs.get(key)
+            if job is not None and job.running:
+                return job
+            job = self.jobs[key] = AnalysisJob(key, job_path(key, self.job_dir))
+            running = [other.path for other in self.jobs.values() if other.running]
+        prune_job_dirs(self.job_dir, exclude=running)
+        job.thread = threading.Thread(
+            target=self._run, args=(job, run, on_done, recorder), name=f'analysis-job-{job.path.name[:8]}', daemon=True
+        )
+        job.thread.start()
+        return job
+
+    def _run(self, job, run, on_done, recorder):
+        token = activate(recorder)
+        job.status = 'running'
+        try:
+            result = run(job)
+            if on_done is not None:
+                on_done(result)
+            job.progress = 1.0
+            job.status = 'done'
+        except JobStopped:
+            job.status = 'stopped'
+        except Exception as e:
+            job.error = str(e) or type(e).__name__
+            job.status = 'failed'
+        finally:
+            job.finished_at = time.time()
+            deactivate(token)
+
+# ==========================================
+# 完整模式：按不重复文本分块评分 + 检查点
+# ==========================================
+
+def chunk_bounds(n_unique, chunk_texts=JOB_CHUNK_TEXTS, first=FIRST_CHUNK_TEXTS):
+    # 各块在评分顺序中的起止位置：前几块较小（尽早给出估计），之后每块 chunk_texts 条
+    bounds, size = [0], min(first, chunk_texts)
+    while bounds[-1] < n_unique:
+        bounds.append(min(bounds[-1] + size, n_unique))
+        size = min(size * 2, chunk_texts)
+    return bounds if len(bounds) > 1 else [0, 0]
+
+def chunk_path(path, c):
+    return Path(path) / f'chunk-{c:05d}.npz'
+
+def merge_token_parts(parts):
+    # 把一块内的多份 token_sink 分片合并为一份 (下标, 词表, 词 id, 每条词数)
+    vocab = {}
+    positions, ids, lengths = [], [], []
+    for part_positions, words, local_ids, part_lengths in parts:
+        remap = np.array([vocab.setdefault(word, len(vocab)) for word in words], dtype=np.int32)
+        positions.append(np.asarray(part_positions, dtype=np.int64))
+        ids.append(remap[local_ids] if len(remap) else np.zeros(0, dtype=np.int32))
+        lengths.append(np.asarray(part_lengths, dtype=np.int64))
+    if not parts:
+        return np.zeros(0, dtype=np.int64), [], np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int64)
+    return np.concatenate(positions), list(vocab), np.concatenate(ids), np.concatenate(lengths)
+
+def write_chunk(path, unique_result, tokens, dim_names):
+    scores, _, dims, analysis = unique_result
+    mask = np.array([[dim in item for dim in dim_names] for item in analysis], dtype=bool).reshape(len(analysis), len(dim_names))
+    positions, words, ids, lengths = tokens
+    tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    try:
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, scores=scores, dims=dims, mask=mask, token_positions=positions,
+                     token_words=np.array(words, dtype=str), token_ids=ids, token_lengths=lengths)
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+def read_chunk(path, dim_names):
+    # 还原为与 score_unique_texts 相同结构的结果（标签由得分换算，维度字典由命中掩码和维度得分还原）
+    with np.load(path, allow_pickle=False) as data:
+        scores, dims, mask = data['scores'], data['dims'], data['mask']
+        tokens = (data['token_positions'], data['token_words'].tolist(), data['token_ids'], data['token_lengths'])
+    analysis = [
+        {dim_names[j]: float(dims[k, j]) for j in np.flatnonzero(mask[k])} for k in range(len(scores))
+    ]
+    return (scores, label_scores(scores), dims, analysis), tokens
+
+def score_chunk(chunk, lexicon, workers=None, cache=None, keep_tokens=False, progress=None, pool=None):
+    # 评分一块不重复文本，返回 (结果, 合并后的分词结果)；分词结果的下标相对于本块
+    # pool（ScoringPool）为整个任务共用的进程池，各块不再各自启动 worker
+    index = {key: k for k, key in enumerate(chunk)}
+    token_parts = []
+
+    def score_fn(pending_texts):
+        current_recorder().count('score.scored_texts', len(pending_texts))
+        token_sink = [] if keep_tokens else None
+        result = score_unique_parallel(pending_texts, lexicon, workers=workers, progress=progress, token_sink=token_sink,
+                                       pool=pool)
+        # 缓存命中时 pending_texts 只是本块的一部分，下标换算回本块
+        for positions, *rest in token_sink or ():
+            token_parts.append((np.array([index[pending_texts[p]] for p in positions], dtype=np.int64), *rest))
+        return result
+
+    result = cache.score_through(chunk, score_fn) if cache is not None else score_fn(chunk)
+    return result, merge_token_parts(token_parts)
+
+def score_with_checkpoints(job, texts, sentiment_dict, workers=None, cache=None, token_store=None,
+                           near_duplicates=None, progressive=False, chunk_texts=JOB_CHUNK_TEXTS):
+    # 与 score_collapsed_parallel 返回相同的 (不重复文本的结果, inverse)，结果逐位一致
+    # 任务目录中已有的块直接读回，其余块评分后写入检查点；每块开始前响应暂停请求
+    # 近似重复归并是确定性的，恢复时重新归并得到相同的评分单元，检查点照常可用；token_store 按精确去重的文本构建
+    # progressive 时每块完成后更新 job.estimate（读回的块同样计入）
+    lexicon = compile_sentiment_dict(sentiment_dict)
+    dim_names = lexicon.dimension_names
+    perf = current_recorder()
+    with perf.stage('score.collapse', rows=len(texts)):
+        exact_texts, exact_inverse = collapse_texts(texts)
+    perf.count('score.unique_texts', len(exact_texts))
+    unique_texts, inverse = exact_texts, exact_inverse
+    if near_duplicates is not None:
+        with perf.stage('score.near_duplicates', texts=len(exact_texts)):
+            unique_texts, inverse = near_duplicates.collapse(exact_texts, exact_inverse, lexicon)
+        perf.count('score.near_duplicate_reused', near_duplicates.stats['reused_texts'])
+    n_unique = len(unique_texts)
+    with perf.stage('score.sample_order', rows=len(texts)):
+        order = stratified_order(len(texts))
+        first_positions = unit_first_positions(inverse, order)
+        unit_order = np.argsort(first_positions, kind='stable')
+    bounds = chunk_bounds(n_unique, chunk_texts)
+    n_chunks = len(bounds) - 1
+    estimate = job.estimate = ProgressiveEstimate(inverse, order, dim_names) if progressive else None
+    manifest = prepare_job_dir(job.path, {
+        'key': list(job.key), 'mode': 'full', 'fingerprint': scorer_key(lexicon),
+        'rows': len(texts), 'unique': n_unique, 'chunk_texts': chunk_texts,
+        'near_duplicates': near_duplicates.params() if near_duplicates is not None else None
+    })
+
+    parts = []
+    # 整个任务共用一个进程池（首次需要并行评分时才启动），完成、暂停或出错退出时关闭
+    with ScoringPool(lexicon, workers) as pool:
+        for c in range(n_chunks):
+            units = unit_order[bounds[c]:bounds[c + 1]]
+            chunk = [unique_texts[u] for u in units]
+            path = chunk_path(job.path, c)
+            if path.exists():
+                with perf.stage('job.restore', texts=len(chunk)):
+                    part, tokens = read_chunk(path, dim_names)
+                job.resumed_chunks += 1
+            else:
+                job.check_stop()
+                part, tokens = score_chunk(
+                    chunk, lexicon, workers=workers, cache=cache, keep_tokens=token_store is not None,
+                    progress=lambda fraction: job.report(c, n_chunks, fraction), pool=pool
+                )
+                with perf.stage('job.checkpoint', texts=len(chunk)):
+                    write_chunk(path, part, tokens, dim_names)
+            parts.append(part)
+            if token_store is not None and len(tokens[0]):
+                token_store.collect(unique_texts, [(units[tokens[0]], *tokens[1:])])
+            if estimate is not None and len(units):
+                # 行顺序中下一块首条文本出现之前的行都已评分
+                sampled = int(first_positions[unit_order[bounds[c + 1]]]) if bounds[c + 1] < n_unique else len(texts)
+                with perf.stage('job.estimate', rows=sampled):
+                    estimate.update(units, part, sampled)
+            job.report(c + 1, n_chunks)
+
+    # 各块按评分顺序排列，还原为不重复文本的原顺序
+    restore = np.argsort(unit_order)
+    ordered_analysis = [analysis for part in parts for analysis in part[3]]
+    unique_result = (
+        np.concatenate([part[0] for part in parts])[restore],
+        np.concatenate([part[1] for part in parts])[restore],
+        np.concatenate([part[2] for part in parts])[restore],
+        [ordered_analysis[p] for p in restore]
+    )
+    if token_store is not None:
+        with perf.stage('score.token_store', texts=len(exact_texts)):
+            token_store.finalize(exact_texts, exact_inverse)
+    if not manifest.get('finished'):
+        write_manifest(job.path, {**manifest, 'finished': True})
+    return unique_result, inverse
+
+# ==========================================
+# 流式模式：逐块结果追加写入任务目录，检查点记录在任务描述中
+# ==========================================
+
+def stream_with_checkpoints(job, source, content_col, sentiment_dict, workers=1, cache=None, preview_rows=20):
+    # 返回 (StreamingAggregates, 前 preview_rows 行结果, 逐行结果文件路径)
+    lexicon = compile_sentiment_dict(sentiment_dict)
+    manifest = prepare_job_dir(job.path, {'key': list(job.key), 'mode': 'stream', 'fingerprint': scorer_key(lexicon)})
+    spill_path = job.path / STREAM_RESULT_NAME
+    # 结果文件丢失时检查点失效，从头开始
+    state = manifest.get('state') if spill_path.exists() else None
+    if state is not None and manifest.get('finished'):
+        job.resumed_chunks = job.done_chunks = state['chunks']
+        return StreamingAggregates.from_dict(state['aggregates']), read_spill_preview(spill_path, preview_rows), spill_path
+    if state is not None:
+        job.resumed_chunks = state['chunks']
+
+    def checkpoint(state):
+        manifest['state'] = state
+        write_manifest(job.path, manifest)
+        job.report(state['chunks'])
+        job.check_stop()
+
+    with current_recorder().stage('score.stream') as timer:
+        aggregates, preview = analyze_csv_stream(
+            source, content_col, lexicon, spill_path, workers=workers, progress=job.set_progress,
+            preview_rows=preview_rows, cache=cache, resume=state, checkpoint=checkpoint
+        )
+        timer.add(rows=aggregates.rows)
+    write_manifest(job.path, {**manifest, 'finished': True})
+    return aggregates, preview, spill_path
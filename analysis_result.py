@@ -0,0 +1,209 @@
+import numpy as np
+import pandas as pd
+
+from sentiment_engine import SENTIMENT_LABELS
+
+# ==========================================
+# 紧凑列式分析结果：float32 得分 + 分类标签（int8 编码）+ 稀疏维度得分
+# 维度得分只存命中值，配合每行的存在掩码；读取稠密列时未涉及的维度按 5.0 补齐（与 "{维度}维度得分" 列口径一致）
+# 可与 Arrow 表 / Parquet 文件互转：维度列为可空 float32，validity 位图即存在掩码
+# ==========================================
+
+DIM_DEFAULT = 5.0
+DIM_OFFSET_BLOCK = 4096    # 各维度命中数的前缀和按块记录，取某行在 dim_values 中的位置时只需在块内计数
+LABEL_DTYPE = pd.CategoricalDtype(SENTIMENT_LABELS)
+LABEL_CODES = {label: code for code, label in enumerate(SENTIMENT_LABELS)}
+
+def dimension_column(dim):
+    return f'{dim}维度得分'
+
+class ColumnarResult:
+    def __init__(self, scores, label_codes, dim_names, dim_mask, dim_values):
+        self.scores = np.asarray(scores, dtype=np.float32)
+        self.label_codes = np.asarray(label_codes, dtype=np.int8)
+        self.dim_names = tuple(dim_names)
+        self.dim_mask = np.asarray(dim_mask, dtype=bool).reshape(len(self.scores), len(self.dim_names))
+        self.dim_values = [np.asarray(values, dtype=np.float32) for values in dim_values]
+        self._block_offsets = None
+
+    @classmethod
+    def from_unique(cls, unique_result, inverse, dim_names):
+        # 直接由不重复文本的结果 + inverse 构建，不经过逐行维度字典
+        unique_scores, unique_labels, unique_dims, unique_analysis = unique_result
+        dim_names = tuple(dim_names)
+        inverse = np.asarray(inverse, dtype=np.int64)
+        unique_codes = np.array([LABEL_CODES[label] for label in unique_labels], dtype=np.int8)
+        unique_mask = np.array(
+            [[dim in analysis for dim in dim_names] for analysis in unique_analysis], dtype=bool
+        ).reshape(len(unique_analysis), len(dim_names))
+
+        dim_mask = unique_mask[inverse]
+        dim_values = [
+            unique_dims[inverse[dim_mask[:, j]], j].astype(np.float32)
+            for j in range(len(dim_names))
+        ]
+        return cls(unique_scores.astype(np.float32)[inverse], unique_codes[inverse], dim_names, dim_mask, dim_values)
+
+    def __len__(self):
+        return len(self.scores)
+
+    def readonly(self):
+        # 放入跨会话共享的存储前调用：数组设为只读，误写会直接报错，而不是悄悄改动其他会话看到的结果
+        for array in (self.scores, self.label_codes, self.dim_mask, *self.dim_values):
+            array.flags.writeable = False
+        return self
+
+    @property
+    def nbytes(self):
+        return (self.scores.nbytes + self.label_codes.nbytes + self.dim_mask.nbytes
+                + sum(values.nbytes for values in self.dim_values))
+
+    @property
+    def column_names(self):
+        return ['情感得分', '情感标签'] + [dimension_column(dim) for dim in self.dim_names]
+
+    @property
+    def labels(self):
+        return pd.Categorical.from_codes(self.label_codes, dtype=LABEL_DTYPE)
+
+    def label_counts(self):
+        # 与 value_counts() 相同：只保留出现过的标签，按数量降序
+        counts = pd.Series(np.bincount(self.label_codes, minlength=len(SENTIMENT_LABELS)), index=SENTIMENT_LABELS)
+        return counts[counts > 0].sort_values(ascending=False, kind='stable')
+
+    def label_ratio(self, label):
+        if not len(self):
+            return 0.0
+        return float(np.count_nonzero(self.label_codes == LABEL_CODES[label])) / len(self)
+
+    def mean_score(self):
+        return float(self.scores.mean(dtype=np.float64)) if len(self) else 5.0
+
+    def dimension_count(self, dim):
+        return int(np.count_nonzero(self.dim_mask[:, self.dim_names.index(dim)]))
+
+    def dimension_mean(self, dim):
+        if not len(self):
+            return DIM_DEFAULT
+        values = self.dim_values[self.dim_names.index(dim)]
+        return (float(values.sum(dtype=np.float64)) + DIM_DEFAULT * (len(self) - len(values))) / len(self)
+
+    def dim_offsets(self, start):
+        # 第 start 行之前各维度的命中数，即该行在各 dim_values 中的起始位置
+        # 首次使用时按 DIM_OFFSET_BLOCK 行一块累计前缀和，之后每次只在所在块内计数，不随行号增长
+        if self._block_offsets is None:
+            block_starts = np.arange(0, len(self), DIM_OFFSET_BLOCK)
+            counts = (np.add.reduceat(self.dim_mask, block_starts, axis=0, dtype=np.int64) if len(self)
+                      else np.zeros((0, len(self.dim_names)), dtype=np.int64))
+            self._block_offsets = np.concatenate([np.zeros((1, len(self.dim_names)), dtype=np.int64),
+                                                  np.cumsum(counts, axis=0)])
+        block = start // DIM_OFFSET_BLOCK
+        return self._block_offsets[block] + np.count_nonzero(self.dim_mask[block * DIM_OFFSET_BLOCK:start], axis=0)
+
+    def dimension_scores(self, dim, start=0, stop=None):
+        # 稠密的 "{维度}维度得分" 列（可只取 [start, stop) 行）
+        j = self.dim_names.index(dim)
+        stop = len(self) if stop is None else min(stop, len(self))
+        mask = self.dim_mask[start:stop, j]
+        offset = int(self.dim_offsets(min(start, len(self)))[j])
+        dense = np.full(len(mask), DIM_DEFAULT, dtype=np.float32)
+        dense[mask] = self.dim_values[j][offset:offset + int(np.count_nonzero(mask))]
+        return dense
+
+    def with_rows(self, rows, scores, label_codes, dim_mask, dim_dense):
+        # 替换部分行的结果，返回新对象（原对象可能被其他会话共享，不做原地修改）
+        # rows 为行下标；dim_mask / dim_dense 为这些行的 (行数, 维度数) 命中掩码和稠密维度得分
+        new_scores = self.scores.copy()
+        new_scores[rows] = scores
+        new_codes = self.label_codes.copy()
+        new_codes[rows] = label_codes
+        new_mask = self.dim_mask.copy()
+        new_mask[rows] = dim_mask
+        dim_values = []
+        for j, dim in enumerate(self.dim_names):
+            dense = self.dimension_scores(dim)
+            dense[rows] = dim_dense[:, j]
+            dim_values.append(dense[new_mask[:, j]])
+        return ColumnarResult(new_scores, new_codes, self.dim_names, new_mask, dim_values)
+
+    def dimension_analysis(self, i):
+        # 还原第 i 行的 {维度: 得分} 字典（只含命中的维度）
+        offsets = self.dim_offsets(i)
+        return {
+            dim: round(float(self.dim_values[j][offsets[j]]), 2)
+            for j, dim in enumerate(self.dim_names) if self.dim_mask[i, j]
+        }
+
+    def to_frame(self, start=0, stop=None):
+        stop = len(self) if stop is None else min(stop, len(self))
+        frame = pd.DataFrame({
+            '情感得分': self.scores[start:stop],
+            '情感标签': pd.Categorical.from_codes(self.label_codes[start:stop], dtype=LABEL_DTYPE)
+        })
+        for dim in self.dim_names:
+            frame[dimension_column(dim)] = self.dimension_scores(dim, start, stop)
+        return frame
+
+    def join(self, source, start=0, stop=None):
+        # 原始数据的 [start, stop) 行拼上结果列；原表已有同名结果列（如重新上传的结果文件）时以本次结果为准
+        return self.attach(source.iloc[start:stop], start)
+
+    def attach(self, part, start):
+        # part 为原始数据从第 start 行开始的连续若干行
+        part = part.drop(columns=self.column_names, errors='ignore').reset_index(drop=True)
+        return pd.concat([part, self.to_frame(start, start + len(part))], axis=1)
+
+    def iter_joined(self, source, chunk_rows=50000):
+        # source 为原始数据 DataFrame，或按行顺序产出原始数据分块的可迭代对象（如 ConvertedSheet.iter_frames()）
+        if isinstance(source, pd.DataFrame):
+            for start in range(0, len(self), chunk_rows):
+                yield self.join(source, start, start + chunk_rows)
+            return
+        start = 0
+        for part in source:
+            yield self.attach(part, start)
+            start += len(part)
+
+    def to_arrow(self):
+        import pyarrow as pa
+
+        columns = {
+            '情感得分': pa.array(self.scores, type=pa.float32()),
+            '情感标签': pa.DictionaryArray.from_arrays(
+                pa.array(self.label_codes, type=pa.int8()), pa.array(list(SENTIMENT_LABELS))
+            )
+        }
+        for j, dim in enumerate(self.dim_names):
+            columns[dimension_column(dim)] = pa.array(
+                self.dimension_scores(dim), type=pa.float32(), mask=~self.dim_mask[:, j]
+            )
+        return pa.table(columns)
+
+    @classmethod
+    def from_arrow(cls, table):
+        import pyarrow as pa
+
+        dim_names = [name[:-len('维度得分')] for name in table.column_names if name.endswith('维度得分')]
+        labels = table.column('情感标签').combine_chunks()
+        if not pa.types.is_dictionary(labels.type):
+            labels = labels.dictionary_encode()
+        remap = np.array([LABEL_CODES[label] for label in labels.dictionary.to_pylist()], dtype=np.int8)
+        label_codes = remap[labels.indices.to_numpy(zero_copy_only=False)] if len(remap) else np.zeros(0, np.int8)
+
+        dim_mask = np.empty((table.num_rows, len(dim_names)), dtype=bool)
+        dim_values = []
+        for j, dim in enumerate(dim_names):
+            column = table.column(dimension_column(dim)).combine_chunks()
+            dim_mask[:, j] = column.is_valid().to_numpy(zero_copy_only=False)
+            dim_values.append(column.drop_null().to_numpy(zero_copy_only=False))
+        scores = table.column('情感得分').to_numpy()
+        return cls(scores, label_codes, dim_names, dim_mask, dim_values)
+
+    def to_parquet(self, path):
+        import pyarrow.parquet as pq
+        pq.write_table(self.to_arrow(), str(path))
+
+    @classmethod
+    def read_parquet(cls, path):
+        import pyarrow.parquet as pq
+        return cls.from_arrow(pq.read_table(str(path)))
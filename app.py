@@ -11,9 +11,42 @@ from datetime import datetime
 import json
 from pathlib import Path
 import sys
+import io
+import time
+import hashlib
+import uuid
+import shutil
+from functools import partial
 
 import streamlit as st
 
+from sentiment_engine import (
+    load_integrated_sentiment_dict,
+    calculate_sentiment_score,
+    get_sentiment_label,
+    default_worker_count,
+    load_jieba,
+    scorer_key,
+    SENTIMENT_LABELS
+)
+from stream_analysis import clean_columns, read_csv_sample
+from score_cache import ScoreCache
+from analysis_result import ColumnarResult
+from token_store import TokenStore
+from chart_summary import histogram_counts, grouped_box_stats, sample_indices
+from time_index import TimeIndex, extract_review_dates, TREND_FREQS
+from excel_ingest import convert_workbook
+from perf_metrics import PerfRecorder, NULL_RECORDER, activate, current_recorder
+from lexicon_edit import edit_lexicon, apply_lexicon_change, count_changes
+from analysis_jobs import JobManager, saved_progress, score_with_checkpoints, stream_with_checkpoints
+from near_duplicates import NearDuplicateClusters, DEFAULT_THRESHOLD as NEAR_DUPLICATE_THRESHOLD
+from review_index import ReviewIndex
+from dataset_store import DatasetStore
+from result_export import (
+    EXPORT_FORMATS, EXPORT_SCOPES, export_path, export_result, result_frames, spill_frames,
+    aggregate_frame, stream_aggregate_frame
+)
+
 # ==========================================
 # 1. 全局配置（修复中文显示 + Emoji 支持）
 # ==========================================
@@ -45,186 +78,6 @@ st.set_page_config(
     layout="wide"
 )
 
-def load_integrated_sentiment_dict():
-    sentiment_words = {
-        'strong_positive': {
-            '完美': 9.5, '极品': 9.8, '顶级': 9.7, '一流': 9.6, '惊艳': 9.4, '震撼': 9.5,
-            '超出预期': 9.3, '物超所值': 9.2, '性价比极高': 9.4, '五星好评': 9.5, '满分': 10.0,
-            '强烈推荐': 9.3, '极力推荐': 9.4, '无限回购': 9.2, '闭眼入': 9.1, '相见恨晚': 9.0,
-            '爱不释手': 9.1, '赞不绝口': 9.0, '质量超好': 9.4, '品质极佳': 9.5, '正品': 9.0,
-            '真材实料': 9.2, '货真价实': 9.1, '次日达': 9.3, '当日达': 9.2, '神速': 9.0,
-            '客服专业': 9.0, '售后无忧': 9.1, '效果惊艳': 9.4, '立竿见影': 9.2,
-            'YYDS': 9.8, '绝绝子': 9.5, '封神': 9.6, '天花板': 9.7
-        },
-        'medium_positive': {
-            '很好': 8.5, '满意': 8.0, '喜欢': 8.2, '好用': 8.3, '实用': 8.0, '耐用': 8.1,
-            '质量不错': 8.2, '与描述一致': 8.0, '符合预期': 7.8, '运行流畅': 8.3, '速度快': 8.1,
-            '版型好': 8.2, '显瘦': 8.1, '好吃': 8.3, '美味': 8.4, '好吸收': 8.2, '保湿好': 8.1,
-            '收纳方便': 8.0, '快递快': 8.2, '发货快': 8.1, '包装好': 8.0, '划算': 8.2,
-            '实惠': 8.1, '便宜': 7.9, '性价比高': 8.3, '物有所值': 8.0,
-            '种草': 8.5, '安利': 8.3, '真香': 8.4
-        },
-        'weak_positive': {
-            '可以': 6.5, '还行': 6.3, '还好': 6.4, '不错': 6.6, '挺好的': 6.7, '蛮好': 6.5,
-            '一般般': 6.0, '无功无过': 6.2, '基本满意': 6.8, '符合价位': 6.7
-        },
-        'neutral': {
-            '收到': 5.0, '已签收': 5.0, '已收货': 5.0, '确认收货': 5.0, '还没用': 5.2,
-            '待使用': 5.1, '未拆封': 5.0, '备用中': 5.0, '囤货': 5.1, '看着还行': 5.5
-        },
-        'weak_negative': {
-            '一般': 4.0, '普通': 3.8, '有点失望': 3.5, '不够理想': 3.6, '有点小': 3.8,
-            '有点薄': 3.7, '色差': 3.5, '轻微瑕疵': 3.4, '味道一般': 3.6, '口感一般': 3.5,
-            '偏贵': 3.2, '有点小贵': 3.3, '效果一般': 3.4
-        },
-        'medium_negative': {
-            '质量差': 2.0, '劣质': 1.5, '次品': 1.2, '瑕疵': 2.5, '破损': 1.8, '断裂': 1.0,
-            '异味': 2.0, '刺鼻': 1.5, '与描述不符': 2.2, '色差大': 2.0, '尺码不准': 2.1,
-            '快递慢': 2.5, '物流慢': 2.4, '包装破损': 2.0, '客服态度差': 1.8, '回复慢': 2.2,
-            '难用': 2.0, '不好用': 1.9, '不舒服': 2.1, '过敏': 1.0, '刺激': 1.2,
-            '踩雷': 2.0, '拔草': 2.2, '翻车': 1.8,
-            '不好': 2.0, '差': 1.5, '版型不好': 2.2, '材质差': 1.8
-        },
-        'strong_negative': {
-            '假货': 0.0, '山寨': 0.1, '盗版': 0.0, '垃圾': 0.0, '废物': 0.1, '破烂': 0.2,
-            '工业垃圾': 0.0, '完全不能用': 0.1, '残次品': 0.2, '三无产品': 0.0, '有毒': 0.0,
-            '骗子': 0.0, '欺骗': 0.1, '欺诈': 0.0, '黑心商家': 0.0, '无良商家': 0.0,
-            '智商税': 0.2, '割韭菜': 0.1, '态度恶劣': 0.1, '威胁': 0.0, '投诉': 0.3,
-            '大冤种': 0.2, '血亏': 0.1, '避雷': 0.3
-        }
-    }
-    
-    dimension_words = {
-        '质量': ['质量', '品质', '做工', '材质', '面料', '用料', '工艺', '细节'],
-        '物流': ['快递', '物流', '发货', '配送', '顺丰', '京东快递', '圆通', '中通'],
-        '包装': ['包装', '盒子', '袋子', '纸箱', '打包', '封装', '包裹'],
-        '价格': ['价格', '贵', '便宜', '性价比', '实惠', '划算', '优惠', '薅羊毛'],
-        '服务': ['客服', '售后', '态度', '回复', '处理', '退换', '保修'],
-        '体验': ['效果', '体验', '感觉', '用着', '穿着', '吃着', '使用'],
-        '外观': ['外观', '颜值', '设计', '款式', '版型', '颜色', '尺寸']
-    }
-    
-    negative_words = {
-        '不': -1.0, '没': -1.0, '无': -1.0, '非': -1.0, '未': -1.0, '否': -1.0,
-        '从未': -1.2, '毫不': -1.3, '压根不': -1.4, '绝不': -1.2, '并非': -1.1
-    }
-    
-    degree_adverbs = {
-        '极其': 1.8, '非常': 1.7, '特别': 1.6, '十分': 1.5, '很': 1.4,
-        '较': 1.2, '稍微': 0.8, '略微': 0.7, '稍欠': 0.6, '有点': 0.9,
-        '超': 1.7, '巨': 1.8, '贼': 1.6, '超赞': 1.7, '贼好用': 1.6
-    }
-    
-    explicit_patterns = {
-        '五星好评': 9.5, '五颗星': 9.3, '全五星': 9.4, '满分': 10.0,
-        '强烈推荐': 9.2, '闭眼买': 9.1, '绝不会回购': 1.0, '再也不买': 1.5,
-        '永远拉黑': 0.5, '避雷': 2.0, '翻车': 1.8, '踩雷': 2.0,
-        '智商税': 1.5, '上当受骗': 1.0, '强烈投诉': 0.5
-    }
-    
-    return {
-        'sentiment': sentiment_words,
-        'dimensions': dimension_words,
-        'negations': negative_words,
-        'degrees': degree_adverbs,
-        'explicit': explicit_patterns
-    }
-
-def calculate_sentiment_score(text, sentiment_dict):
-    if pd.isna(text) or len(str(text).strip()) == 0:
-        return 5.0, {}
-    
-    text = str(text).lower()
-    original_text = text
-    text = re.sub(r'[^\u4e00-\u9fa5a-zA-Z0-9]', ' ', text)
-    
-    for pattern, score in sentiment_dict['explicit'].items():
-        if pattern in original_text:
-            return score, {}
-    
-    words = list(jieba.lcut(text))
-    if not words:
-        return 5.0, {}
-    
-    total_score = 0.0
-    word_count = 0
-    dimension_scores = {dim: 0.0 for dim in sentiment_dict['dimensions'].keys()}
-    dimension_word_count = {dim: 0 for dim in sentiment_dict['dimensions'].keys()}
-    
-    for i, word in enumerate(words):
-        stop_words = {'的', '了', '在', '是', '我', '有', '和', '就', '不', '人', '都'}
-        if word in stop_words or len(word) < 2:
-            continue
-        
-        current_score = 0.0
-        for sentiment_type, word_dict in sentiment_dict['sentiment'].items():
-            if word in word_dict:
-                current_score = word_dict[word]
-                break
-        
-        if current_score == 0.0:
-            for dim, dim_words in sentiment_dict['dimensions'].items():
-                if word in dim_words:
-                    dimension_scores[dim] += 0
-                    dimension_word_count[dim] += 1
-            continue
-        
-        if i > 0 and words[i-1] in sentiment_dict['degrees']:
-            current_score *= sentiment_dict['degrees'][words[i-1]]
-        
-        negation_weight = 1.0
-        for j in range(max(0, i-2), i):
-            if words[j] in sentiment_dict['negations']:
-                negation_weight *= sentiment_dict['negations'][words[j]]
-        current_score *= negation_weight
-        
-        related_dim = None
-        for j in range(max(0, i-1), min(len(words), i+2)):
-            for dim, dim_words in sentiment_dict['dimensions'].items():
-                if words[j] in dim_words:
-                    related_dim = dim
-                    break
-            if related_dim:
-                break
-        
-        if related_dim:
-            dimension_scores[related_dim] += current_score
-            dimension_word_count[related_dim] += 1
-        
-        total_score += current_score
-        word_count += 1
-    
-    if word_count == 0:
-        final_score = 5.0
-    else:
-        final_score = total_score / word_count
-    
-    final_score = max(1.0, min(10.0, final_score))
-    
-    dim_analysis = {}
-    for dim in dimension_scores.keys():
-        if dimension_word_count[dim] > 0:
-            dim_score = dimension_scores[dim] / dimension_word_count[dim]
-            dim_score = max(1.0, min(10.0, dim_score))
-            dim_analysis[dim] = round(dim_score, 2)
-    
-    if 4.5 <= final_score <= 5.5:
-        final_score += np.random.uniform(-0.15, 0.15)
-    
-    return round(final_score, 2), dim_analysis
-
-def get_sentiment_label(score):
-    if score >= 9.0:
-        return "非常积极"
-    elif score >= 7.5:
-        return "积极"
-    elif score >= 6.0:
-        return "略微积极"
-    elif score >= 4.5:
-        return "中性"
-    else:
-        return "消极"
-
 st.title("📊 电商评论情感分析系统")
 st.markdown("**天津财经大学 | 信息与计算科学专业 | VeriGuard**")
 st.markdown("**整合版**：全网电商情感词典 + 细粒度情感计算 + 多维度分析")
@@ -234,25 +87,526 @@ page = st.sidebar.radio("选择页面", [
     "🏠 项目简介", 
     "📤 数据上传分析", 
     "📈 可视化中心",
+    "🔎 评论检索",
     "🤖 单条预测",
     "📋 词典管理"
 ])
 
-if 'df' not in st.session_state:
-    st.session_state.df = None
+scoring_workers = st.sidebar.number_input(
+    "并行评分进程数",
+    min_value=1,
+    max_value=os.cpu_count() or 1,
+    value=default_worker_count(),
+    help="大于 1 时按块分发到多进程评分（适合大文件），结果与单进程完全一致"
+)
+use_score_cache = st.sidebar.checkbox(
+    "启用持久化评分缓存",
+    value=True,
+    help="按文本哈希 + 词典指纹（含分词口径）缓存评分结果，重复上传相同评论时直接复用；词典变化后自动失效"
+)
+perf_enabled = st.sidebar.checkbox(
+    "记录性能埋点",
+    value=False,
+    help="记录上传解析、评分（分词 / 查表 / 内核）、可视化、导出各阶段的耗时和吞吐，在侧边栏「⏱️ 性能」中查看和导出"
+)
+
+# 会话里只保存键：数据和分析结果本身都在共享存储中，用到时按键取回（见 session_result）
 if 'analyzed' not in st.session_state:
     st.session_state.analyzed = False
 if 'content_col' not in st.session_state:
     st.session_state.content_col = None
-if 'dim_analysis' not in st.session_state:
-    st.session_state.dim_analysis = {}
+if 'analysis_key' not in st.session_state:
+    st.session_state.analysis_key = None
+if 'job_key' not in st.session_state:
+    st.session_state.job_key = None
+if 'data_key' not in st.session_state:
+    st.session_state.data_key = None
+if 'upload_hash' not in st.session_state:
+    # (上传文件 id, 内容哈希)：同一次上传只哈希一次
+    st.session_state.upload_hash = None
+if 'session_token' not in st.session_state:
+    # 本会话在共享数据存储中的持有者标识
+    st.session_state.session_token = uuid.uuid4().hex
+if 'near_dup_threshold' not in st.session_state:
+    st.session_state.near_dup_threshold = None
+if 'progressive' not in st.session_state:
+    st.session_state.progressive = False
+if 'perf_recorder' not in st.session_state:
+    st.session_state.perf_recorder = PerfRecorder()
+
+# 性能埋点按会话记录；未开启时各埋点拿到的是空记录器
+perf = st.session_state.perf_recorder if perf_enabled else NULL_RECORDER
+activate(perf)
 
 LABEL_COLORS = {
     "非常积极": "#2ecc71", "积极": "#27ae60", "略微积极": "#f1c40f",
     "中性": "#95a5a6", "消极": "#e67e22"
 }
 
-sentiment_dict = load_integrated_sentiment_dict()
+# ==========================================
+# 跨重跑 / 跨会话缓存：词典、按内容哈希解析的上传文件、已完成的分析结果
+# 上传数据和分析结果放在进程内共享的 DatasetStore 中（按内存预算 LRU 淘汰，会话正在使用的不淘汰）
+# ==========================================
+
+@st.cache_resource
+def get_sentiment_dict():
+    return load_integrated_sentiment_dict()
+
+@st.cache_resource
+def get_dataset_store():
+    return DatasetStore()
+
+def hold_session_data():
+    # 本会话正在使用的数据和分析结果续约，不会被淘汰；会话关闭后租约到期自动释放
+    # 每次重跑开始时续约（页面中途 st.stop() 也不影响），键变化时再调用一次
+    get_dataset_store().hold(st.session_state.session_token,
+                             [key for key in (st.session_state.data_key, st.session_state.analysis_key) if key is not None])
+
+def session_result():
+    # 本会话当前的完整模式分析结果；已被淘汰（会话长时间未活动、租约过期）时为 None
+    if not st.session_state.analyzed or st.session_state.analysis_key is None:
+        return None
+    return get_dataset_store().get(st.session_state.analysis_key)
+
+def missing_result_warning(message="⚠️ 请先上传并分析数据"):
+    if st.session_state.analyzed:
+        message = "⚠️ 分析结果已从共享数据中释放（会话长时间未活动），请重新上传分析"
+    st.warning(message)
+
+def file_content_hash(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def uploaded_file_hash(uploaded):
+    # 页面每次重跑（含后台任务运行时的轮询）都会走到这里：按上传文件 id 记住哈希，换了文件才重新计算
+    cached = st.session_state.upload_hash
+    if cached is None or cached[0] != uploaded.file_id:
+        cached = st.session_state.upload_hash = (uploaded.file_id, file_content_hash(uploaded.getvalue()))
+    return cached[1]
+
+UPLOAD_SPILL_DIR = Path.home() / '.cache' / 'sentiment-analysis-app' / 'uploads'
+MAX_UPLOAD_SPILLS = 8
+
+def spill_upload(uploaded, file_hash):
+    # 流式模式：上传文件按内容哈希分块落盘一次，后台任务从磁盘文件读取，
+    # 不在内存中再复制一份上传内容，也不与页面重跑共用上传对象的读取位置
+    path = UPLOAD_SPILL_DIR / f'{file_hash}.csv'
+    if path.exists():
+        os.utime(path)
+        return path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f'{path.name}.{uuid.uuid4().hex}.tmp')
+    try:
+        uploaded.seek(0)
+        with open(tmp_path, 'wb') as f:
+            shutil.copyfileobj(uploaded, f)
+        os.replace(tmp_path, path)
+    finally:
+        uploaded.seek(0)
+        if tmp_path.exists():
+            tmp_path.unlink()
+    spills = sorted(UPLOAD_SPILL_DIR.glob('*.csv'), key=lambda p: p.stat().st_mtime, reverse=True)
+    for stale in spills[MAX_UPLOAD_SPILLS:]:
+        try:
+            stale.unlink()
+        except OSError:
+            pass
+    return path
+
+def load_uploaded_frame(file_hash, file_name, file_bytes):
+    # 按文件内容哈希保存解析结果，所有会话共享同一份 DataFrame（调用方只读，不做原地修改）
+    def parse():
+        with st.spinner("正在解析上传文件..."), perf.stage('upload.parse_csv', bytes=len(file_bytes)) as timer:
+            df = clean_columns(pd.read_csv(io.BytesIO(file_bytes), encoding='utf-8-sig'))
+            timer.add(rows=len(df))
+        return df
+    return get_dataset_store().get_or_load(('data', file_hash), parse)
+
+@st.cache_resource(max_entries=8, show_spinner="首次加载 Excel，正在转换为列式缓存...")
+def load_converted_sheet(file_hash, _file_bytes):
+    # Excel 首次加载时整表解析一次并按内容哈希转存为 Parquet（落盘，重启后仍有效），之后只按列读取
+    with perf.stage('upload.convert_xlsx', bytes=len(_file_bytes)) as timer:
+        sheet = convert_workbook(_file_bytes, file_hash)
+        timer.add(rows=len(sheet))
+    return sheet
+
+def load_sheet_columns(file_hash, columns, sheet):
+    def read():
+        with st.spinner("正在读取所需列..."), perf.stage('upload.read_columns', rows=len(sheet)):
+            return sheet.read(columns)
+    return get_dataset_store().get_or_load(('data', file_hash, columns), read)
+
+@st.cache_resource(max_entries=32)
+def detect_content_columns(file_hash, _df):
+    # 返回 (自动识别的评论内容列, 候选列列表)
+    content_col = None
+    content_keywords = ['评论内容', 'content', '评价内容', '评价文本', '评论文本', 'text', '评论', '评价']
+    non_content_keywords = ['用户', '昵称', '名字', '时间', '日期', 'date', 'time', 
+                           'user', 'name', 'id', '链接', 'url', '等级', '评分', '星级', 
+                           '评论人', '评论者', '买家', '卖家', '订单号', '手机号']
+
+    for col in _df.columns:
+        col_clean = col.lower()
+        if (any(key in col for key in content_keywords) and 
+            not any(exclude in col_clean for exclude in non_content_keywords)):
+            content_col = col
+            break
+
+    candidate_cols = []
+    if not content_col:
+        for col in _df.columns:
+            col_clean = col.lower()
+            if any(exclude in col_clean for exclude in non_content_keywords):
+                continue
+            if _df[col].dtype == 'object':
+                sample = _df[col].dropna().iloc[0] if not _df[col].dropna().empty else ""
+                if len(str(sample)) > 10:
+                    candidate_cols.append(col)
+    
+    return content_col, candidate_cols
+
+RESULT_ARRAY_FIELDS = ('columns', 'tokens', 'review_index')
+
+def result_nbytes(result, base=None):
+    # 分析结果自身占用的内存：原始数据另有条目，不计入；与 base（同一数据的另一份结果）共用的部分也不重复计入
+    shared = {id(base.get(name)) for name in RESULT_ARRAY_FIELDS} if base is not None else set()
+    parts = [result.get(name) for name in RESULT_ARRAY_FIELDS]
+    return sum(part.nbytes for part in parts if part is not None and id(part) not in shared)
+
+def store_analysis_result(analysis_key, data_key, result):
+    # 分析结果放入共享存储（原样只读共享）：结果引用原始数据，原始数据在结果淘汰前不会被淘汰
+    result['data_key'] = data_key
+    if result.get('columns') is not None:
+        result['columns'].readonly()
+    get_dataset_store().put(analysis_key, result, nbytes=result_nbytes(result),
+                            depends=(data_key,) if data_key is not None else ())
+
+JOB_POLL_SECONDS = 1.0
+
+@st.cache_resource
+def get_job_manager():
+    # 后台分析任务表，所有会话共享：同一文件 / 列 / 词典的分析任务只跑一个，其他会话看到同一份进度
+    return JobManager()
+
+EXPORT_DOWNLOAD_LIMIT = 200 * 1024 * 1024
+
+def export_frames(result, scope):
+    # 按块产出导出内容；Excel 数据从转存的 Parquet 按块读取全部列
+    if result['mode'] == 'stream':
+        aggregates = result['aggregates']
+        if scope == 'aggregates':
+            return [stream_aggregate_frame(aggregates)]
+        return spill_frames(result['spill_path'], list(aggregates['dim_sums']), negative_only=(scope == 'negative'))
+    if scope == 'aggregates':
+        return [aggregate_frame(result['columns'], result.get('time_index'))]
+    source = result['sheet'].iter_frames() if result.get('sheet') is not None else result['df']
+    return result_frames(result['columns'], source, negative_only=(scope == 'negative'))
+
+CHART_DPI = 150
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def render_chart_png(analysis_key, viz_type, params, _draw):
+    # 渲染好的图表按 (分析结果键, 图表类型, 参数) 缓存为 PNG，重跑时直接显示，不再重建 matplotlib 图
+    with perf.stage(f'viz.render.{viz_type}'):
+        fig = _draw()
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format='png', dpi=CHART_DPI, bbox_inches='tight')
+        plt.close(fig)
+        return buffer.getvalue()
+
+def show_chart(viz_type, draw, **params):
+    # viz.<类型> 为每次显示的总耗时（含缓存命中），viz.render.<类型> 只在缓存未命中、真正绘图时记录
+    with perf.stage(f'viz.{viz_type}'):
+        st.image(render_chart_png(st.session_state.analysis_key, viz_type, tuple(sorted(params.items())), draw))
+
+def length_summary(analysis_key, texts, columns):
+    # 评论长度分析所需的全部汇总：箱线图统计、散点抽样、相关系数（数组只读）；作为分析结果的派生数据只计算一次
+    # 词云词频、走势图各粒度的汇总同样挂在分析结果上（见可视化中心）
+    def compute():
+        with st.spinner("正在统计评论长度..."), perf.stage('viz.length_summary', rows=len(texts)):
+            lengths = texts.astype(str).str.len().to_numpy()
+            points = sample_indices(len(lengths))
+        return {
+            'box_stats': grouped_box_stats(lengths, columns.label_codes, SENTIMENT_LABELS),
+            'points': points,
+            'point_lengths': lengths[points],
+            'point_scores': columns.scores[points],
+            'point_colors': np.array([LABEL_COLORS[label] for label in SENTIMENT_LABELS])[columns.label_codes[points]],
+            'rows': len(lengths),
+            'corr': float(np.corrcoef(lengths, columns.scores)[0, 1]) if len(lengths) > 1 else float('nan')
+        }
+    return get_dataset_store().derived(analysis_key, 'length_summary', compute)
+
+def render_analysis_result(result, content_col, dim_names):
+    if result.get('cache_lookups'):
+        st.info(f"⚡ 评分缓存命中率：{result['cache_hits']/result['cache_lookups']*100:.1f}%（命中 {result['cache_hits']} / {result['cache_lookups']} 条不重复文本）")
+    
+    st.subheader("📊 核心分析结果")
+    col1, col2, col3, col4, col5 = st.columns(5)
+    label_ratios = result['label_ratios']
+    col1.metric("平均情感得分", f"{result['avg_score']:.2f}/10")
+    col2.metric("非常积极占比", f"{label_ratios['非常积极']*100:.1f}%")
+    col3.metric("积极占比", f"{label_ratios['积极']*100:.1f}%")
+    col4.metric("中性占比", f"{label_ratios['中性']*100:.1f}%")
+    col5.metric("消极占比", f"{label_ratios['消极']*100:.1f}%")
+    
+    near_dup = result.get('near_duplicates')
+    if near_dup is not None:
+        render_near_duplicates(near_dup, result)
+    
+    st.subheader("📈 各维度平均情感得分")
+    dim_avg_scores = result['dim_avg_scores']
+    dim_cols = st.columns(len(dim_avg_scores))
+    for idx, (dim, score) in enumerate(dim_avg_scores.items()):
+        with dim_cols[idx]:
+            st.metric(f"{dim}维度", score)
+            st.progress(score/10)
+    
+    with st.expander("📋 查看前20条分析结果（含维度得分）", expanded=True):
+        display_cols = [content_col, '情感得分', '情感标签'] + [f'{dim}维度得分' for dim in dim_names]
+        if result['preview'] is not None:
+            st.dataframe(result['preview'][display_cols], use_container_width=True)
+    
+    if result['mode'] == 'stream':
+        st.info(f"📁 逐行分析结果已写入：{result['spill_path']}")
+    render_export(result)
+
+def render_export(result):
+    # 导出文件按 (分析结果键, 格式, 范围) 缓存在磁盘上，下载时直接从文件读取；
+    # Excel 写出较慢，需点击生成，CSV / Parquet 在首次显示时即生成
+    st.subheader("📥 导出分析结果")
+    col1, col2 = st.columns(2)
+    fmt = col1.selectbox("导出格式", list(EXPORT_FORMATS), format_func=lambda f: EXPORT_FORMATS[f][0])
+    scope = col2.radio("导出范围", list(EXPORT_SCOPES), format_func=EXPORT_SCOPES.get, horizontal=True)
+    fmt_label, suffix, mime = EXPORT_FORMATS[fmt]
+    
+    if result['mode'] == 'stream' and fmt == 'csv' and scope == 'rows':
+        # 流式模式的逐行结果文件本身就是完整结果的 CSV
+        path = Path(result['spill_path'])
+    else:
+        path = export_path(result['key'], fmt, scope)
+        if not path.exists() and (fmt != 'xlsx' or st.button("📦 生成 Excel 文件")):
+            rows = result['aggregates']['rows'] if result['mode'] == 'stream' else len(result['columns'])
+            with st.spinner(f"正在生成{EXPORT_SCOPES[scope]}（{fmt_label}）..."), perf.stage(f'export.{fmt}', rows=rows):
+                path = export_result(result['key'], fmt, scope, lambda: export_frames(result, scope))
+    
+    if path.exists():
+        size = path.stat().st_size
+        if size <= EXPORT_DOWNLOAD_LIMIT:
+            with open(path, 'rb') as f:
+                st.download_button(
+                    label=f"📥 下载{EXPORT_SCOPES[scope]}（{fmt_label}，{size / 1024 / 1024:.1f} MB）",
+                    data=f,
+                    file_name=f"电商评论情感分析{EXPORT_SCOPES[scope]}_{result['finished_at']}{suffix}",
+                    mime=mime
+                )
+        else:
+            st.info(f"📁 导出文件较大（{size / 1024 / 1024:.0f} MB），请直接从服务器获取：{path}")
+
+def render_near_duplicates(near_dup, result):
+    st.subheader("🧬 近似重复评论")
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("近似重复簇", near_dup['clusters'], help=f"签名相似度 ≥ {near_dup['threshold']:.2f} 的不重复评论归为一簇")
+    col2.metric("重复 / 近似重复行占比", f"{(near_dup['rows'] - near_dup['groups']) / max(near_dup['rows'], 1) * 100:.1f}%",
+                help="除每簇一条之外的行数占比（含完全相同的评论）")
+    col3.metric("按簇去重平均得分", f"{near_dup['avg_score']:.2f}/10",
+                delta=f"{near_dup['avg_score'] - result['avg_score']:+.2f}", delta_color="off",
+                help="每簇只计一次，刷量 / 模板评论不再拉偏均值")
+    col4.metric("沿用代表评论得分", near_dup['reused_texts'],
+                help=f"词典命中与代表评论相同、免于评分的不重复评论数；命中不同而单独评分 {near_dup['rescored_texts']} 条")
+    with st.expander("📋 查看行数最多的重复簇及按簇去重的标签占比"):
+        st.dataframe(pd.DataFrame({
+            '标签': list(near_dup['label_ratios']),
+            '按行占比': [f"{result['label_ratios'][label]*100:.1f}%" for label in near_dup['label_ratios']],
+            '按簇去重占比': [f"{ratio*100:.1f}%" for ratio in near_dup['label_ratios'].values()]
+        }), hide_index=True)
+        if near_dup['largest']:
+            st.dataframe(pd.DataFrame([
+                {'行数': item['rows'], '写法数': item['texts'], '平均得分': round(item['avg_score'], 2), '代表评论': item['text'] or '（空评论）'}
+                for item in near_dup['largest']
+            ]), hide_index=True, use_container_width=True)
+
+def summarize_columns(columns, df, near_duplicates=None):
+    # 完整模式结果页所需的汇总指标和预览；启用近似重复归并时附带按簇去重的汇总
+    return {
+        'avg_score': columns.mean_score(),
+        'label_ratios': {label: columns.label_ratio(label) for label in SENTIMENT_LABELS},
+        'dim_avg_scores': {dim: round(columns.dimension_mean(dim), 2) for dim in columns.dim_names},
+        'preview': columns.join(df, 0, 20),
+        'near_duplicates': (near_duplicates.summary(columns.scores, columns.label_codes, SENTIMENT_LABELS)
+                            if near_duplicates is not None else None)
+    }
+
+def publish_analysis(result, content_col):
+    # 把分析结果的键挂到当前会话并续约，可视化中心 / 评论检索按键从共享存储取结果
+    st.session_state.analyzed = result['mode'] == 'full'
+    st.session_state.content_col = content_col
+    st.session_state.analysis_key = result['key']
+    hold_session_data()
+
+def run_analysis_job(job, analysis_key, source, df, sheet, content_col, lexicon, workers, use_cache, progressive=False):
+    # 在后台任务线程中执行（不调用 st.* 接口），返回放入分析结果缓存的结果
+    recorder = current_recorder()
+    dim_names = list(lexicon['dimensions'].keys())
+    score_cache = ScoreCache(lexicon) if use_cache else None
+    result = {'key': analysis_key, 'mode': analysis_key[3]}
+    try:
+        if result['mode'] == 'stream':
+            aggregates, result_preview, spill_path = stream_with_checkpoints(
+                job, source, content_col, lexicon, workers=workers, cache=score_cache
+            )
+            result.update({
+                'rows': aggregates.rows,
+                'aggregates': aggregates.to_dict(),
+                'avg_score': aggregates.mean_score(),
+                'label_ratios': {label: aggregates.label_ratio(label) for label in SENTIMENT_LABELS},
+                'dim_avg_scores': {dim: round(aggregates.dimension_mean(dim), 2) for dim in dim_names},
+                'preview': result_preview,
+                'spill_path': str(spill_path)
+            })
+        else:
+            token_store = TokenStore()
+            near_duplicates = NearDuplicateClusters(analysis_key[4]) if analysis_key[4] is not None else None
+            with recorder.stage('score.total', rows=len(df)):
+                unique_result, inverse = score_with_checkpoints(
+                    job, df[content_col].tolist(), lexicon, workers=workers, cache=score_cache, token_store=token_store,
+                    near_duplicates=near_duplicates, progressive=progressive
+                )
+            # 结果以紧凑列式保存；缓存中的原始数据由所有会话共享，不追加列、不复制
+            with recorder.stage('analysis.columnar', rows=len(df)):
+                columns = ColumnarResult.from_unique(unique_result, inverse, dim_names)
+            del unique_result, inverse
+            # 评论日期只在分析时提取一次，按天预聚合供走势图使用
+            time_index = None
+            if '商品属性' in df.columns:
+                with recorder.stage('analysis.time_index', rows=len(df)):
+                    time_index = TimeIndex.build(extract_review_dates(df['商品属性']), columns)
+            # 评论检索页用的倒排 / 位图索引
+            with recorder.stage('analysis.review_index', rows=len(df)):
+                review_index = ReviewIndex.build(columns, token_store, df[content_col])
+            result.update({
+                'rows': len(columns),
+                'df': df,
+                'columns': columns,
+                'sheet': sheet,
+                'tokens': token_store,
+                'time_index': time_index,
+                'clusters': near_duplicates,
+                'review_index': review_index,
+                **summarize_columns(columns, df, near_duplicates)
+            })
+        if score_cache is not None:
+            result['cache_hits'] = score_cache.hits
+            result['cache_lookups'] = score_cache.lookups
+    finally:
+        if score_cache is not None:
+            score_cache.close()
+    result['finished_at'] = datetime.now().strftime('%Y%m%d_%H%M%S')
+    return result
+
+def render_job_progress(job):
+    # 后台任务进行中：显示进度和暂停按钮；页面在脚本末尾定时重跑来轮询进度，任务本身不受刷新 / 断线影响
+    if job.total_chunks:
+        text = f"⏳ 后台分析中：{job.done_chunks}/{job.total_chunks} 块"
+    else:
+        text = f"⏳ 后台分析中：已完成 {job.done_chunks} 块"
+    if job.resumed_chunks:
+        text += f"（其中 {job.resumed_chunks} 块从检查点恢复）"
+    st.progress(job.progress, text=text)
+    if st.button("⏸️ 暂停分析", help="当前块写入检查点后停止，之后可从该处继续"):
+        job.stop()
+    if job.estimate is not None and job.estimate.snapshot is not None:
+        render_estimate(job.estimate.snapshot)
+
+def render_estimate(estimate):
+    # 渐进式估计：与「核心分析结果」「各维度平均情感得分」相同的指标，附 95% 置信区间半宽
+    st.subheader("📊 核心分析结果（估计中）")
+    st.caption(f"基于已评分的 {estimate['sampled_rows']} / {estimate['rows']} 行分层随机样本"
+               f"（{estimate['sampled_rows'] / max(estimate['rows'], 1) * 100:.1f}%），± 为 95% 置信区间半宽，全部评分完成后替换为精确结果")
+    col1, col2, col3, col4, col5 = st.columns(5)
+    score, half = estimate['avg_score']
+    col1.metric("平均情感得分", f"{score:.2f}/10", f"±{half:.2f}", delta_color="off")
+    for col, label in zip([col2, col3, col4, col5], ['非常积极', '积极', '中性', '消极']):
+        ratio, half = estimate['label_ratios'][label]
+        col.metric(f"{label}占比", f"{ratio*100:.1f}%", f"±{half*100:.1f}%", delta_color="off")
+    dim_cols = st.columns(len(estimate['dim_avg_scores']))
+    for idx, (dim, (score, half)) in enumerate(estimate['dim_avg_scores'].items()):
+        dim_cols[idx].metric(f"{dim}维度", f"{score:.2f}", f"±{half:.2f}", delta_color="off")
+
+def switch_lexicon(new_lexicon):
+    # 切换本会话的词典；本会话已有完整模式的分析结果时，只重评含被修改词条的评论，得到新词典下的结果
+    # 返回增量重评分的统计信息（没有可更新的结果时为 None）
+    old_lexicon = st.session_state.sentiment_dict
+    st.session_state.sentiment_dict = new_lexicon
+    store = get_dataset_store()
+    result = store.get(st.session_state.analysis_key) if st.session_state.analysis_key is not None else None
+    if result is None or result['mode'] != 'full' or result['key'][2] != scorer_key(old_lexicon):
+        return None
+    
+    key = result['key'][:2] + (scorer_key(new_lexicon),) + result['key'][3:]
+    stats = {'reused': True}
+    new_result = store.get(key)
+    if new_result is None:
+        started = time.perf_counter()
+        content_col = result['key'][1]
+        columns, time_index, stats = apply_lexicon_change(
+            result['columns'], result['tokens'], result['df'][content_col], old_lexicon, new_lexicon, result['time_index']
+        )
+        new_result = {
+            **{k: v for k, v in result.items() if k not in ('cache_hits', 'cache_lookups')},
+            'key': key,
+            'columns': columns,
+            'time_index': time_index,
+            'review_index': result['review_index'].with_columns(columns),
+            'finished_at': datetime.now().strftime('%Y%m%d_%H%M%S'),
+            **summarize_columns(columns, result['df'], result.get('clusters'))
+        }
+        columns.readonly()
+        store.put(key, new_result, nbytes=result_nbytes(new_result, result), depends=(result['data_key'],))
+        stats['seconds'] = time.perf_counter() - started
+    publish_analysis(new_result, st.session_state.content_col)
+    return stats
+
+def lexicon_edit_form(section, group_label=None, groups=(), value_label=None, default=0.0):
+    # 新增 / 修改 / 删除一个词条，返回修改后的词典（未提交时为 None）
+    with st.form(f"lexicon_edit_{section}"):
+        group = st.selectbox(group_label, groups) if group_label else None
+        word = st.text_input("词条")
+        value = st.number_input(value_label, value=default, step=0.1) if value_label else True
+        col1, col2 = st.columns(2)
+        if col1.form_submit_button("💾 保存（新增 / 修改）"):
+            return edit_lexicon(sentiment_dict, section, word, value, group)
+        if col2.form_submit_button("🗑️ 删除"):
+            return edit_lexicon(sentiment_dict, section, word, None, group)
+    return None
+
+def report_lexicon_switch(stats):
+    if stats is None:
+        st.success("✅ 词典已更新，之后的分析和单条预测将使用新词典")
+        return
+    if stats.get('reused'):
+        st.success("✅ 词典已更新：该词典下的分析结果已存在，直接复用")
+        return
+    st.success(f"✅ 词典已更新：重新评分 {stats['texts']} 条不重复评论（{stats['rows']} 行），"
+               f"耗时 {stats['seconds']:.2f} 秒，分析结果与可视化已同步更新")
+    if stats['unseen']:
+        st.warning(f"⚠️ 以下词条没有出现在当前数据的分词结果中，对已有结果没有影响：{'、'.join(stats['unseen'])}"
+                   "（分词词典中没有的新词不会被单独切分出来；需要整体切分的新词请加入外部词典源后重新编译，见 README）")
+
+if 'sentiment_dict' not in st.session_state:
+    st.session_state.sentiment_dict = get_sentiment_dict()
+sentiment_dict = st.session_state.sentiment_dict
+hold_session_data()
+
+# 本会话提交的后台分析任务：完成后在任意页面上都把结果挂到会话上
+session_job = get_job_manager().get(st.session_state.job_key) if st.session_state.job_key is not None else None
+if session_job is not None and not session_job.running:
+    finished = get_dataset_store().get(session_job.key) if session_job.status == 'done' else None
+    if finished is not None:
+        publish_analysis(finished, session_job.key[1])
+    st.session_state.job_key = None
+    session_job = None
+# 本次重跑展示了进度的后台任务：脚本末尾据其实际状态决定是否继续轮询
+progress_job = None
 
 if page == "🏠 项目简介":
     st.header("项目概述")
@@ -277,49 +631,60 @@ if page == "🏠 项目简介":
 elif page == "📤 数据上传分析":
     st.header("上传电商评论数据")
     uploaded = st.file_uploader("上传Excel/CSV文件", type=['xlsx', 'csv'])
+    stream_mode = st.checkbox(
+        "🌊 流式分析模式（超大CSV：分块读取、逐行结果写入磁盘，内存占用恒定）",
+        help="仅支持CSV；除上传外，也可直接填写服务器本地文件路径（不受上传大小限制）"
+    )
+    local_path = st.text_input("服务器本地CSV路径（可选）", placeholder="/data/reviews.csv").strip() if stream_mode else ""
+    near_dup_threshold = None
+    # 选项记在会话中：切换页面回来时仍对应同一个分析结果
+    if not stream_mode and st.checkbox(
+        "🧬 归并近似重复评论（MinHash/LSH）",
+        value=st.session_state.near_dup_threshold is not None,
+        help="模板化 / 只差表情标点的评论归为一簇：词典命中与代表评论相同的直接沿用其得分（近似结果），并报告簇大小和按簇去重的均值"
+    ):
+        near_dup_threshold = round(st.slider("近似重复相似度阈值", min_value=0.5, max_value=0.95,
+                                             value=st.session_state.near_dup_threshold or NEAR_DUPLICATE_THRESHOLD,
+                                             step=0.05), 2)
+    if not stream_mode:
+        st.session_state.near_dup_threshold = near_dup_threshold
+        st.session_state.progressive = st.checkbox(
+            "⏩ 渐进式估计（先看抽样估计，再等精确结果）",
+            value=st.session_state.progressive,
+            help="评分按分层随机顺序进行：几秒内先给出核心指标和维度平均分的估计值及 95% 置信区间，随评分推进逐步收窄，全部完成后替换为精确结果（精确结果不受影响）"
+        )
+    source = local_path or uploaded
+    dim_names = list(sentiment_dict['dimensions'].keys())
     
-    if uploaded:
+    if source:
         try:
-            if uploaded.name.endswith('.csv'):
-                df = pd.read_csv(uploaded, encoding='utf-8-sig')
+            source_name = local_path or uploaded.name
+            sheet = None
+            data_key = None
+            if stream_mode:
+                if not source_name.endswith('.csv'):
+                    raise ValueError("流式分析模式仅支持CSV文件")
+                if local_path:
+                    stat = os.stat(local_path)
+                    dataset_key = f"{os.path.abspath(local_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+                else:
+                    dataset_key = uploaded_file_hash(uploaded)
+                df = read_csv_sample(source)
+                st.success(f"✅ 已读取前 {len(df)} 行样本用于列识别（流式模式不会一次性加载全部数据）")
             else:
-                df = pd.read_excel(uploaded)
-            
-            df.columns = [
-                col.strip()
-                   .replace('\u200b', '')
-                   .replace('\xa0', ' ')
-                   .replace(' ', '')
-                for col in df.columns
-            ]
-            df = df[[col for col in df.columns if col.strip() != '']]
-            
-            st.session_state.df = df
-            st.success(f"✅ 成功加载 {len(df)} 条评论数据")
-            
-            content_col = None
-            content_keywords = ['评论内容', 'content', '评价内容', '评价文本', '评论文本', 'text', '评论', '评价']
-            non_content_keywords = ['用户', '昵称', '名字', '时间', '日期', 'date', 'time', 
-                                   'user', 'name', 'id', '链接', 'url', '等级', '评分', '星级', 
-                                   '评论人', '评论者', '买家', '卖家', '订单号', '手机号']
-
-            for col in df.columns:
-                col_clean = col.lower()
-                if (any(key in col for key in content_keywords) and 
-                    not any(exclude in col_clean for exclude in non_content_keywords)):
-                    content_col = col
-                    break
-
-            candidate_cols = []
-            if not content_col:
-                for col in df.columns:
-                    col_clean = col.lower()
-                    if any(exclude in col_clean for exclude in non_content_keywords):
-                        continue
-                    if df[col].dtype == 'object':
-                        sample = df[col].dropna().iloc[0] if not df[col].dropna().empty else ""
-                        if len(str(sample)) > 10:
-                            candidate_cols.append(col)
+                file_bytes = uploaded.getvalue()
+                dataset_key = uploaded_file_hash(uploaded)
+                if uploaded.name.endswith('.csv'):
+                    df = load_uploaded_frame(dataset_key, uploaded.name, file_bytes)
+                    data_key = ('data', dataset_key)
+                    st.success(f"✅ 成功加载 {len(df)} 条评论数据")
+                else:
+                    # Excel：列识别只用前若干行样本，选定评论列后再按列读取
+                    sheet = load_converted_sheet(dataset_key, file_bytes)
+                    df = sheet.sample()
+                    st.success(f"✅ 成功加载 {len(sheet)} 条评论数据")
+            
+            content_col, candidate_cols = detect_content_columns(dataset_key, df)
             
             if candidate_cols:
                 content_col = st.selectbox("请选择评论内容列", candidate_cols)
@@ -327,7 +692,13 @@ elif page == "📤 数据上传分析":
                 st.warning("⚠️ 未识别到典型评论内容列，请手动选择（避免选择评论人/时间等）")
                 content_col = st.selectbox("请选择评论内容列", df.columns)
             
-            st.session_state.content_col = content_col
+            if sheet is not None:
+                # 只读取评论列和走势图用的日期列；导出时再从 Parquet 按块读取全部列
+                needed = tuple(dict.fromkeys([content_col] + [col for col in ['商品属性'] if col in sheet.columns]))
+                df = load_sheet_columns(dataset_key, needed, sheet)
+                data_key = ('data', dataset_key, needed)
+            st.session_state.data_key = data_key
+            hold_session_data()
             
             st.subheader("📝 所选列内容预览（前5条）")
             preview_df = df[[content_col]].head(5).reset_index(drop=True)
@@ -347,194 +718,213 @@ elif page == "📤 数据上传分析":
                 elif non_empty_count / len(df) < 0.5:
                     st.warning("⚠️ 所选列空值较多（空值占比 {:.1f}%），可能影响分析结果".format((1 - non_empty_count/len(df))*100))
             
-            if validation_passed and st.button("🚀 开始情感分析", type="primary"):
-                with st.spinner("正在进行细粒度情感分析..."):
-                    scores = []
-                    labels = []
-                    dim_analysis_list = []
-                    progress_bar = st.progress(0)
-                    
-                    for i, text in enumerate(df[content_col].fillna("")):
-                        score, dim_analysis = calculate_sentiment_score(text, sentiment_dict)
-                        scores.append(score)
-                        labels.append(get_sentiment_label(score))
-                        dim_analysis_list.append(dim_analysis)
-                        progress_bar.progress((i+1)/len(df))
-                    
-                    df['情感得分'] = scores
-                    df['情感标签'] = labels
-                    for dim in sentiment_dict['dimensions'].keys():
-                        df[f'{dim}维度得分'] = [d.get(dim, 5.0) for d in dim_analysis_list]
-                    
-                    st.session_state.df = df
-                    st.session_state.analyzed = True
-                    st.session_state.dim_analysis = dim_analysis_list
-                    progress_bar.empty()
-                
-                st.success("✅ 情感分析完成！")
-                
-                st.subheader("📊 核心分析结果")
-                col1, col2, col3, col4, col5 = st.columns(5)
-                avg_score = np.mean(scores)
-                col1.metric("平均情感得分", f"{avg_score:.2f}/10")
-                col2.metric("非常积极占比", f"{sum(1 for l in labels if l == '非常积极')/len(labels)*100:.1f}%")
-                col3.metric("积极占比", f"{sum(1 for l in labels if l == '积极')/len(labels)*100:.1f}%")
-                col4.metric("中性占比", f"{sum(1 for l in labels if l == '中性')/len(labels)*100:.1f}%")
-                col5.metric("消极占比", f"{sum(1 for l in labels if l == '消极')/len(labels)*100:.1f}%")
-                
-                st.subheader("📈 各维度平均情感得分")
-                dim_avg_scores = {}
-                for dim in sentiment_dict['dimensions'].keys():
-                    dim_avg_scores[dim] = round(df[f'{dim}维度得分'].mean(), 2)
-                
-                dim_cols = st.columns(len(dim_avg_scores))
-                for idx, (dim, score) in enumerate(dim_avg_scores.items()):
-                    with dim_cols[idx]:
-                        st.metric(f"{dim}维度", score)
-                        st.progress(score/10)
-                
-                with st.expander("📋 查看前20条分析结果（含维度得分）", expanded=True):
-                    display_cols = [content_col, '情感得分', '情感标签'] + [f'{dim}维度得分' for dim in sentiment_dict['dimensions'].keys()]
-                    st.dataframe(df[display_cols].head(20), use_container_width=True)
-                
-                @st.cache_data
-                def convert_df_to_csv(df):
-                    return df.to_csv(index=False, encoding='utf-8-sig').encode('utf-8-sig')
+            analysis_key = (dataset_key, content_col, scorer_key(sentiment_dict), 'stream' if stream_mode else 'full',
+                            near_dup_threshold)
+            result = get_dataset_store().get(analysis_key)
+            
+            job = get_job_manager().get(analysis_key)
+            
+            if result is None and job is not None and job.running:
+                # 分析在后台任务中进行（可能由其他上传了同一文件的会话发起）
+                render_job_progress(job)
+                progress_job = job
+            elif validation_passed:
+                if job is not None and job.status == 'failed':
+                    st.error(f"❌ 后台分析任务失败：{job.error}（已完成的块保留在检查点中，可继续分析）")
+                saved = saved_progress(analysis_key) if result is None else None
+                if saved is not None and saved['finished']:
+                    start_label = "📂 载入已完成的分析结果"
+                elif saved is not None and saved['done_chunks']:
+                    done = f"{saved['done_chunks']}/{saved['total_chunks']} 块" if saved['total_chunks'] else f"{saved['rows']} 行"
+                    start_label = f"▶️ 继续分析（已完成 {done}）"
+                else:
+                    start_label = "🚀 开始情感分析"
                 
-                csv_data = convert_df_to_csv(df)
-                st.download_button(
-                    label="📥 下载分析结果（CSV）",
-                    data=csv_data,
-                    file_name=f"电商评论情感分析结果_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                    mime="text/csv"
-                )
+                if st.button(start_label, type="primary"):
+                    # 上传的文件对象会被页面重跑读取，流式任务读取落盘的副本
+                    job_source = str(spill_upload(uploaded, dataset_key)) if stream_mode and not local_path else source
+                    get_job_manager().submit(
+                        analysis_key,
+                        partial(run_analysis_job, analysis_key=analysis_key, source=job_source, df=df, sheet=sheet,
+                                content_col=content_col, lexicon=sentiment_dict, workers=int(scoring_workers),
+                                use_cache=use_score_cache, progressive=st.session_state.progressive),
+                        on_done=partial(store_analysis_result, analysis_key, data_key),
+                        recorder=perf
+                    )
+                    st.session_state.job_key = analysis_key
+                    st.rerun()
+            
+            if result is not None:
+                if job is not None and job.status == 'done':
+                    resumed = f"，其中 {job.resumed_chunks} 块从检查点恢复" if job.resumed_chunks else ""
+                    st.success(f"✅ 情感分析完成！共 {result['rows']} 条评论（后台任务用时 {job.elapsed:.1f} 秒{resumed}）")
+                publish_analysis(result, content_col)
+                render_analysis_result(result, content_col, dim_names)
+            elif not stream_mode:
+                st.session_state.analyzed = False
+                st.session_state.content_col = content_col
         
         except Exception as e:
             st.error(f"❌ 处理失败：{str(e)}")
             st.info("💡 常见问题：1. 文件编码问题 2. 列名特殊字符 3. 文件损坏")
+    
+    elif session_job is not None and session_job.running:
+        # 切换页面后上传控件会被清空：本会话提交的任务仍在后台运行时继续显示进度
+        st.info("📂 本会话提交的分析任务正在后台运行（切换页面或刷新不影响任务），完成后结果会显示在这里")
+        render_job_progress(session_job)
+        progress_job = session_job
+    
+    elif st.session_state.analysis_key is not None:
+        # 切换页面后上传控件会被清空：直接展示本会话最近一次的分析结果，无需重新上传解析
+        result = get_dataset_store().get(st.session_state.analysis_key)
+        if result is not None:
+            st.info("📂 以下为本会话最近一次的分析结果（重新上传相同文件会直接复用，无需重新解析）")
+            render_analysis_result(result, st.session_state.content_col, dim_names)
 
 elif page == "📈 可视化中心":
-    if not st.session_state.analyzed:
-        st.warning("⚠️ 请先上传并分析数据")
+    result = session_result()
+    if result is None:
+        missing_result_warning()
     else:
-        df = st.session_state.df
+        df = result['df']
+        result_columns = result['columns']
         content_col = st.session_state.content_col
         
         viz_type = st.selectbox(
             "选择可视化类型", 
             ["情感分布饼图", "情感得分直方图", "维度情感雷达图", 
-             "评论长度分析", "情感词云图", "维度得分对比","月度情感走势"]
+             "评论长度分析", "情感词云图", "维度得分对比","情感走势"]
         )
         
         if viz_type == "情感分布饼图":
             st.subheader("情感标签分布")
-            counts = df['情感标签'].value_counts()
-            colors = [LABEL_COLORS.get(k, '#3498db') for k in counts.index]
-            
-            fig, ax = plt.subplots(figsize=(8, 6))
-            wedges, texts, autotexts = ax.pie(
-                counts.values, 
-                labels=counts.index, 
-                autopct='%1.1f%%', 
-                colors=colors, 
-                startangle=90,
-                textprops={'fontsize': 10}
-            )
-            for autotext in autotexts:
-                autotext.set_color('white')
-                autotext.set_fontweight('bold')
             
-            ax.set_title('电商评论情感分布', fontsize=14, fontweight='bold')
-            st.pyplot(fig)
+            def draw_pie():
+                counts = result_columns.label_counts()
+                colors = [LABEL_COLORS.get(k, '#3498db') for k in counts.index]
+                
+                fig, ax = plt.subplots(figsize=(8, 6))
+                wedges, texts, autotexts = ax.pie(
+                    counts.values, 
+                    labels=counts.index, 
+                    autopct='%1.1f%%', 
+                    colors=colors, 
+                    startangle=90,
+                    textprops={'fontsize': 10}
+                )
+                for autotext in autotexts:
+                    autotext.set_color('white')
+                    autotext.set_fontweight('bold')
+                
+                ax.set_title('电商评论情感分布', fontsize=14, fontweight='bold')
+                return fig
+            
+            show_chart(viz_type, draw_pie)
         
         elif viz_type == "情感得分直方图":
             st.subheader("情感得分分布")
-            fig, ax = plt.subplots(figsize=(10, 5))
-            
-            n, bins, patches = ax.hist(df['情感得分'], bins=20, color='skyblue', edgecolor='black', alpha=0.7)
-            
-            for i, patch in enumerate(patches):
-                if bins[i] >= 9.0:
-                    patch.set_facecolor('#2ecc71')
-                elif bins[i] >= 7.5:
-                    patch.set_facecolor('#27ae60')
-                elif bins[i] >= 6.0:
-                    patch.set_facecolor('#f1c40f')
-                elif bins[i] >= 4.5:
-                    patch.set_facecolor('#95a5a6')
-                else:
-                    patch.set_facecolor('#e67e22')
-            
-            mean_score = df['情感得分'].mean()
-            ax.axvline(mean_score, color='red', linestyle='--', linewidth=2, label=f'均值: {mean_score:.2f}')
             
-            ax.set_xlabel('情感得分（1-10分）', fontsize=12)
-            ax.set_ylabel('评论数量', fontsize=12)
-            ax.set_title('情感得分分布直方图', fontsize=14, fontweight='bold')
-            ax.legend()
-            ax.grid(True, alpha=0.3)
+            def draw_histogram():
+                # 先分箱计数，matplotlib 只画 20 根柱子
+                counts, edges = histogram_counts(result_columns.scores, bins=20)
+                fig, ax = plt.subplots(figsize=(10, 5))
+                
+                n, bins, patches = ax.hist(edges[:-1], bins=edges, weights=counts, color='skyblue', edgecolor='black', alpha=0.7)
+                
+                for i, patch in enumerate(patches):
+                    if bins[i] >= 9.0:
+                        patch.set_facecolor('#2ecc71')
+                    elif bins[i] >= 7.5:
+                        patch.set_facecolor('#27ae60')
+                    elif bins[i] >= 6.0:
+                        patch.set_facecolor('#f1c40f')
+                    elif bins[i] >= 4.5:
+                        patch.set_facecolor('#95a5a6')
+                    else:
+                        patch.set_facecolor('#e67e22')
+                
+                mean_score = result_columns.mean_score()
+                ax.axvline(mean_score, color='red', linestyle='--', linewidth=2, label=f'均值: {mean_score:.2f}')
+                
+                ax.set_xlabel('情感得分（1-10分）', fontsize=12)
+                ax.set_ylabel('评论数量', fontsize=12)
+                ax.set_title('情感得分分布直方图', fontsize=14, fontweight='bold')
+                ax.legend()
+                ax.grid(True, alpha=0.3)
+                return fig
             
-            st.pyplot(fig)
+            show_chart(viz_type, draw_histogram, bins=20)
         
         elif viz_type == "维度情感雷达图":
             st.subheader("各维度平均情感得分雷达图")
             
-            dim_scores = []
-            dim_labels = []
-            for dim in sentiment_dict['dimensions'].keys():
-                dim_score = df[f'{dim}维度得分'].mean()
-                dim_scores.append(dim_score)
-                dim_labels.append(dim)
-            
-            fig, ax = plt.subplots(figsize=(8, 8), subplot_kw=dict(projection='polar'))
-            
-            angles = np.linspace(0, 2 * np.pi, len(dim_labels), endpoint=False).tolist()
-            dim_scores += dim_scores[:1]
-            angles += angles[:1]
-            dim_labels += dim_labels[:1]
-            
-            ax.plot(angles, dim_scores, 'o-', linewidth=2, color='#3498db')
-            ax.fill(angles, dim_scores, alpha=0.25, color='#3498db')
-            
-            ax.set_xticks(angles[:-1])
-            ax.set_xticklabels(dim_labels[:-1], fontsize=10)
-            ax.set_ylim(0, 10)
-            ax.set_yticks(np.arange(2, 11, 2))
-            ax.set_title('电商评论各维度情感得分', fontsize=14, fontweight='bold', pad=20)
-            ax.grid(True)
+            def draw_radar():
+                dim_scores = []
+                dim_labels = []
+                for dim in result_columns.dim_names:
+                    dim_score = result_columns.dimension_mean(dim)
+                    dim_scores.append(dim_score)
+                    dim_labels.append(dim)
+                
+                fig, ax = plt.subplots(figsize=(8, 8), subplot_kw=dict(projection='polar'))
+                
+                angles = np.linspace(0, 2 * np.pi, len(dim_labels), endpoint=False).tolist()
+                dim_scores += dim_scores[:1]
+                angles += angles[:1]
+                dim_labels += dim_labels[:1]
+                
+                ax.plot(angles, dim_scores, 'o-', linewidth=2, color='#3498db')
+                ax.fill(angles, dim_scores, alpha=0.25, color='#3498db')
+                
+                ax.set_xticks(angles[:-1])
+                ax.set_xticklabels(dim_labels[:-1], fontsize=10)
+                ax.set_ylim(0, 10)
+                ax.set_yticks(np.arange(2, 11, 2))
+                ax.set_title('电商评论各维度情感得分', fontsize=14, fontweight='bold', pad=20)
+                ax.grid(True)
+                return fig
             
-            st.pyplot(fig)
+            show_chart(viz_type, draw_radar)
         
         elif viz_type == "评论长度分析":
             st.subheader("评论长度与情感得分关系")
             
-            df['评论长度'] = df[content_col].astype(str).apply(len)
-            
-            fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 5))
+            # 箱线图用分组分位数、散点图超过上限时均匀抽样，汇总结果按分析结果缓存
+            summary = length_summary(st.session_state.analysis_key, df[content_col], result_columns)
             
-            df.boxplot(column='评论长度', by='情感标签', ax=ax1, patch_artist=True)
-            ax1.set_title('各情感标签评论长度分布', fontsize=12)
-            ax1.set_xlabel('情感标签', fontsize=10)
-            ax1.set_ylabel('评论长度（字符数）', fontsize=10)
-            ax1.grid(True, alpha=0.3)
-            
-            scatter = ax2.scatter(
-                df['评论长度'], 
-                df['情感得分'], 
-                alpha=0.5, 
-                c=[LABEL_COLORS.get(label, '#3498db') for label in df['情感标签']]
-            )
-            ax2.set_xlabel('评论长度（字符数）', fontsize=10)
-            ax2.set_ylabel('情感得分', fontsize=10)
-            ax2.set_title('评论长度 vs 情感得分', fontsize=12)
-            ax2.grid(True, alpha=0.3)
-            ax2.axhline(y=7, color='green', linestyle='--', alpha=0.5, label='积极阈值')
-            ax2.axhline(y=4.5, color='red', linestyle='--', alpha=0.5, label='消极阈值')
-            ax2.legend()
+            def draw_length():
+                fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 5))
+                
+                boxes = ax1.bxp(summary['box_stats'], patch_artist=True)
+                for patch, stats in zip(boxes['boxes'], summary['box_stats']):
+                    patch.set_facecolor(LABEL_COLORS.get(stats['label'], '#3498db'))
+                    patch.set_alpha(0.6)
+                ax1.set_title('各情感标签评论长度分布', fontsize=12)
+                ax1.set_xlabel('情感标签', fontsize=10)
+                ax1.set_ylabel('评论长度（字符数）', fontsize=10)
+                ax1.grid(True, alpha=0.3)
+                
+                scatter = ax2.scatter(
+                    summary['point_lengths'], 
+                    summary['point_scores'], 
+                    alpha=0.5, 
+                    c=summary['point_colors']
+                )
+                ax2.set_xlabel('评论长度（字符数）', fontsize=10)
+                ax2.set_ylabel('情感得分', fontsize=10)
+                if len(summary['points']) < summary['rows']:
+                    ax2.set_title(f"评论长度 vs 情感得分（随机抽样 {len(summary['points'])}/{summary['rows']} 条）", fontsize=12)
+                else:
+                    ax2.set_title('评论长度 vs 情感得分', fontsize=12)
+                ax2.grid(True, alpha=0.3)
+                ax2.axhline(y=7, color='green', linestyle='--', alpha=0.5, label='积极阈值')
+                ax2.axhline(y=4.5, color='red', linestyle='--', alpha=0.5, label='消极阈值')
+                ax2.legend()
+                return fig
             
-            st.pyplot(fig)
+            show_chart(viz_type, draw_length, max_points=len(summary['points']))
             
-            corr = df['评论长度'].corr(df['情感得分'])
+            corr = summary['corr']
             st.info(f"📊 评论长度与情感得分的相关系数：**{corr:.3f}**")
             if corr > 0.1:
                 st.success("✅ 评论越长，情感越积极（弱正相关）")
@@ -545,152 +935,212 @@ elif page == "📈 可视化中心":
         
         # 5. 情感词云图 - 修复版（修复 collocation 参数 + 保留 Emoji）
         elif viz_type == "情感词云图":  
+            # 词频直接来自分析时保存的分词结果，不再对整列文本重新分词
+            token_store = result['tokens']
+            stop_words = {'的', '了', '在', '是', '我', '有', '和', '就', '不', '人', '都', 
+                         '一', '上', '也', '很', '到', '说', '要', '去', '你', '会', '着',
+                         '没有', '看', '好', '自己', '这', '那', '他', '她', '它', '们',
+                         '这个', '一个', '可以', '就是', '非常', '已经', '现在', '觉得',
+                         '还是', '因为', '所以', '如果', '还', '把', '被', '让', '给'}
+            # 与 WordCloud.generate 的默认切词口径一致：只保留两个字及以上的纯中文词
+            chinese_word = re.compile(r'[\u4e00-\u9fa5]{2,}')
+            def count_words():
+                with perf.stage('viz.word_frequencies'):
+                    return token_store.frequency_dict(
+                        keep=lambda w: w not in stop_words and chinese_word.fullmatch(w) is not None
+                    )
+            frequencies = get_dataset_store().derived(st.session_state.analysis_key, 'word_frequencies', count_words)
+            
             # 检查字体文件
             if not FONT_PATH or not os.path.isfile(FONT_PATH):
                 st.error("❌ 未找到中文字体文件 (simhei.ttf)")
                 st.info("💡 解决方案：请确保 simhei.ttf 已上传到项目根目录")
             else:
                 try:
-                    text = df[content_col].astype(str).str.cat(sep=' ')
-                    
-                    # 修复：保留中文和 Emoji（Unicode Emoji 范围）
-                    # \u4e00-\u9fa5 是中文字符
-                    # \U0001F300-\U0001F9FF 是 Emoji 字符
-                    text = re.sub(r'[^\u4e00-\u9fa5\U0001F300-\U0001F9FF\U0001F600-\U0001F64F\U0001F680-\U0001F6FF\U0001F1E0-\U0001F1FF\u2600-\u26FF\u2700-\u27BF]', ' ', text)
-                    
-                    stop_words = {'的', '了', '在', '是', '我', '有', '和', '就', '不', '人', '都', 
-                                 '一', '上', '也', '很', '到', '说', '要', '去', '你', '会', '着',
-                                 '没有', '看', '好', '自己', '这', '那', '他', '她', '它', '们',
-                                 '这个', '一个', '可以', '就是', '非常', '已经', '现在', '觉得',
-                                 '还是', '因为', '所以', '如果', '还', '把', '被', '让', '给'}                
-                    
-                    words = [w for w in jieba.lcut(text) if len(w) > 1 or (len(w) == 1 and ord(w[0]) > 255)]                
-                    words = [w for w in words if w not in stop_words]
-                    
-                    if words and len(words) > 0:
-                        # 修复：使用正确的参数名 collocations（复数）
-                        wc = WordCloud(
-                            width=1000, 
-                            height=600, 
-                            background_color='white',
-                            font_path=FONT_PATH,
-                            max_words=150,
-                            collocations=False,  # 修复：改为复数形式
-                            random_state=42,
-                            prefer_horizontal=0.7,
-                            min_font_size=10,
-                            max_font_size=100
-                        ).generate(' '.join(words))
+                    if frequencies:
+                        def draw_wordcloud():
+                            # 修复：使用正确的参数名 collocations（复数）
+                            wc = WordCloud(
+                                width=1000, 
+                                height=600, 
+                                background_color='white',
+                                font_path=FONT_PATH,
+                                max_words=150,
+                                collocations=False,  # 修复：改为复数形式
+                                random_state=42,
+                                prefer_horizontal=0.7,
+                                min_font_size=10,
+                                max_font_size=100
+                            ).generate_from_frequencies(frequencies)
+                            
+                            fig, ax = plt.subplots(figsize=(12, 6))
+                            ax.imshow(wc, interpolation='bilinear')
+                            ax.axis('off')
+                            ax.set_title('评论词云图', fontsize=16, fontweight='bold')
+                            return fig
                         
-                        fig, ax = plt.subplots(figsize=(12, 6))
-                        ax.imshow(wc, interpolation='bilinear')
-                        ax.axis('off')
-                        ax.set_title('评论词云图', fontsize=16, fontweight='bold')
-                        st.pyplot(fig)
+                        show_chart(viz_type, draw_wordcloud, max_words=150)
                         
-                        st.success(f"✅ 词云生成成功！共 {len(words)} 个词")
+                        st.success(f"✅ 词云生成成功！共 {sum(frequencies.values())} 个词")
                     else:
                         st.warning("⚠️ 词频不足，无法生成词云")
                         
                 except Exception as e:
                     st.error(f"❌ 词云生成失败：{str(e)}")
                     st.info("💡 可能原因：字体文件损坏、WordCloud版本过低（请升级：pip install --upgrade wordcloud）")
+            
+            if frequencies:
+                st.subheader("🔍 关键词下钻")
+                top_words = sorted(frequencies, key=frequencies.get, reverse=True)[:50]
+                keyword = st.selectbox("选择高频词", top_words, format_func=lambda w: f"{w}（{frequencies[w]} 次）")
+                with perf.stage('viz.keyword_rows'):
+                    mask = token_store.rows_containing(keyword)
+                rows = np.flatnonzero(mask)
+                col1, col2, col3 = st.columns(3)
+                col1.metric("包含该词的评论", f"{len(rows)} 条")
+                col2.metric("平均情感得分", f"{result_columns.scores[mask].mean():.2f}/10")
+                col3.metric("消极占比", f"{np.mean(result_columns.labels[mask] == '消极')*100:.1f}%")
+                sample = df[[content_col]].iloc[rows[:20]].reset_index(drop=True)
+                sample['情感得分'] = result_columns.scores[rows[:20]]
+                sample['情感标签'] = np.asarray(result_columns.labels)[rows[:20]]
+                st.dataframe(sample, use_container_width=True)
         
         elif viz_type == "维度得分对比":
             st.subheader("各维度情感得分对比")
             
-            dim_scores = []
-            dim_labels = []
-            for dim in sentiment_dict['dimensions'].keys():
-                dim_scores.append(df[f'{dim}维度得分'].mean())
-                dim_labels.append(dim)
-            
-            fig, ax = plt.subplots(figsize=(10, 6))
-            bars = ax.bar(dim_labels, dim_scores, color=['#3498db', '#e74c3c', '#2ecc71', '#f39c12', '#9b59b6', '#1abc9c', '#e67e22'])
-            
-            for bar in bars:
-                height = bar.get_height()
-                ax.text(bar.get_x() + bar.get_width()/2., height + 0.1,
-                        f'{height:.2f}', ha='center', va='bottom', fontsize=9)
-            
-            ax.set_xlabel('电商维度', fontsize=12)
-            ax.set_ylabel('平均情感得分（1-10分）', fontsize=12)
-            ax.set_ylim(0, 10)
-            ax.set_title('各维度情感得分对比', fontsize=14, fontweight='bold')
-            ax.grid(True, alpha=0.3, axis='y')
-            
-            plt.xticks(rotation=45, ha='right')
-            plt.tight_layout()
+            def draw_dimension_bars():
+                dim_scores = []
+                dim_labels = []
+                for dim in result_columns.dim_names:
+                    dim_scores.append(result_columns.dimension_mean(dim))
+                    dim_labels.append(dim)
+                
+                fig, ax = plt.subplots(figsize=(10, 6))
+                bars = ax.bar(dim_labels, dim_scores, color=['#3498db', '#e74c3c', '#2ecc71', '#f39c12', '#9b59b6', '#1abc9c', '#e67e22'])
+                
+                for bar in bars:
+                    height = bar.get_height()
+                    ax.text(bar.get_x() + bar.get_width()/2., height + 0.1,
+                            f'{height:.2f}', ha='center', va='bottom', fontsize=9)
+                
+                ax.set_xlabel('电商维度', fontsize=12)
+                ax.set_ylabel('平均情感得分（1-10分）', fontsize=12)
+                ax.set_ylim(0, 10)
+                ax.set_title('各维度情感得分对比', fontsize=14, fontweight='bold')
+                ax.grid(True, alpha=0.3, axis='y')
+                
+                plt.xticks(rotation=45, ha='right')
+                plt.tight_layout()
+                return fig
             
-            st.pyplot(fig)
+            show_chart(viz_type, draw_dimension_bars)
             
-        elif viz_type == "月度情感走势":
-            st.subheader("月度平均情感得分走势")
+        elif viz_type == "情感走势":
+            st.subheader("平均情感得分走势")
             
-            required_cols = ['商品属性', '情感得分']
-            if not all(col in df.columns for col in required_cols):
-                st.warning("⚠️ 数据缺少必要列（需包含'商品属性'和'情感得分'）")
+            time_index = result['time_index']
+            if time_index is None:
+                st.warning("⚠️ 数据缺少必要列（需包含'商品属性'）")
                 st.stop()
             
-            def extract_date(text):
-                if pd.isna(text):
-                    return None
-                text_str = str(text).strip()
-                match = re.search(r'@(\d{4}年\d{1,2}月\d{1,2}日)', text_str)
-                if match:
-                    try:
-                        return pd.to_datetime(match.group(1), format='%Y年%m月%d日')
-                    except:
-                        return None
-                return None
-            
-            df_temp = df.copy()
-            df_temp['评论时间'] = df_temp['商品属性'].apply(extract_date)
-            valid_count = df_temp['评论时间'].notna().sum()
-            df_temp = df_temp.dropna(subset=['评论时间'])
-            
-            st.info(f"📊 日期提取结果：总评论{len(df)}条 | 有效日期{valid_count}条（{valid_count/len(df)*100:.1f}%）")
-            
-            if len(df_temp) == 0:
-                st.error("❌ 无有效日期数据，无法生成月度走势")
-                st.stop()
+            valid_count = time_index.dated_rows
+            st.info(f"📊 日期提取结果：总评论{time_index.rows}条 | 有效日期{valid_count}条（{valid_count/time_index.rows*100:.1f}%）")
             
-            df_temp['月份_dt'] = pd.to_datetime(df_temp['评论时间']).dt.to_period('M')
-            sent_month = df_temp.groupby('月份_dt')['情感得分'].mean() / 10
+            if valid_count == 0:
+                st.error("❌ 无有效日期数据，无法生成情感走势")
+                st.stop()
             
-            if len(sent_month) >= 1:
-                all_months = pd.period_range(start=sent_month.index.min(), end=sent_month.index.max(), freq='M')
-                sent_month = sent_month.reindex(all_months, fill_value=np.nan)
+            col1, col2 = st.columns([1, 2])
+            granularity = col1.radio("时间粒度", list(TREND_FREQS), index=2, horizontal=True)
+            trend_dims = col2.multiselect("叠加维度走势", list(time_index.dim_names))
             
-            sent_month.index = sent_month.index.astype(str)
+            # 由按天预聚合的加和量汇总到所选粒度，不再逐行扫描
+            trend = get_dataset_store().derived(st.session_state.analysis_key, f'trend.{granularity}',
+                                                partial(time_index.rollup, TREND_FREQS[granularity]))
+            period_name = {'日': '日期', '周': '周', '月': '月份'}[granularity]
+            sent_trend = trend['平均得分'] / 10
             
-            valid_month_count = sent_month.dropna().shape[0]
-            if valid_month_count < 2:
-                st.warning(f"⚠️ 仅{valid_month_count}个月份有有效数据")
+            valid_period_count = sent_trend.dropna().shape[0]
+            if valid_period_count < 2:
+                st.warning(f"⚠️ 仅{valid_period_count}个时段有有效数据")
                 st.stop()
             
-            plt.clf()
-            fig, ax = plt.subplots(figsize=(10, 5))
-            sent_month.plot(marker='o', color='teal', linewidth=2, markersize=6, ax=ax)
-            
-            ax.set_title('心相印评论月度平均情感得分走势', fontsize=14, fontweight='bold')
-            ax.set_ylabel('情感得分（归一化）', fontsize=12)
-            ax.set_xlabel('月份', fontsize=12)
-            ax.grid(True, linestyle='--', alpha=0.5)
-            ax.set_ylim(
-                bottom=sent_month.dropna().min() - 0.05,
-                top=sent_month.dropna().max() + 0.05
-            )
-            plt.xticks(rotation=45, ha='right')
-            plt.tight_layout()
+            def draw_trend():
+                fig, ax = plt.subplots(figsize=(10, 5))
+                sent_trend.plot(marker='o', color='teal', linewidth=2, markersize=6, ax=ax, label='整体')
+                lines = [sent_trend.dropna()]
+                for dim in trend_dims:
+                    dim_trend = trend[dim] / 10
+                    dim_trend.plot(marker='.', linewidth=1.2, alpha=0.8, ax=ax, label=f'{dim}维度')
+                    lines.append(dim_trend.dropna())
+                
+                ax.set_title(f'心相印评论{granularity}度平均情感得分走势', fontsize=14, fontweight='bold')
+                ax.set_ylabel('情感得分（归一化）', fontsize=12)
+                ax.set_xlabel(period_name, fontsize=12)
+                ax.grid(True, linestyle='--', alpha=0.5)
+                ax.set_ylim(
+                    bottom=min(line.min() for line in lines) - 0.05,
+                    top=max(line.max() for line in lines) + 0.05
+                )
+                if trend_dims:
+                    ax.legend()
+                plt.xticks(rotation=45, ha='right')
+                plt.tight_layout()
+                return fig
             
-            st.pyplot(fig)
-            st.success("✅ 月度情感走势图表生成成功！")
+            show_chart(viz_type, draw_trend, granularity=granularity, dims=tuple(trend_dims))
+            st.success(f"✅ {granularity}度情感走势图表生成成功！")
             
             st.info(f"🔍 关键结论：")
-            st.info(f"- 情感最高月份：{sent_month.idxmax()}（得分：{sent_month.max():.3f}）")
-            st.info(f"- 情感最低月份：{sent_month.idxmin()}（得分：{sent_month.min():.3f}）")
-            st.info(f"- 整体平均得分：{sent_month.mean():.3f}")
+            st.info(f"- 情感最高{period_name}：{sent_trend.idxmax()}（得分：{sent_trend.max():.3f}）")
+            st.info(f"- 情感最低{period_name}：{sent_trend.idxmin()}（得分：{sent_trend.min():.3f}）")
+            st.info(f"- 整体平均得分：{sent_trend.mean():.3f}")
+
+elif page == "🔎 评论检索":
+    result = session_result()
+    review_index = result['review_index'] if result is not None else None
+    if review_index is None:
+        missing_result_warning("⚠️ 请先上传并分析数据（流式分析模式的结果不在内存中，不支持检索）")
+    else:
+        df = result['df']
+        content_col = st.session_state.content_col
+        
+        keywords = st.text_input(
+            "关键词",
+            placeholder="物流 破损|损坏 -退货",
+            help="按子串匹配评论内容；空格分隔的各组须同时满足，组内用 | 表示任一，- 前缀表示排除"
+        )
+        col1, col2 = st.columns(2)
+        labels = col1.multiselect("情感标签（任一）", SENTIMENT_LABELS)
+        dimensions = col2.multiselect("涉及维度（全部）", list(review_index.columns.dim_names))
+        col1, col2 = st.columns(2)
+        score_range = col1.slider("情感得分区间", min_value=1.0, max_value=10.0, value=(1.0, 10.0), step=0.1)
+        dimension_range = col2.slider("所选维度的得分区间", min_value=1.0, max_value=10.0, value=(1.0, 10.0), step=0.1,
+                                      disabled=not dimensions)
+        col1, col2 = st.columns(2)
+        page_size = col1.selectbox("每页条数", [20, 50, 100, 200], index=1)
+        
+        # 各条件在索引上求行位图，只取回当前页的行
+        started = time.perf_counter()
+        with perf.stage('explore.query', rows=review_index.n_rows):
+            bits = review_index.query(
+                keywords, labels, dimensions,
+                score_range=score_range if score_range != (1.0, 10.0) else None,
+                dimension_range=dimension_range if dimension_range != (1.0, 10.0) else None
+            )
+            total = review_index.count(bits)
+        n_pages = max(1, -(-total // page_size))
+        page_no = col2.number_input(f"页码（共 {n_pages} 页）", min_value=1, max_value=n_pages, value=1)
+        with perf.stage('explore.page', rows=page_size):
+            rows = review_index.rows(bits, (page_no - 1) * page_size, page_no * page_size)
+            page_frame = review_index.frame(df, rows, content_col)
+        elapsed = time.perf_counter() - started
+        
+        st.caption(f"🔎 命中 {total} 条 / 共 {review_index.n_rows} 条评论，查询用时 {elapsed*1000:.1f} 毫秒")
+        if total:
+            st.dataframe(page_frame, use_container_width=True, hide_index=True)
+        else:
+            st.info("💡 没有符合条件的评论，可以放宽关键词或筛选条件")
 
 elif page == "🤖 单条预测":
     st.header("实时情感预测（单条评论）")
@@ -706,7 +1156,7 @@ elif page == "🤖 单条预测":
     
     if st.button("🚀 分析情感", type="primary"):
         if text:
-            score, dim_analysis = calculate_sentiment_score(text, sentiment_dict)
+            score, dim_analysis, trace = calculate_sentiment_score(text, sentiment_dict, return_trace=True)
             label = get_sentiment_label(score)
             
             col1, col2, col3 = st.columns(3)
@@ -738,38 +1188,86 @@ elif page == "🤖 单条预测":
                         st.progress(dim_score/10)
             
             with st.expander("🔍 查看详细分析", expanded=True):
-                words = jieba.lcut(text)
+                # 与评分相同的分词器（已登记词典中的多字词条）
+                words = load_jieba().lcut(text)
                 st.write(f"分词结果：{', '.join(words)}")
                 
-                sentiment_words_found = []
-                for sentiment_type, word_dict in sentiment_dict['sentiment'].items():
-                    for word, s_score in word_dict.items():
-                        if word in text:
-                            sentiment_words_found.append(f"{word}（得分：{s_score}）")
+                # 直接复用评分时的自动机命中轨迹，不再逐个词条扫描全文
+                found = {'sentiment': {}, 'negation': {}, 'degree': {}, 'dimension': {}}
+                for start, end, kind, word, value in trace:
+                    if kind in found:
+                        found[kind].setdefault(word, value)
+                sentiment_words_found = [f"{word}（得分：{s_score}）" for word, s_score in found['sentiment'].items()]
                 
                 if sentiment_words_found:
                     st.write(f"识别到的情感词：{', '.join(sentiment_words_found)}")
                 else:
                     st.write("未识别到明显情感词，情感得分为中性基准分。")
                 
-                neg_words_found = [w for w in sentiment_dict['negations'].keys() if w in text]
-                degree_words_found = [w for w in sentiment_dict['degrees'].keys() if w in text]
+                neg_words_found = list(found['negation'])
+                degree_words_found = list(found['degree'])
+                dim_words_found = [f"{word}（{dim}）" for word, dim in found['dimension'].items()]
                 
                 if neg_words_found:
                     st.write(f"识别到的否定词：{', '.join(neg_words_found)}（已反转情感得分）")
                 if degree_words_found:
                     st.write(f"识别到的程度副词：{', '.join(degree_words_found)}（已调整情感强度）")
+                if dim_words_found:
+                    st.write(f"识别到的维度词：{', '.join(dim_words_found)}")
         else:
             st.warning("⚠️ 请输入评论内容后再进行分析！")
 
 elif page == "📋 词典管理":
     st.header("电商情感词典管理")
+    st.caption("修改只作用于本会话；已有分析结果时只重新评分含被修改词条的评论，无需重新分析整份数据")
+    
+    # 词典修改后会重跑页面，使词表和提示都基于新词典；修改结果在重跑后显示
+    if 'lexicon_notice' in st.session_state:
+        report_lexicon_switch(st.session_state.pop('lexicon_notice')['stats'])
+    
+    default_dict = get_sentiment_dict()
+    if default_dict.origin is not None:
+        sources = default_dict.origin['sources']
+        st.caption(f"词典编译产物：{default_dict.origin['entries']} 个词条，其中 {default_dict.origin['jieba_words']} 个多字词条已登记为整体切分；"
+                   + (f"外部词典源 {len(sources)} 个：{'、'.join(Path(source).name for source in sources)}" if sources else "仅内置词典"))
+    
+    if sentiment_dict.fingerprint != default_dict.fingerprint:
+        col1, col2 = st.columns([3, 1])
+        col1.info(f"📝 当前会话词典相对内置词典修改了 {count_changes(default_dict, sentiment_dict)} 个词条")
+        if col2.button("↩️ 恢复内置词典"):
+            with st.spinner("正在恢复内置词典并更新分析结果..."):
+                st.session_state.lexicon_notice = {'stats': switch_lexicon(default_dict)}
+            st.rerun()
     
     dict_type = st.selectbox(
         "选择词典类型",
         ["核心情感词", "电商维度词", "否定词", "程度副词", "明确模式"]
     )
     
+    with st.expander("✏️ 编辑词条", expanded=False):
+        try:
+            if dict_type == "核心情感词":
+                edited = lexicon_edit_form('sentiment', "强度分层", list(sentiment_dict['sentiment']), "情感得分（0-10）", 5.0)
+            elif dict_type == "电商维度词":
+                edited = lexicon_edit_form('dimensions', "所属维度", list(sentiment_dict['dimensions']))
+            elif dict_type == "否定词":
+                edited = lexicon_edit_form('negations', value_label="反转权重", default=-1.0)
+            elif dict_type == "程度副词":
+                edited = lexicon_edit_form('degrees', value_label="强度权重", default=1.0)
+            else:
+                edited = lexicon_edit_form('explicit', value_label="直接得分（0-10）", default=5.0)
+        except ValueError as e:
+            st.error(f"❌ {str(e)}")
+            edited = None
+        
+        if edited is not None:
+            if edited.fingerprint == sentiment_dict.fingerprint:
+                st.info("💡 词典没有变化")
+            else:
+                with st.spinner("正在更新词典并增量重新评分..."):
+                    st.session_state.lexicon_notice = {'stats': switch_lexicon(edited)}
+                st.rerun()
+    
     if dict_type == "核心情感词":
         st.subheader("核心情感词（带强度评分）")
         for sentiment_type, word_dict in sentiment_dict['sentiment'].items():
@@ -807,6 +1305,56 @@ elif page == "📋 词典管理":
             mime="application/json"
         )
 
+# ==========================================
+# 性能面板：本会话各阶段的调用次数、耗时、吞吐和计数器，可导出为 JSON / Prometheus 文本
+# ==========================================
+
+def render_perf_panel(recorder):
+    snapshot = recorder.snapshot()
+    if not snapshot['stages'] and not snapshot['counters']:
+        st.caption("暂无记录：上传、分析或查看图表后即可看到各阶段耗时")
+        return
+    
+    rows = []
+    for name, stat in sorted(snapshot['stages'].items()):
+        rows.append({
+            '阶段': name,
+            '次数': stat['calls'],
+            '总耗时(s)': round(stat['seconds'], 3),
+            '平均(ms)': round(stat['seconds'] / stat['calls'] * 1000, 1),
+            '最近(ms)': round(stat['last_seconds'] * 1000, 1),
+            '吞吐': '，'.join(f"{rate:,.0f} {unit.replace('_per_second', '')}/s" for unit, rate in stat['rates'].items())
+        })
+    st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+    st.caption("多进程评分时 score.tokenize / score.lookup / score.kernel 为各 worker 累计耗时")
+    
+    counters = snapshot['counters']
+    if counters.get('cache.score_lookups'):
+        st.caption(f"评分缓存命中率：{counters.get('cache.score_hits', 0) / counters['cache.score_lookups'] * 100:.1f}%")
+    if counters:
+        st.dataframe(pd.DataFrame(sorted(counters.items()), columns=['计数器', '值']), hide_index=True, use_container_width=True)
+    
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    col1, col2 = st.columns(2)
+    col1.download_button("📥 JSON", data=recorder.to_json(), file_name=f"perf_{stamp}.json", mime="application/json")
+    col2.download_button("📥 Prometheus", data=recorder.to_prometheus(), file_name=f"perf_{stamp}.prom", mime="text/plain")
+    if st.button("🗑️ 清空记录"):
+        recorder.reset()
+        st.rerun()
+
+if perf_enabled:
+    with st.sidebar.expander("⏱️ 性能", expanded=False):
+        render_perf_panel(perf)
+
+store_stats = get_dataset_store().stats()
+st.sidebar.caption(f"🗄️ 共享数据：{store_stats['entries']} 项（{store_stats['referenced']} 项使用中），"
+                   f"{store_stats['nbytes'] / 1024 / 1024:.0f} / {store_stats['budget_bytes'] / 1024 / 1024:.0f} MB")
 st.sidebar.markdown("---")
 st.sidebar.info("基于深度学习的电商评论情感分析系统")
 st.sidebar.markdown("📅 更新时间：2026-02-01")
+
+if progress_job is not None:
+    # 整页渲染完后重跑：任务仍在进行时定时轮询进度；渲染期间已结束（完成 / 暂停 / 出错）时立即重跑一次显示最终状态，之后不再轮询
+    if progress_job.running:
+        time.sleep(JOB_POLL_SECONDS)
+    st.rerun()
@@ -0,0 +1,311 @@
+import gc
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import tempfile
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from sentiment_engine import (
+    SENTIMENT_LABELS,
+    DEFAULT_KERNEL,
+    SCORING_KERNELS,
+    load_integrated_sentiment_dict,
+    compile_sentiment_dict,
+    calculate_sentiment_score,
+    collapse_texts,
+    is_missing,
+    score_collapsed_parallel
+)
+from vector_kernel import segment_review, get_token_table, pack_tokens, lexicon_ids
+from analysis_result import ColumnarResult
+from chart_summary import histogram_counts, grouped_box_stats, sample_indices
+from time_index import TimeIndex, extract_review_dates
+from stream_analysis import clean_columns
+from review_corpus import generate_frame
+from result_export import write_csv, result_frames
+
+# ==========================================
+# 性能基准：用合成语料（review_corpus）分阶段计时 —— 上传解析 / 分词 / 词典查表 / 完整评分 /
+# 逐条参考实现 / 汇总 / 图表渲染 / 导出，每个规模各跑若干次取最小值
+# 结果写成 JSON，可与保存的基线比较，超过阈值的阶段视为性能回退（退出码 1）
+# 用法：
+#   python benchmark.py --sizes 10k,100k -o bench.json
+#   python benchmark.py --sizes 10k,100k --baseline bench_baseline.json --threshold 0.2
+# ==========================================
+
+RESULT_FORMAT_VERSION = 1
+DEFAULT_SIZES = '10k,100k,1m'
+STAGES = ('upload', 'upload_xlsx', 'tokenize', 'lookup', 'score', 'reference', 'aggregate', 'render', 'export')
+DEFAULT_STAGES = tuple(stage for stage in STAGES if stage != 'upload_xlsx')
+DEFAULT_THRESHOLD = 0.25
+MIN_COMPARE_SECONDS = 0.02     # 基线耗时低于此值的阶段噪声太大，不参与回退判定
+REFERENCE_MAX_ROWS = 20000     # 逐条参考实现只测前若干条不重复评论
+XLSX_MAX_ROWS = 100000         # 生成 Excel 本身很慢，更大的规模跳过 upload_xlsx
+CHART_DPI = 150
+
+def parse_size(text):
+    text = text.strip().lower()
+    for suffix, factor in (('k', 1000), ('m', 1000000)):
+        if text.endswith(suffix):
+            return int(float(text[:-1]) * factor)
+    return int(text)
+
+def timed(fn, repeat):
+    # 运行 repeat 次，返回 (每次耗时列表, 最后一次的返回值)
+    # 与 timeit 相同，计时期间关闭循环垃圾回收：大量分词结果列表会让 GC 扫描耗时随规模超线性增长，掩盖被测代码本身
+    seconds = []
+    result = None
+    enabled = gc.isenabled()
+    for _ in range(repeat):
+        result = None
+        gc.collect()
+        gc.disable()
+        try:
+            started = time.perf_counter()
+            result = fn()
+            seconds.append(time.perf_counter() - started)
+        finally:
+            if enabled:
+                gc.enable()
+    return seconds, result
+
+def render_charts(columns, texts):
+    # 与可视化中心相同的画法：先汇总（分箱 / 分位数 / 抽样），再交给 matplotlib 并输出 PNG
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    images = []
+    def save(fig):
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format='png', dpi=CHART_DPI, bbox_inches='tight')
+        plt.close(fig)
+        images.append(buffer.getvalue())
+
+    counts = columns.label_counts()
+    fig, ax = plt.subplots(figsize=(8, 6))
+    ax.pie(counts.values, labels=counts.index, autopct='%1.1f%%', startangle=90)
+    save(fig)
+
+    hist_counts, edges = histogram_counts(columns.scores, bins=20)
+    fig, ax = plt.subplots(figsize=(10, 5))
+    ax.hist(edges[:-1], bins=edges, weights=hist_counts, edgecolor='black', alpha=0.7)
+    save(fig)
+
+    lengths = texts.astype(str).str.len().to_numpy()
+    points = sample_indices(len(lengths))
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 5))
+    ax1.bxp(grouped_box_stats(lengths, columns.label_codes, SENTIMENT_LABELS), patch_artist=True)
+    ax2.scatter(lengths[points], columns.scores[points], alpha=0.5)
+    save(fig)
+    return images
+
+def export_csv(columns, df, path):
+    # 与页面导出相同：分块写到文件
+    write_csv(path, result_frames(columns, df))
+
+def run_size(n, stages, sentiment_dict, repeat=3, seed=0, workers=1, kernel=DEFAULT_KERNEL, log=print):
+    # 一个规模下依次运行各阶段；后面的阶段用前面阶段的产出（不计入耗时）
+    lexicon = compile_sentiment_dict(sentiment_dict)
+    df = generate_frame(n, seed)
+    texts = df['评论内容'].tolist()
+    records = []
+
+    def record(stage, seconds, items):
+        best = min(seconds)
+        records.append({
+            'rows': n, 'stage': stage, 'items': items, 'repeat': len(seconds),
+            'seconds': round(best, 6), 'median_seconds': round(statistics.median(seconds), 6),
+            'items_per_second': round(items / best, 1) if best > 0 else None
+        })
+        log(f"  {stage:<12} {best:9.3f}s  {items / best if best > 0 else 0:>14,.0f} 条/秒")
+
+    if 'upload' in stages:
+        csv_bytes = df.to_csv(index=False).encode('utf-8-sig')
+        seconds, _ = timed(lambda: clean_columns(pd.read_csv(io.BytesIO(csv_bytes), encoding='utf-8-sig')), repeat)
+        record('upload', seconds, n)
+        del csv_bytes
+
+    if 'upload_xlsx' in stages and n <= XLSX_MAX_ROWS:
+        from excel_ingest import read_workbook
+
+        buffer = io.BytesIO()
+        df.to_excel(buffer, index=False)
+        xlsx_bytes = buffer.getvalue()
+        seconds, _ = timed(lambda: read_workbook(xlsx_bytes), repeat)
+        record('upload_xlsx', seconds, n)
+        del buffer, xlsx_bytes
+
+    unique_texts, _ = collapse_texts(texts)
+    scorable = [str(text).lower() for text in unique_texts if not is_missing(text) and len(str(text).strip()) > 0]
+
+    if 'tokenize' in stages or 'lookup' in stages:
+        seconds, token_lists = timed(lambda: [segment_review(text) for text in scorable], repeat)
+        if 'tokenize' in stages:
+            record('tokenize', seconds, len(scorable))
+        if 'lookup' in stages:
+            table = get_token_table(lexicon)
+            seconds, _ = timed(lambda: lexicon_ids(*pack_tokens(token_lists)[:2], table.vocab), repeat)
+            record('lookup', seconds, len(scorable))
+        del token_lists
+
+    needs_result = any(stage in stages for stage in ('score', 'aggregate', 'render', 'export'))
+    if needs_result:
+        seconds, (unique_result, inverse) = timed(
+            lambda: score_collapsed_parallel(texts, lexicon, workers=workers, kernel=kernel),
+            repeat if 'score' in stages else 1
+        )
+        if 'score' in stages:
+            record('score', seconds, n)
+
+    if 'reference' in stages:
+        sample = scorable[:REFERENCE_MAX_ROWS]
+        seconds, _ = timed(lambda: [calculate_sentiment_score(text, lexicon) for text in sample], repeat)
+        record('reference', seconds, len(sample))
+
+    if needs_result:
+        def aggregate():
+            columns = ColumnarResult.from_unique(unique_result, inverse, lexicon.dimension_names)
+            summary = {
+                'avg_score': columns.mean_score(),
+                'label_ratios': {label: columns.label_ratio(label) for label in SENTIMENT_LABELS},
+                'dim_avg_scores': {dim: columns.dimension_mean(dim) for dim in lexicon.dimension_names}
+            }
+            trend = TimeIndex.build(extract_review_dates(df['商品属性']), columns).rollup('M')
+            return columns, summary, trend
+
+        seconds, (columns, _, _) = timed(aggregate, repeat)
+        if 'aggregate' in stages:
+            record('aggregate', seconds, n)
+        if 'render' in stages:
+            seconds, _ = timed(lambda: render_charts(columns, df['评论内容']), repeat)
+            record('render', seconds, n)
+        if 'export' in stages:
+            with tempfile.TemporaryDirectory() as export_dir:
+                path = os.path.join(export_dir, 'export.csv')
+                seconds, _ = timed(lambda: export_csv(columns, df, path), repeat)
+            record('export', seconds, n)
+    return records
+
+def environment_info():
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__
+    }
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD, stage_thresholds=None):
+    # 按 (规模, 阶段) 与基线逐项比较；耗时比 > 1 + 阈值记为回退
+    stage_thresholds = stage_thresholds or {}
+    previous = {(item['rows'], item['stage']): item for item in baseline['results']}
+    rows = []
+    for item in results:
+        base = previous.get((item['rows'], item['stage']))
+        if base is None:
+            rows.append({**item, 'baseline_seconds': None, 'ratio': None, 'status': 'new'})
+            continue
+        ratio = item['seconds'] / base['seconds'] if base['seconds'] > 0 else None
+        limit = 1 + stage_thresholds.get(item['stage'], threshold)
+        if ratio is None or base['seconds'] < MIN_COMPARE_SECONDS:
+            status = 'skipped'
+        elif ratio > limit:
+            status = 'regression'
+        elif ratio < 1 / limit:
+            status = 'improved'
+        else:
+            status = 'ok'
+        rows.append({**item, 'baseline_seconds': base['seconds'], 'ratio': ratio, 'status': status})
+    return rows
+
+def print_comparison(rows, log=print):
+    marks = {'ok': '✅', 'improved': '🚀', 'regression': '❌', 'skipped': '➖', 'new': '🆕'}
+    log(f"{'规模':>9} {'阶段':<12} {'基线(s)':>10} {'本次(s)':>10} {'比值':>7}")
+    for row in rows:
+        base = f"{row['baseline_seconds']:.3f}" if row['baseline_seconds'] is not None else '-'
+        ratio = f"{row['ratio']:.2f}" if row['ratio'] is not None else '-'
+        log(f"{row['rows']:>9} {row['stage']:<12} {base:>10} {row['seconds']:>10.3f} {ratio:>7} {marks[row['status']]}")
+
+def parse_stage_thresholds(values):
+    thresholds = {}
+    for value in values:
+        stage, _, ratio = value.partition('=')
+        if stage not in STAGES or not ratio:
+            raise argparse.ArgumentTypeError(f"无效的阶段阈值：{value}（格式：阶段=比例，如 score=0.1）")
+        thresholds[stage] = float(ratio)
+    return thresholds
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="电商评论情感分析 - 分阶段性能基准")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help="评论规模，逗号分隔（支持 k / m 后缀）")
+    parser.add_argument('--stages', default=','.join(DEFAULT_STAGES),
+                        help=f"要测的阶段，逗号分隔（可选：{','.join(STAGES)}）")
+    parser.add_argument('--repeat', type=int, default=3, help="每个阶段的运行次数（取最小耗时）")
+    parser.add_argument('--seed', type=int, default=0, help="合成语料种子")
+    parser.add_argument('--workers', type=int, default=1, help="完整评分阶段的进程数")
+    parser.add_argument('--kernel', choices=SCORING_KERNELS, default=DEFAULT_KERNEL, help="完整评分阶段的评分内核")
+    parser.add_argument('-o', '--output', help="结果 JSON 路径（可作为之后比较的基线）")
+    parser.add_argument('--baseline', help="基线结果 JSON；给出时逐项比较，有回退则退出码为 1")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help="允许的耗时增幅（0.25 即 +25%%）")
+    parser.add_argument('--stage-threshold', action='append', default=[], metavar='阶段=比例',
+                        help="单独设置某阶段的阈值，可重复")
+    args = parser.parse_args(argv)
+
+    sizes = [parse_size(size) for size in args.sizes.split(',') if size.strip()]
+    stages = [stage.strip() for stage in args.stages.split(',') if stage.strip()]
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        parser.error(f"未知阶段：{','.join(unknown)}")
+    stage_thresholds = parse_stage_thresholds(args.stage_threshold)
+
+    sentiment_dict = load_integrated_sentiment_dict()
+    # 预热：jieba 词典加载、词表构建不计入任何阶段
+    score_collapsed_parallel(['预热一下，质量很好'], sentiment_dict, workers=1)
+    get_token_table(compile_sentiment_dict(sentiment_dict))
+
+    results = []
+    for n in sizes:
+        print(f"📏 {n} 条评论")
+        results.extend(run_size(n, stages, sentiment_dict, repeat=args.repeat, seed=args.seed,
+                                workers=args.workers, kernel=args.kernel))
+
+    report = {
+        'version': RESULT_FORMAT_VERSION,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'environment': environment_info(),
+        'config': {'seed': args.seed, 'repeat': args.repeat, 'workers': args.workers, 'kernel': args.kernel},
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"💾 结果已写入 {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('environment') != report['environment']:
+            print("⚠️ 基线与本次运行环境不同，比较结果仅供参考")
+        if baseline.get('config') != report['config']:
+            print("⚠️ 基线与本次运行参数不同，比较结果仅供参考")
+        rows = compare(results, baseline, args.threshold, stage_thresholds)
+        print_comparison(rows)
+        regressions = [row for row in rows if row['status'] == 'regression']
+        if regressions:
+            print(f"❌ {len(regressions)} 项性能回退（阈值 +{args.threshold:.0%}）")
+            return 1
+        print("✅ 未发现性能回退")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
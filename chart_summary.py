@@ -0,0 +1,44 @@
+import numpy as np
+
+# ==========================================
+# 图表用的汇总统计：直方图 / 箱线图只需要计数和分位数，散点图超过上限时均匀抽样
+# 绘图代码只接触这些汇总结果，数据量再大，传给 matplotlib 的数据量也是固定的
+# ==========================================
+
+SCATTER_MAX_POINTS = 20000
+BOX_MAX_FLIERS = 500
+
+def histogram_counts(values, bins=20):
+    # 与 ax.hist(values, bins=bins) 相同的分箱；绘制时用 ax.hist(edges[:-1], edges, weights=counts)
+    return np.histogram(np.asarray(values), bins=bins)
+
+def box_stats(values, label, seed=0):
+    # 与 matplotlib.cbook.boxplot_stats(whis=1.5) 同口径的单组统计，可直接交给 ax.bxp；
+    # 异常点过多时只保留最极端的各一半（抽样后仍显示真实的最小 / 最大值）
+    values = np.asarray(values, dtype=np.float64)
+    q1, med, q3 = np.percentile(values, [25, 50, 75])
+    iqr = q3 - q1
+    inside = values[(values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)]
+    whislo = inside.min() if len(inside) else q1
+    whishi = inside.max() if len(inside) else q3
+    fliers = values[(values < whislo) | (values > whishi)]
+    if len(fliers) > BOX_MAX_FLIERS:
+        fliers = np.sort(fliers)
+        half = BOX_MAX_FLIERS // 2
+        fliers = np.concatenate([fliers[:half], fliers[-half:]])
+    return {
+        'label': label, 'mean': float(values.mean()), 'med': med, 'q1': q1, 'q3': q3,
+        'iqr': iqr, 'whislo': whislo, 'whishi': whishi, 'fliers': fliers
+    }
+
+def grouped_box_stats(values, codes, labels):
+    # 按分类编码分组（codes[i] 为 labels 的下标），只返回有数据的组
+    values = np.asarray(values)
+    codes = np.asarray(codes)
+    return [box_stats(values[codes == code], label) for code, label in enumerate(labels) if np.any(codes == code)]
+
+def sample_indices(n, max_points=SCATTER_MAX_POINTS, seed=0):
+    # 均匀无放回抽样（固定种子，同一数据每次抽到的点相同）；不超过上限时返回全部下标
+    if n <= max_points:
+        return np.arange(n)
+    return np.sort(np.random.default_rng(seed).choice(n, size=max_points, replace=False))
@@ -0,0 +1,172 @@
+import os
+import sys
+import time
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# 进程内共享的数据集存储：上传文件的解析结果、Excel 按列读取的结果、分析结果按键只保存一份，
+# 所有会话拿到同一个对象（只读引用，不复制）；总内存超过预算时按 LRU 淘汰
+# 引用计数：会话对正在使用的条目持有租约（每次页面重跑续约，会话关闭后租约在 HOLD_TTL_SECONDS 后失效），
+#   条目还被依赖它的条目计数（分析结果引用原始数据，结果还在时淘汰原始数据并不能释放内存）；有引用的条目不淘汰
+# 同一键并发加载时只加载一次，其他调用方等待并复用同一结果
+# 派生数据（评论长度统计、词云词频、走势图各粒度的汇总）按名称挂在条目上，只计算一次，随条目计入内存、随条目淘汰
+# ==========================================
+
+DEFAULT_BUDGET_MB = 2048
+HOLD_TTL_SECONDS = 1800
+
+def default_budget_bytes():
+    # 可用环境变量 SENTIMENT_MEMORY_BUDGET_MB 调整
+    return int(float(os.environ.get('SENTIMENT_MEMORY_BUDGET_MB', DEFAULT_BUDGET_MB)) * 1024 * 1024)
+
+def estimate_nbytes(value):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_nbytes(key) + estimate_nbytes(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_nbytes(item) for item in value)
+    if isinstance(value, (str, bytes, int, float)):
+        return sys.getsizeof(value)
+    return int(getattr(value, 'nbytes', 0))
+
+class StoreEntry:
+    def __init__(self, value, nbytes, depends):
+        self.value = value
+        self.nbytes = nbytes
+        self.depends = tuple(depends)
+        self.holders = {}         # 持有者 -> 租约到期时间
+        self.derived = {}
+        self.derived_nbytes = 0
+
+    @property
+    def total_nbytes(self):
+        return self.nbytes + self.derived_nbytes
+
+class DatasetStore:
+    def __init__(self, budget_bytes=None, hold_ttl=HOLD_TTL_SECONDS):
+        self.budget_bytes = default_budget_bytes() if budget_bytes is None else budget_bytes
+        self.hold_ttl = hold_ttl
+        self.entries = OrderedDict()
+        self.loading = {}         # 键 -> 正在加载该键的锁
+        self.lock = threading.Lock()
+        self.evictions = 0
+
+    @property
+    def nbytes(self):
+        with self.lock:
+            return sum(entry.total_nbytes for entry in self.entries.values())
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            self.entries.move_to_end(key)
+            return entry.value
+
+    def put(self, key, value, nbytes=None, depends=()):
+        # nbytes 省略时按 estimate_nbytes 估算；depends 为该值引用的其他条目的键
+        entry = StoreEntry(value, estimate_nbytes(value) if nbytes is None else int(nbytes), depends)
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                entry.holders = old.holders
+            self.entries[key] = entry
+            self._evict(keep=key)
+        return value
+
+    def get_or_load(self, key, load, nbytes=None, depends=()):
+        # 不存在时调用 load() 加载并放入；并发的同键调用只有一个真正加载
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                return entry.value
+            key_lock = self.loading.setdefault(key, threading.Lock())
+        with key_lock:
+            value = self.get(key)
+            if value is None:
+                try:
+                    value = self.put(key, load(), nbytes, depends)
+                finally:
+                    with self.lock:
+                        self.loading.pop(key, None)
+        return value
+
+    def derived(self, key, name, compute, nbytes=None):
+        # 条目 key 上名为 name 的派生数据；条目不在存储中时只计算、不缓存
+        with self.lock:
+            entry = self.entries.get(key)
+            value = entry.derived.get(name) if entry is not None else None
+        if value is not None:
+            return value
+        value = compute()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and name not in entry.derived:
+                entry.derived[name] = value
+                entry.derived_nbytes += estimate_nbytes(value) if nbytes is None else int(nbytes)
+                self._evict()
+        return value
+
+    def hold(self, holder, keys):
+        # holder（会话）当前使用的条目：替换它之前持有的全部租约并续约；keys 为空即释放
+        expires = time.time() + self.hold_ttl
+        keys = set(keys)
+        with self.lock:
+            for key, entry in self.entries.items():
+                if key in keys:
+                    entry.holders[holder] = expires
+                else:
+                    entry.holders.pop(holder, None)
+            self._evict()
+
+    def release(self, holder):
+        self.hold(holder, ())
+
+    def refcounts(self):
+        # 各条目的引用数：未过期的租约 + 依赖它的条目
+        with self.lock:
+            return self._refcounts(time.time())
+
+    def _refcounts(self, now):
+        counts = {}
+        for key, entry in self.entries.items():
+            for holder in [holder for holder, expires in entry.holders.items() if expires < now]:
+                del entry.holders[holder]
+            counts[key] = counts.get(key, 0) + len(entry.holders)
+            for dep in entry.depends:
+                counts[dep] = counts.get(dep, 0) + 1
+        return counts
+
+    def _evict(self, keep=None):
+        # 从最久未用的条目起淘汰没有引用的条目，直到回到预算内；淘汰一个条目可能解除它对其他条目的依赖，故多轮进行
+        # keep 为刚放入的条目：调用方马上要用（随后由会话持有），不立即淘汰
+        total = sum(entry.total_nbytes for entry in self.entries.values())
+        while total > self.budget_bytes:
+            counts = self._refcounts(time.time())
+            victim = next((key for key in self.entries if key != keep and not counts.get(key)), None)
+            if victim is None:
+                return
+            total -= self.entries.pop(victim).total_nbytes
+            self.evictions += 1
+
+    def stats(self):
+        with self.lock:
+            counts = self._refcounts(time.time())
+            return {
+                'entries': len(self.entries),
+                'nbytes': sum(entry.total_nbytes for entry in self.entries.values()),
+                'budget_bytes': self.budget_bytes,
+                'referenced': sum(1 for key in self.entries if counts.get(key)),
+                'evictions': self.evictions
+            }
@@ -0,0 +1,260 @@
+import os
+import io
+import zipfile
+import posixpath
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from pandas.io.parsers import TextParser
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format, is_timedelta_format
+from openpyxl.utils.cell import column_index_from_string
+from openpyxl.utils.datetime import from_excel, from_ISO8601, CALENDAR_WINDOWS_1900, CALENDAR_MAC_1904
+
+from stream_analysis import clean_columns
+
+# ==========================================
+# Excel 快速读取 + 列式转换缓存
+# 直接流式解析 xlsx 中第一个工作表的 XML（只取单元格值，不构建 openpyxl 单元格对象），
+# 单元格取值规则与 pd.read_excel(openpyxl) 一致，再交给 pandas 同一个 TextParser 生成 DataFrame
+# 首次加载后按文件内容哈希转存为 Parquet，之后同一文件只按列读取 Parquet，几乎不耗时
+# ==========================================
+
+DEFAULT_CONVERT_DIR = Path.home() / '.cache' / 'sentiment-analysis-app' / 'converted'
+MAX_CONVERTED_FILES = 32
+CONVERT_FORMAT_VERSION = 1
+SAMPLE_ROWS = 1000
+EXPORT_CHUNK_ROWS = 50000
+
+PACKAGE_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+WORKSHEET_REL_SUFFIX = '/worksheet'
+
+def _namespace(tag):
+    return tag[:tag.index('}') + 1] if tag.startswith('{') else ''
+
+def _read_xml(archive, member):
+    with archive.open(member) as handle:
+        return ET.parse(handle).getroot()
+
+def _first_worksheet(archive):
+    # 与 pd.read_excel(sheet_name=0) 相同：工作簿中的第一个工作表（跳过图表页），以及日期纪元
+    workbook = _read_xml(archive, 'xl/workbook.xml')
+    ns = _namespace(workbook.tag)
+    rels = _read_xml(archive, 'xl/_rels/workbook.xml.rels')
+    targets = {
+        rel.get('Id'): rel.get('Target') for rel in rels.iter(f'{PACKAGE_REL_NS}Relationship')
+        if rel.get('Type', '').endswith(WORKSHEET_REL_SUFFIX)
+    }
+
+    workbook_pr = workbook.find(f'{ns}workbookPr')
+    date1904 = workbook_pr is not None and workbook_pr.get('date1904', '').lower() in ('1', 'true')
+    epoch = CALENDAR_MAC_1904 if date1904 else CALENDAR_WINDOWS_1900
+
+    for sheet in workbook.iter(f'{ns}sheet'):
+        rel_id = next((value for key, value in sheet.attrib.items() if key.endswith('}id')), None)
+        target = targets.get(rel_id)
+        if target is None:
+            continue
+        member = target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join('xl', target))
+        return member, epoch
+    raise ValueError("Excel 文件中没有工作表")
+
+def _text_content(node, ns):
+    # 与 openpyxl Text.content 相同：直接的 <t> 加上各富文本片段 <r><t>，不含注音 <rPh>
+    if len(node) == 1 and node[0].tag == f'{ns}t':
+        return node[0].text or ''
+    return (node.findtext(f'{ns}t') or '') + ''.join(run.findtext(f'{ns}t') or '' for run in node.iterfind(f'{ns}r'))
+
+def _shared_strings(archive):
+    if 'xl/sharedStrings.xml' not in archive.namelist():
+        return []
+    strings = []
+    with archive.open('xl/sharedStrings.xml') as handle:
+        ns = None
+        for _, node in ET.iterparse(handle):
+            if ns is None:
+                ns = _namespace(node.tag)
+            if node.tag == f'{ns}si':
+                strings.append(_text_content(node, ns).replace('x005F_', ''))
+                node.clear()
+    return strings
+
+def _date_styles(archive):
+    # 数字格式为日期 / 时长的单元格样式下标（与 openpyxl 读取样式表时的判定相同）
+    if 'xl/styles.xml' not in archive.namelist():
+        return set(), set()
+    styles = _read_xml(archive, 'xl/styles.xml')
+    ns = _namespace(styles.tag)
+    custom = {int(fmt.get('numFmtId')): fmt.get('formatCode') for fmt in styles.iter(f'{ns}numFmt')}
+    date_styles, timedelta_styles = set(), set()
+    cell_xfs = styles.find(f'{ns}cellXfs')
+    for idx, xf in enumerate(cell_xfs.iterfind(f'{ns}xf') if cell_xfs is not None else []):
+        fmt_id = int(xf.get('numFmtId', 0))
+        fmt = custom[fmt_id] if fmt_id in custom else BUILTIN_FORMATS.get(fmt_id)
+        if fmt and is_date_format(fmt):
+            date_styles.add(idx)
+        if fmt and is_timedelta_format(fmt):
+            timedelta_styles.add(idx)
+    return date_styles, timedelta_styles
+
+def read_sheet_rows(file_bytes):
+    # 第一个工作表的逐行取值，等价于 pandas openpyxl 读取器的 get_sheet_data：
+    # 空单元格为 ""，错误值为 NaN，整数值数字为 int；去掉行尾空单元格和末尾空行，再把各行补齐到同一宽度
+    archive = zipfile.ZipFile(io.BytesIO(file_bytes))
+    member, epoch = _first_worksheet(archive)
+    shared = _shared_strings(archive)
+    date_styles, timedelta_styles = _date_styles(archive)
+    column_cache = {}
+
+    data = []
+    last_row_with_data = -1
+    with archive.open(member) as handle:
+        ns = _namespace(next(ET.iterparse(handle, events=('start',)))[1].tag)
+    row_tag, value_tag, inline_tag = f'{ns}row', f'{ns}v', f'{ns}is'
+    get_column = column_cache.get
+
+    with archive.open(member) as handle:
+        for _, row in ET.iterparse(handle):
+            if row.tag != row_tag:
+                continue
+            row_ref = row.get('r')
+            row_number = int(row_ref) if row_ref else len(data) + 1
+            if row_number <= len(data):
+                row.clear()
+                continue
+            # 中间缺失的行为空行
+            data.extend([] for _ in range(row_number - 1 - len(data)))
+
+            values = []
+            column = 0
+            for cell in row:
+                ref = cell.get('r')
+                if ref:
+                    letters = ref.rstrip('0123456789')
+                    column = get_column(letters)
+                    if column is None:
+                        column = column_cache[letters] = column_index_from_string(letters)
+                else:
+                    column += 1
+
+                data_type = cell.get('t', 'n')
+                if data_type == 's':
+                    value = cell.findtext(value_tag)
+                    value = shared[int(value)] if value else None
+                elif data_type == 'inlineStr':
+                    node = cell.find(inline_tag)
+                    value = _text_content(node, ns) if node is not None else None
+                else:
+                    value = cell.findtext(value_tag) or None
+                    if value is not None:
+                        if data_type == 'n':
+                            number = float(value) if ('.' in value or 'E' in value or 'e' in value) else int(value)
+                            style = int(cell.get('s') or 0)
+                            if style in date_styles:
+                                try:
+                                    value = from_excel(number, epoch, timedelta=style in timedelta_styles)
+                                except (OverflowError, ValueError):
+                                    value = np.nan
+                            else:
+                                value = int(number) if int(number) == number else float(number)
+                        elif data_type == 'b':
+                            value = bool(int(value))
+                        elif data_type == 'e':
+                            value = np.nan
+                        elif data_type == 'd':
+                            value = from_ISO8601(value)
+
+                if value is None or (isinstance(value, str) and value == ''):
+                    continue
+                if column > len(values):
+                    values.extend([''] * (column - len(values)))
+                values[column - 1] = value
+
+            if values:
+                last_row_with_data = len(data)
+            data.append(values)
+            row.clear()
+
+    data = data[:last_row_with_data + 1]
+    if data:
+        width = max(len(values) for values in data)
+        data = [values + [''] * (width - len(values)) if len(values) < width else values for values in data]
+    return data
+
+def read_workbook(file_bytes):
+    # 与 clean_columns(pd.read_excel(...)) 结果相同的 DataFrame
+    data = read_sheet_rows(file_bytes)
+    if not data:
+        return pd.DataFrame()
+    return clean_columns(TextParser(data, header=0, skip_blank_lines=False).read())
+
+def _arrow_compatible(df):
+    # 混合类型的文本列（如数字与文字混排）Parquet 无法直接存储，转为字符串（缺失值保持缺失）
+    import pyarrow as pa
+
+    df = df.copy(deep=False)
+    for col in df.columns:
+        if df[col].dtype == object:
+            try:
+                pa.array(df[col], from_pandas=True)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+class ConvertedSheet:
+    # 转存后的 Parquet 文件：列名 / 行数来自文件元数据，读取时只读取需要的列
+    def __init__(self, path):
+        import pyarrow.parquet as pq
+
+        self.path = Path(path)
+        metadata = pq.ParquetFile(self.path).metadata
+        self.num_rows = metadata.num_rows
+        self.columns = list(pq.read_schema(self.path).names)
+
+    def __len__(self):
+        return self.num_rows
+
+    def sample(self, nrows=SAMPLE_ROWS):
+        # 前 nrows 行（全部列），用于列识别和预览
+        import pyarrow.parquet as pq
+
+        batch = next(pq.ParquetFile(self.path).iter_batches(batch_size=nrows), None)
+        if batch is None:
+            return pd.read_parquet(self.path)
+        return batch.to_pandas()
+
+    def read(self, columns):
+        return pd.read_parquet(self.path, columns=list(columns))
+
+    def iter_frames(self, chunk_rows=EXPORT_CHUNK_ROWS):
+        # 按行顺序分块读取全部列（导出时与结果列逐块拼接）
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(self.path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+
+def converted_path(file_hash, convert_dir=DEFAULT_CONVERT_DIR):
+    return Path(convert_dir) / f'{file_hash}.v{CONVERT_FORMAT_VERSION}.parquet'
+
+def convert_workbook(file_bytes, file_hash, convert_dir=DEFAULT_CONVERT_DIR):
+    # 同一内容的文件只解析一次：命中时直接打开已转存的 Parquet；按最近使用时间只保留 MAX_CONVERTED_FILES 个
+    path = converted_path(file_hash, convert_dir)
+    if path.exists():
+        os.utime(path)
+        return ConvertedSheet(path)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    df = _arrow_compatible(read_workbook(file_bytes))
+    tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    try:
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+    converted = sorted(path.parent.glob('*.parquet'), key=lambda p: p.stat().st_mtime, reverse=True)
+    for stale in converted[MAX_CONVERTED_FILES:]:
+        stale.unlink(missing_ok=True)
+    return ConvertedSheet(path)
@@ -0,0 +1,388 @@
+import os
+import sys
+import copy
+import json
+import time
+import struct
+import hashlib
+import argparse
+import tempfile
+import importlib.metadata
+from pathlib import Path
+
+import numpy as np
+
+from sentiment_engine import SCORER_VERSION, CompiledLexicon, builtin_lexicon_source, register_jieba_words
+from vector_kernel import NON_TEXT_PATTERN, TOKEN_TABLE_ARRAYS, TokenTable, register_token_table
+
+# ==========================================
+# 词典编译产物：内置词典 + 外部词典源合并后编译成一个带版本号的二进制文件
+# 文件 = 魔数 + 版本号 + JSON 元信息 + 按 64 字节对齐的数组块（词表、评分内核查表数组、明确模式、jieba 词频、原始词典 JSON）
+# 加载时整个文件用 np.memmap 映射，查表数组直接指向映射内存，不复制、不反序列化；
+# 多个 worker 进程映射同一个文件时共享操作系统页缓存，worker 的评分词典也直接由这些数组还原（不解析原始词典 JSON）
+# 多字词条连同编译时算好的词频一起登记到 jieba，使 "性价比极高" 这样的短语整体切分
+# 产物按 "版本 + 全部来源内容" 的哈希缓存，来源不变时直接映射已有文件
+#
+# 外部词典源：
+#   *.json  与 "导出完整情感词典" 相同的结构，可以只含部分类别 / 部分词条
+#   *.txt   文件名为 <类别>[.<分组>].txt，如 sentiment.strong_positive.txt、dimensions.质量.txt、degrees.txt，
+#           每行 "词条 [取值]"（空白分隔），# 开头为注释；情感词缺省取值为该分层内置词条得分的中位数，维度词不需要取值
+# 多个来源按顺序合并，后者覆盖前者；情感词同时只属于一个分层
+# 默认来源为程序目录下 lexicon/ 中的 *.json / *.txt（按文件名排序），可用环境变量
+# SENTIMENT_LEXICON_SOURCES（路径列表，分隔符同 PATH）覆盖
+# ==========================================
+
+ARTIFACT_MAGIC = b'SLEXART\x00'
+ARTIFACT_VERSION = 2    # 2：增加明确模式数组，worker 不再解析原始词典 JSON
+ARTIFACT_ALIGN = 64
+DEFAULT_ARTIFACT_DIR = Path.home() / '.cache' / 'sentiment-analysis-app' / 'lexicon'
+DEFAULT_SOURCE_DIR = Path(__file__).resolve().parent / 'lexicon'
+SOURCES_ENV = 'SENTIMENT_LEXICON_SOURCES'
+SOURCE_SUFFIXES = ('.json', '.txt')
+MAX_ARTIFACTS = 8
+SECTIONS = ('sentiment', 'dimensions', 'negations', 'degrees', 'explicit')
+
+_ACTIVE = {}    # 产物路径 -> 已映射并登记的 LexiconArtifact
+
+def _align(offset):
+    return -(-offset // ARTIFACT_ALIGN) * ARTIFACT_ALIGN
+
+def jieba_version():
+    try:
+        return importlib.metadata.version('jieba')
+    except importlib.metadata.PackageNotFoundError:
+        return 'unknown'
+
+# ==========================================
+# 外部词典源
+# ==========================================
+
+def default_sources():
+    env = os.environ.get(SOURCES_ENV)
+    if env is not None:
+        return [Path(p) for p in env.split(os.pathsep) if p]
+    if not DEFAULT_SOURCE_DIR.is_dir():
+        return []
+    return sorted(p for p in DEFAULT_SOURCE_DIR.iterdir() if p.suffix.lower() in SOURCE_SUFFIXES)
+
+def parse_source(name, data, base):
+    # 把一个来源文件解析成部分词典（结构同完整词典）；base 用于取情感分层的缺省得分
+    suffix = Path(name).suffix.lower()
+    if suffix == '.json':
+        part = json.loads(data.decode('utf-8-sig'))
+        unknown = set(part) - set(SECTIONS)
+        if unknown:
+            raise ValueError(f"{name}：未知的词典类型 {sorted(unknown)}")
+        return part
+    if suffix != '.txt':
+        raise ValueError(f"{name}：不支持的词典源格式（支持 .json / .txt）")
+
+    section, _, group = Path(name).stem.partition('.')
+    if section not in SECTIONS:
+        raise ValueError(f"{name}：文件名须以词典类型开头（{' / '.join(SECTIONS)}）")
+    if section in ('sentiment', 'dimensions') and not group:
+        raise ValueError(f"{name}：{section} 词表的文件名须带分组，如 {section}.<分组>.txt")
+
+    default = None
+    if section == 'sentiment' and base['sentiment'].get(group):
+        default = float(np.median(list(base['sentiment'][group].values())))
+
+    entries = {}
+    for line_no, line in enumerate(data.decode('utf-8-sig').splitlines(), start=1):
+        fields = line.split('#', 1)[0].split()
+        if not fields:
+            continue
+        if len(fields) > 2:
+            raise ValueError(f"{name}:{line_no}：每行只能是 \"词条 [取值]\"")
+        word = fields[0]
+        if section == 'dimensions':
+            entries[word] = None
+            continue
+        if len(fields) == 2:
+            try:
+                entries[word] = float(fields[1])
+            except ValueError:
+                raise ValueError(f"{name}:{line_no}：取值不是数字：{fields[1]}") from None
+        elif default is not None:
+            entries[word] = default
+        else:
+            raise ValueError(f"{name}:{line_no}：{word} 缺少取值")
+
+    if section == 'sentiment':
+        return {'sentiment': {group: entries}}
+    if section == 'dimensions':
+        return {'dimensions': {group: list(entries)}}
+    return {section: entries}
+
+def merge_sources(base, parts):
+    # 按顺序把部分词典合并到 base 的副本上，后者覆盖前者
+    raw = copy.deepcopy(base)
+    for part in parts:
+        for layer, words in part.get('sentiment', {}).items():
+            for word, score in words.items():
+                for other, other_words in raw['sentiment'].items():
+                    if other != layer:
+                        other_words.pop(word, None)
+                raw['sentiment'].setdefault(layer, {})[word] = float(score)
+        for dim, words in part.get('dimensions', {}).items():
+            current = raw['dimensions'].setdefault(dim, [])
+            current.extend(word for word in dict.fromkeys(words) if word not in current)
+        for section in ('negations', 'degrees', 'explicit'):
+            raw[section].update({word: float(value) for word, value in part.get(section, {}).items()})
+    return raw
+
+def sources_digest(base, payloads):
+    # 产物文件名中的哈希：格式 / 评分算法 / jieba 版本、内置词典和各来源（文件名决定类别，也计入）
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f'{ARTIFACT_VERSION}:{SCORER_VERSION}:{jieba_version()}\0'.encode('utf-8'))
+    h.update(json.dumps(base, ensure_ascii=False, sort_keys=True).encode('utf-8'))
+    for name, data in payloads:
+        h.update(f'\0{name}\0{len(data)}\0'.encode('utf-8'))
+        h.update(data)
+    return h.hexdigest()
+
+# ==========================================
+# 编译
+# ==========================================
+
+def jieba_frequencies(words):
+    # 在一个独立的 jieba 分词器上按顺序登记，记下每个词实际使用的词频（与 add_word 不带词频时的取值一致）
+    # 加载时按同样的顺序 add_word(词, 词频) 即得到同样的分词结果，不必在每个进程重新推算
+    import jieba
+
+    tokenizer = jieba.Tokenizer()
+    tokenizer.initialize()
+    freqs = []
+    for word in words:
+        freq = tokenizer.suggest_freq(word, False)
+        tokenizer.add_word(word, freq)
+        freqs.append(freq)
+    return freqs
+
+def compile_artifact(raw, path, digest='', sources=()):
+    # 编译词典并写成产物文件（先写临时文件再原子替换）；返回写入的路径
+    lexicon = CompiledLexicon(raw)
+    table = TokenTable(lexicon)
+    words = list(table.vocab)
+    # 需要整体切分的词：多字、评分时可能出现（文本已转小写、非中英文数字已替换为空格）
+    jieba_ids = [i for i, word in enumerate(words, start=1)
+                 if len(word) >= 2 and word == word.lower() and not NON_TEXT_PATTERN.search(word)]
+
+    arrays = {'words': np.array(words, dtype=str)}
+    arrays.update({name: getattr(table, name) for name in TOKEN_TABLE_ARRAYS})
+    arrays['explicit_words'] = np.array(list(lexicon['explicit']), dtype=str)
+    arrays['explicit_scores'] = np.array(list(lexicon['explicit'].values()), dtype=np.float64)
+    arrays['jieba_ids'] = np.array(jieba_ids, dtype=np.int32)
+    arrays['jieba_freqs'] = np.array(jieba_frequencies([words[i - 1] for i in jieba_ids]), dtype=np.int64)
+    arrays['lexicon_json'] = np.frombuffer(json.dumps(raw, ensure_ascii=False).encode('utf-8'), dtype=np.uint8)
+
+    header = {
+        'artifact_version': ARTIFACT_VERSION,
+        'scorer_version': SCORER_VERSION,
+        'jieba_version': jieba_version(),
+        'digest': digest,
+        'fingerprint': lexicon.fingerprint,
+        'dimension_names': list(lexicon.dimension_names),
+        'sources': [str(source) for source in sources],
+        'entries': len(words),
+        'built_at': time.time(),
+        'arrays': {}
+    }
+    offset = 0
+    for name, values in arrays.items():
+        values = np.ascontiguousarray(values)
+        arrays[name] = values
+        offset = _align(offset)
+        header['arrays'][name] = {'dtype': values.dtype.str, 'shape': list(values.shape), 'offset': offset}
+        offset += values.nbytes
+    header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    data_start = _align(len(ARTIFACT_MAGIC) + 8 + len(header_bytes))
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(ARTIFACT_MAGIC)
+            f.write(struct.pack('<II', ARTIFACT_VERSION, len(header_bytes)))
+            f.write(header_bytes)
+            for name, values in arrays.items():
+                f.seek(data_start + header['arrays'][name]['offset'])
+                f.write(values.tobytes())
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+    return path
+
+# ==========================================
+# 加载
+# ==========================================
+
+class LexiconArtifact:
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            head = f.read(len(ARTIFACT_MAGIC) + 8)
+        if len(head) < len(ARTIFACT_MAGIC) + 8 or head[:len(ARTIFACT_MAGIC)] != ARTIFACT_MAGIC:
+            raise ValueError(f"{self.path}：不是词典编译产物")
+        version, header_len = struct.unpack('<II', head[len(ARTIFACT_MAGIC):])
+        if version != ARTIFACT_VERSION:
+            raise ValueError(f"{self.path}：产物格式版本 {version} 与当前版本 {ARTIFACT_VERSION} 不一致，请重新编译")
+
+        self.buffer = np.memmap(self.path, dtype=np.uint8, mode='r')
+        meta_start = len(head)
+        self.meta = json.loads(bytes(self.buffer[meta_start:meta_start + header_len]).decode('utf-8'))
+        if self.meta['scorer_version'] != SCORER_VERSION:
+            raise ValueError(f"{self.path}：产物对应的评分算法版本与当前版本不一致，请重新编译")
+
+        data_start = _align(meta_start + header_len)
+        self.arrays = {}
+        for name, spec in self.meta['arrays'].items():
+            shape, dtype = tuple(spec['shape']), np.dtype(spec['dtype'])
+            if not np.prod(shape, dtype=np.int64):
+                self.arrays[name] = np.zeros(shape, dtype=dtype)
+            else:
+                # 只读视图，直接指向映射内存
+                self.arrays[name] = np.ndarray(shape, dtype=dtype, buffer=self.buffer, offset=data_start + spec['offset'])
+        self._lexicon = None
+        self._scoring_lexicon = None
+        self._words = None
+
+    @property
+    def words(self):
+        if self._words is None:
+            self._words = self.arrays['words'].tolist()
+        return self._words
+
+    def lexicon(self):
+        if self._lexicon is None:
+            raw = json.loads(self.arrays['lexicon_json'].tobytes().decode('utf-8'))
+            self._lexicon = CompiledLexicon(raw, fingerprint=self.meta['fingerprint'])
+            self._lexicon.origin = {
+                'path': str(self.path),
+                'sources': self.meta['sources'],
+                'entries': self.meta['entries'],
+                'jieba_words': len(self.arrays['jieba_ids'])
+            }
+        return self._lexicon
+
+    def scoring_lexicon(self):
+        # 只含评分所需内容的词典，直接由映射的查表数组还原（不解析原始词典 JSON），供评分进程池的 worker 使用：
+        # 情感词合并为一个分层且只保留非零得分（得分为 0 的词与词典外的词计分相同），否定词 / 程度副词只保留权重不为 1 的；
+        # 评分结果与完整词典逐位一致，指纹相同，评分内核直接复用 activate 时登记的查表
+        if self._scoring_lexicon is None:
+            arrays, words = self.arrays, self.words
+            dim_names = self.meta['dimension_names']
+            dimensions = {dim: [] for dim in dim_names}
+            for j, dim in enumerate(dim_names):
+                dimensions[dim] = [words[i - 1] for i in np.flatnonzero(arrays['dim_member'][:, j]).tolist()]
+            raw = {
+                'sentiment': {'lexicon': {words[i - 1]: float(arrays['score'][i]) for i in np.flatnonzero(arrays['score']).tolist()}},
+                'dimensions': dimensions,
+                'negations': {words[i - 1]: float(arrays['negation'][i]) for i in np.flatnonzero(arrays['negation'] != 1.0).tolist()},
+                'degrees': {words[i - 1]: float(arrays['degree'][i]) for i in np.flatnonzero(arrays['degree'] != 1.0).tolist()},
+                'explicit': dict(zip(arrays['explicit_words'].tolist(), arrays['explicit_scores'].tolist()))
+            }
+            self._scoring_lexicon = CompiledLexicon(raw, fingerprint=self.meta['fingerprint'])
+        return self._scoring_lexicon
+
+    def jieba_entries(self):
+        words = self.words
+        return [(words[i - 1], freq) for i, freq in zip(self.arrays['jieba_ids'].tolist(), self.arrays['jieba_freqs'].tolist())]
+
+    def token_table(self):
+        return TokenTable.from_arrays(self.meta['dimension_names'], self.words,
+                                      {name: self.arrays[name] for name in TOKEN_TABLE_ARRAYS})
+
+    def activate(self):
+        # 登记评分内核查表和 jieba 词条（jieba 词条在下一次分词前才实际加入）
+        register_token_table(self.meta['fingerprint'], self.token_table())
+        register_jieba_words(self.meta['digest'] or self.meta['fingerprint'], self.jieba_entries(), str(self.path))
+        return self
+
+def activate_artifact(path):
+    # 同一进程内每个产物只映射、登记一次（fork 出的 worker 直接继承）
+    path = str(path)
+    artifact = _ACTIVE.get(path)
+    if artifact is None:
+        artifact = _ACTIVE[path] = LexiconArtifact(path).activate()
+    return artifact
+
+def artifact_path(digest, artifact_dir=DEFAULT_ARTIFACT_DIR):
+    return Path(artifact_dir) / f'lexicon-{digest}.v{ARTIFACT_VERSION}.bin'
+
+def build_lexicon_artifact(sources=None, artifact_dir=DEFAULT_ARTIFACT_DIR):
+    # 内置词典 + 外部词典源 -> 产物文件路径；来源未变化时直接返回已有产物，按最近使用时间只保留 MAX_ARTIFACTS 个
+    paths = default_sources() if sources is None else [Path(p) for p in sources]
+    base = builtin_lexicon_source()
+    payloads = [(p.name, p.read_bytes()) for p in paths]
+    digest = sources_digest(base, payloads)
+
+    for directory in (Path(artifact_dir), Path(tempfile.gettempdir()) / 'sentiment-analysis-app-lexicon'):
+        path = artifact_path(digest, directory)
+        if path.exists():
+            os.utime(path)
+            return path
+        raw = merge_sources(base, [parse_source(name, data, base) for name, data in payloads])
+        try:
+            compile_artifact(raw, path, digest, [p.resolve() for p in paths])
+        except OSError:
+            # 缓存目录不可写时退回到临时目录
+            continue
+        artifacts = sorted(path.parent.glob('lexicon-*.bin'), key=lambda p: p.stat().st_mtime, reverse=True)
+        for stale in artifacts[MAX_ARTIFACTS:]:
+            stale.unlink(missing_ok=True)
+        return path
+    raise OSError("无法写入词典编译产物")
+
+def load_lexicon(sources=None, artifact_dir=DEFAULT_ARTIFACT_DIR):
+    # 编译（或复用）产物、映射并登记，返回编译后的词典
+    return activate_artifact(build_lexicon_artifact(sources, artifact_dir)).lexicon()
+
+# ==========================================
+# 命令行：预先编译产物 / 查看产物信息
+# ==========================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="电商评论情感分析 - 词典编译产物")
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help="合并内置词典与外部词典源并编译")
+    build.add_argument('sources', nargs='*', help=f"外部词典源（.json / .txt），省略时按 {SOURCES_ENV} 或 lexicon/ 目录")
+    build.add_argument('-o', '--output', help="产物路径（默认写入缓存目录）")
+    info = commands.add_parser('info', help="查看产物信息")
+    info.add_argument('path')
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        sources = args.sources or None
+        started = time.perf_counter()
+        if args.output:
+            paths = default_sources() if sources is None else [Path(p) for p in sources]
+            base = builtin_lexicon_source()
+            payloads = [(p.name, p.read_bytes()) for p in paths]
+            raw = merge_sources(base, [parse_source(name, data, base) for name, data in payloads])
+            path = compile_artifact(raw, args.output, sources_digest(base, payloads), [p.resolve() for p in paths])
+        else:
+            path = build_lexicon_artifact(sources)
+        print(f"{path}（{time.perf_counter() - started:.2f}s）", file=sys.stderr)
+        args.path = path
+
+    artifact = LexiconArtifact(args.path)
+    meta = artifact.meta
+    print(json.dumps({
+        'path': str(artifact.path),
+        'bytes': artifact.path.stat().st_size,
+        'artifact_version': meta['artifact_version'],
+        'scorer_version': meta['scorer_version'],
+        'jieba_version': meta['jieba_version'],
+        'fingerprint': meta['fingerprint'],
+        'entries': meta['entries'],
+        'jieba_words': len(artifact.arrays['jieba_ids']),
+        'dimensions': meta['dimension_names'],
+        'sources': meta['sources']
+    }, ensure_ascii=False, indent=2))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
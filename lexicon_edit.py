@@ -0,0 +1,173 @@
+import copy
+
+import numpy as np
+
+from sentiment_engine import CompiledLexicon, compile_sentiment_dict, normalize_review_text
+from vector_kernel import KERNEL_BLOCK_REVIEWS, get_token_table, block_scores, assign_block_scores, label_scores
+from analysis_result import LABEL_CODES
+from perf_metrics import current_recorder
+
+# ==========================================
+# 词典修改 + 增量重评分
+# 分词与词典无关，修改词典后只有"含被修改词条"的评论得分会变：
+# 情感词 / 维度词 / 否定词 / 程度副词通过分词结果的倒排索引（token_store.TokenStore.postings）找到受影响的不重复文本，
+# 明确模式是子串匹配，对不重复文本做一次子串查找；受影响的文本直接用已保存的分词结果重算（不再分词），
+# 结果与用新词典完整重新分析逐位一致，再把这些行写回列式结果、修补时间索引
+# ==========================================
+
+LEXICON_SECTIONS = {
+    'sentiment': '核心情感词',
+    'dimensions': '电商维度词',
+    'negations': '否定词',
+    'degrees': '程度副词',
+    'explicit': '明确模式'
+}
+
+def edit_lexicon(lexicon, section, word, value=None, group=None):
+    # 返回修改后的新词典（不修改原词典）；value 为 None 表示删除该词条
+    # sentiment：group 为强度分层，同一个词只保留在一个分层中；dimensions：group 为维度名，value 非 None 即加入
+    raw = copy.deepcopy(dict(compile_sentiment_dict(lexicon)))
+    word = word.strip()
+    if not word:
+        raise ValueError("词条不能为空")
+
+    if section == 'sentiment':
+        for layer, words in raw['sentiment'].items():
+            if layer != group:
+                words.pop(word, None)
+        if value is None:
+            raw['sentiment'][group].pop(word, None)
+        else:
+            raw['sentiment'][group][word] = float(value)
+    elif section == 'dimensions':
+        words = raw['dimensions'][group]
+        if value is None:
+            raw['dimensions'][group] = [w for w in words if w != word]
+        elif word not in words:
+            words.append(word)
+    elif section in LEXICON_SECTIONS:
+        if value is None:
+            raw[section].pop(word, None)
+        else:
+            raw[section][word] = float(value)
+    else:
+        raise ValueError(f"未知的词典类型：{section}")
+    return CompiledLexicon(raw)
+
+def changed_terms(old, new):
+    # 两个词典之间取值发生变化的 (词集合, 明确模式集合)；明确模式按评分时的小写形式返回
+    old, new = compile_sentiment_dict(old), compile_sentiment_dict(new)
+    if old.dimension_names != new.dimension_names:
+        raise ValueError("维度列表发生变化，需要重新分析")
+
+    words = set()
+    for before, after in ((old.word_scores, new.word_scores), (old.word_dimensions, new.word_dimensions),
+                          (old.negations, new.negations), (old.degrees, new.degrees)):
+        words |= {word for word in before.keys() | after.keys() if before.get(word) != after.get(word)}
+
+    # 明确模式取第一个命中者，顺序变化也会影响结果
+    patterns = {
+        pattern.lower() for pattern in old['explicit'].keys() | new['explicit'].keys()
+        if old['explicit'].get(pattern) != new['explicit'].get(pattern)
+        or old.explicit_rank.get(pattern) != new.explicit_rank.get(pattern)
+    }
+    patterns.discard('')
+    return words, patterns
+
+def count_changes(base, lexicon):
+    # 与基准词典相比改动的词条数（用于页面提示）
+    words, patterns = changed_terms(base, lexicon)
+    return len(words) + len(patterns)
+
+def unique_keys(store, texts, unique_ids=None):
+    # 取回不重复文本的规范化键（与评分时相同）；texts 为与分析结果逐行对应的原始评论列
+    texts = np.asarray(texts, dtype=object)
+    first_rows = store.text_first_rows()
+    if unique_ids is not None:
+        first_rows = first_rows[unique_ids]
+    return [normalize_review_text(texts[row]) for row in first_rows]
+
+def rescore_unique(store, unique_ids, keys, lexicon, block_reviews=KERNEL_BLOCK_REVIEWS):
+    # 用已保存的分词结果对 unique_ids 对应的文本重新评分，返回与 score_unique_texts 相同结构的结果
+    lexicon = compile_sentiment_dict(lexicon)
+    table = get_token_table(lexicon)
+    dim_names = lexicon.dimension_names
+    explicit = [(pattern.lower(), score) for pattern, score in lexicon['explicit'].items() if pattern]
+    # 分词结果的词 id -> 新词典的词 id（词典外为 0）
+    lexicon_of = np.array([table.vocab.get(word, 0) for word in store.words] or [0], dtype=np.int64)
+
+    n = len(unique_ids)
+    scores = np.full(n, 5.0)
+    dims = np.full((n, len(dim_names)), 5.0)
+    analysis = [{} for _ in range(n)]
+    lengths = np.diff(store.offsets)
+
+    for block_start in range(0, n, block_reviews):
+        targets = []
+        for pos in range(block_start, min(block_start + block_reviews, n)):
+            key = keys[pos]
+            if key is None:
+                continue
+            explicit_score = next((score for pattern, score in explicit if pattern in key), None)
+            if explicit_score is not None:
+                scores[pos] = explicit_score
+            elif lengths[unique_ids[pos]]:
+                targets.append((pos, key))
+        if not targets:
+            continue
+
+        # 从 CSR 中取出这些文本的词 id，拼成一批
+        ks = np.array([unique_ids[pos] for pos, _ in targets], dtype=np.int64)
+        block_lengths = lengths[ks]
+        offsets = np.concatenate([[0], np.cumsum(block_lengths)])
+        gather = np.repeat(store.offsets[ks] - offsets[:-1], block_lengths) + np.arange(offsets[-1])
+        final, dim_means, dim_counts = block_scores(lexicon_of[store.ids[gather]], offsets, table)
+        assign_block_scores(targets, final, dim_means, dim_counts, dim_names, scores, dims, analysis)
+
+    return scores, label_scores(scores), dims, analysis
+
+def apply_lexicon_change(columns, store, texts, old, new, time_index=None):
+    # 词典由 old 改为 new 后只重评受影响的不重复文本，返回 (新列式结果, 新时间索引, 统计信息)
+    # 近似重复归并的结果同样按每条文本自己的分词结果重评（受影响的文本不再沿用代表评论的得分）
+    # columns / store / time_index 都不做原地修改
+    perf = current_recorder()
+    new = compile_sentiment_dict(new)
+    words, patterns = changed_terms(old, new)
+    stats = {
+        'words': sorted(words),
+        'patterns': sorted(patterns),
+        'unseen': sorted(word for word in words if word not in store.word_ids),
+        'texts': 0,
+        'rows': 0
+    }
+
+    with perf.stage('lexicon.affected', texts=store.n_unique):
+        unique_ids = store.texts_containing(words)
+        if patterns:
+            keys = unique_keys(store, texts)
+            hits = [k for k, key in enumerate(keys) if key is not None and any(p in key for p in patterns)]
+            unique_ids = np.union1d(unique_ids, np.array(hits, dtype=np.int64))
+    if not len(unique_ids):
+        return columns, time_index, stats
+
+    with perf.stage('lexicon.rescore', texts=len(unique_ids)):
+        keys = unique_keys(store, texts, unique_ids)
+        scores, labels, dims, analysis = rescore_unique(store, unique_ids, keys, new)
+
+    with perf.stage('lexicon.patch', rows=len(columns)):
+        position = np.full(store.n_unique, -1, dtype=np.int64)
+        position[unique_ids] = np.arange(len(unique_ids))
+        row_position = position[store.row_index]
+        rows = np.flatnonzero(row_position >= 0)
+        row_position = row_position[rows]
+
+        codes = np.array([LABEL_CODES[label] for label in labels], dtype=np.int8)
+        mask = np.array([[dim in item for dim in new.dimension_names] for item in analysis], dtype=bool)
+        new_columns = columns.with_rows(
+            rows, scores.astype(np.float32)[row_position], codes[row_position], mask[row_position], dims[row_position]
+        )
+        if time_index is not None:
+            time_index = time_index.patched(rows, columns, new_columns)
+
+    stats.update(texts=len(unique_ids), rows=len(rows))
+    return new_columns, time_index, stats
@@ -0,0 +1,169 @@
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from sentiment_engine import load_integrated_sentiment_dict
+
+# ==========================================
+# 评分服务压测工具：多个 keep-alive 连接并发请求本地服务，统计吞吐和延迟分位数
+# 用法：
+#   python loadgen.py --port 8765 --concurrency 32 --requests 5000
+#   python loadgen.py --spawn-server --workers 2          # 自动启动本地服务后压测
+# ==========================================
+
+def sample_reviews(n, seed=42):
+    # 由词典拼出的合成评论，覆盖情感词 / 否定词 / 程度副词 / 维度词
+    sentiment_dict = load_integrated_sentiment_dict()
+    rng = random.Random(seed)
+    sentiment_words = [w for words in sentiment_dict['sentiment'].values() for w in words]
+    dimension_words = [w for words in sentiment_dict['dimensions'].values() for w in words]
+    negations = list(sentiment_dict['negations'])
+    degrees = list(sentiment_dict['degrees'])
+    reviews = []
+    for _ in range(n):
+        parts = []
+        for _ in range(rng.randint(1, 4)):
+            clause = rng.choice(dimension_words)
+            if rng.random() < 0.2:
+                clause += rng.choice(negations)
+            if rng.random() < 0.3:
+                clause += rng.choice(degrees)
+            clause += rng.choice(sentiment_words)
+            parts.append(clause)
+        reviews.append('，'.join(parts) + rng.choice(['', '！', '。', '😊']))
+    return reviews
+
+async def http_request(reader, writer, host, method, path, payload=None):
+    body = b'' if payload is None else json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    writer.write(
+        f'{method} {path} HTTP/1.1\r\nHost: {host}\r\n'
+        f'Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n'.encode('latin-1') + body
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value.strip())
+    data = await reader.readexactly(length) if length else b''
+    return status, data
+
+async def run_client(host, port, texts, counter, total, batch_size, latencies, errors, seed):
+    reader, writer = await asyncio.open_connection(host, port)
+    rng = random.Random(seed)
+    try:
+        while counter[0] < total:
+            counter[0] += 1
+            if batch_size > 1:
+                path, payload = '/score/batch', {'texts': rng.sample(texts, batch_size)}
+            else:
+                path, payload = '/score', {'text': rng.choice(texts)}
+            started = time.perf_counter()
+            status, _ = await http_request(reader, writer, host, 'POST', path, payload)
+            latencies.append(time.perf_counter() - started)
+            if status != 200:
+                errors[status] = errors.get(status, 0) + 1
+    finally:
+        writer.close()
+
+async def wait_for_health(host, port, timeout=60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+            status, _ = await http_request(reader, writer, host, 'GET', '/health')
+            writer.close()
+            if status == 200:
+                return True
+        except OSError:
+            pass
+        await asyncio.sleep(0.2)
+    return False
+
+def percentile(ordered, q):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+async def run_load(host, port, concurrency, total, batch_size, texts):
+    latencies = []
+    errors = {}
+    counter = [0]
+    started = time.perf_counter()
+    await asyncio.gather(*[
+        run_client(host, port, texts, counter, total, batch_size, latencies, errors, seed)
+        for seed in range(concurrency)
+    ])
+    elapsed = time.perf_counter() - started
+
+    reader, writer = await asyncio.open_connection(host, port)
+    _, metrics_text = await http_request(reader, writer, host, 'GET', '/metrics')
+    writer.close()
+
+    ordered = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'texts': len(latencies) * max(1, batch_size),
+        'errors': errors,
+        'elapsed_seconds': round(elapsed, 3),
+        'requests_per_second': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'texts_per_second': round(len(latencies) * max(1, batch_size) / elapsed, 1) if elapsed else 0.0,
+        'latency_ms': {
+            'p50': round(percentile(ordered, 0.5) * 1000, 2),
+            'p90': round(percentile(ordered, 0.9) * 1000, 2),
+            'p99': round(percentile(ordered, 0.99) * 1000, 2),
+            'max': round(ordered[-1] * 1000, 2) if ordered else 0.0
+        },
+        'server_metrics': metrics_text.decode('utf-8')
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="电商评论情感分析 - 评分服务压测")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--concurrency', type=int, default=32, help="并发连接数")
+    parser.add_argument('--requests', type=int, default=5000, help="请求总数")
+    parser.add_argument('--batch-size', type=int, default=1, help="大于 1 时请求 /score/batch，每次发送的文本数")
+    parser.add_argument('--spawn-server', action='store_true', help="先在本地启动 scoring_server.py 再压测")
+    parser.add_argument('--workers', type=int, default=None, help="--spawn-server 时的评分进程数")
+    parser.add_argument('--json', action='store_true', help="以 JSON 输出结果")
+    args = parser.parse_args(argv)
+
+    server = None
+    if args.spawn_server:
+        command = [sys.executable, str(Path(__file__).with_name('scoring_server.py')),
+                   '--host', args.host, '--port', str(args.port)]
+        if args.workers is not None:
+            command += ['--workers', str(args.workers)]
+        server = subprocess.Popen(command)
+    try:
+        if not asyncio.run(wait_for_health(args.host, args.port)):
+            print(f"❌ 无法连接评分服务 {args.host}:{args.port}", file=sys.stderr)
+            return 1
+        texts = sample_reviews(2000)
+        result = asyncio.run(run_load(args.host, args.port, args.concurrency, args.requests, args.batch_size, texts))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        latency = result['latency_ms']
+        print(f"请求 {result['requests']} 次（{result['texts']} 条文本），用时 {result['elapsed_seconds']}s，错误 {result['errors'] or 0}")
+        print(f"吞吐：{result['requests_per_second']} 请求/秒，{result['texts_per_second']} 条/秒")
+        print(f"延迟：p50 {latency['p50']}ms | p90 {latency['p90']}ms | p99 {latency['p99']}ms | max {latency['max']}ms")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
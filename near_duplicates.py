@@ -0,0 +1,236 @@
+import re
+import sys
+import argparse
+
+import numpy as np
+
+from sentiment_engine import compile_sentiment_dict, collapse_texts, score_unique_texts
+
+# ==========================================
+# 近似重复评论归并（MinHash + LSH）
+# 精确去重之后，模板化 / 轻微改动的评论（「好评返现」复制粘贴、只差表情或标点）仍会逐条分词评分，
+# 这里先去掉非文字字符，按字符 shingle 计算 MinHash 签名，LSH 分段分桶找候选对，签名相似度达到阈值的归为一簇
+# 簇内成员的词典命中序列与代表评论（簇内最早出现的评论）相同时直接沿用代表评论的得分，不同时单独评分
+# 归并结果是近似值：只差标点 / 表情时得分与逐条评分相同或仅差中性区间的抖动，可用 python near_duplicates.py 查看偏差
+# 每簇行数另行统计，用于计算按簇去重的平均得分（刷量评论不再拉偏均值）
+# ==========================================
+
+DEFAULT_THRESHOLD = 0.8
+NUM_PERM = 64
+LSH_BANDS = 16
+SHINGLE_SIZE = 3
+SIGNATURE_BLOCK = 1 << 20     # 每块最多计算的 shingle 数，限制临时数组大小
+SHINGLE_BASE = np.uint64(1000003)
+CORE_PATTERN = re.compile(r'[^\u4e00-\u9fa5a-z0-9]')
+
+def core_text(key):
+    # 归并用的文本：规范化键（已转小写）去掉表情、标点和空白
+    return CORE_PATTERN.sub('', key) if key else ''
+
+def minhash_signatures(cores, num_perm=NUM_PERM, shingle=SHINGLE_SIZE, seed=0):
+    # 返回 (len(cores), num_perm) 的 uint32 签名矩阵；短于 shingle 的文本整体作为一个 shingle
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 2**63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+    lengths = np.array([len(c) for c in cores], dtype=np.int64)
+    counts = np.maximum(lengths - shingle + 1, 1)
+    cum = np.cumsum(counts)
+    signatures = np.empty((len(cores), num_perm), dtype=np.uint32)
+    pad = '\x00' * (shingle - 1)
+
+    start = 0
+    while start < len(cores):
+        before = cum[start - 1] if start else 0
+        end = max(int(np.searchsorted(cum, before + SIGNATURE_BLOCK, side='right')), start + 1)
+        # 文本之间用 shingle-1 个空字符隔开，跨文本的 shingle 不会被取到
+        codes = np.frombuffer((pad.join(cores[start:end]) + pad).encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+        m = len(codes) - shingle + 1
+        hashes = np.zeros(m, dtype=np.uint64)
+        for j in range(shingle):
+            hashes = hashes * SHINGLE_BASE + codes[j:j + m]
+
+        block_counts = counts[start:end]
+        text_starts = np.concatenate(([0], np.cumsum(lengths[start:end] + shingle - 1)[:-1]))
+        segments = np.concatenate(([0], np.cumsum(block_counts)[:-1]))
+        positions = np.repeat(text_starts - segments, block_counts) + np.arange(block_counts.sum())
+        shingles = hashes[positions]
+        for p in range(num_perm):
+            # multiply-shift 哈希族：(a*x + b) mod 2^64 取高 32 位
+            values = ((shingles * a[p] + b[p]) >> np.uint64(32)).astype(np.uint32)
+            signatures[start:end, p] = np.minimum.reduceat(values, segments)
+        start = end
+    return signatures
+
+def lsh_candidate_pairs(signatures, bands=LSH_BANDS, threshold=DEFAULT_THRESHOLD):
+    # 签名按段分桶，同桶成员与桶内第一个成员组成候选对；返回签名相似度达到阈值的 (a, b) 下标数组
+    n, num_perm = signatures.shape
+    rows = num_perm // bands
+    pairs_a, pairs_b = [], []
+    for band in range(bands):
+        keys = np.zeros(n, dtype=np.uint64)
+        for col in range(band * rows, (band + 1) * rows):
+            keys = keys * SHINGLE_BASE + signatures[:, col].astype(np.uint64)
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        first = np.ones(n, dtype=bool)
+        first[1:] = sorted_keys[1:] != sorted_keys[:-1]
+        heads = order[np.maximum.accumulate(np.where(first, np.arange(n), 0))]
+        members, heads = order[~first], heads[~first]
+        if not len(members):
+            continue
+        similar = (signatures[members] == signatures[heads]).mean(axis=1) >= threshold
+        pairs_a.append(members[similar])
+        pairs_b.append(heads[similar])
+    if not pairs_a:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(pairs_a), np.concatenate(pairs_b)
+
+def connected_labels(n, a, b):
+    # 候选对构成的图的连通分量：每个节点的标签为所在分量中最小的下标（最小标签传播 + 指针跳跃）
+    labels = np.arange(n)
+    while len(a):
+        updated = labels.copy()
+        smaller = np.minimum(labels[a], labels[b])
+        np.minimum.at(updated, a, smaller)
+        np.minimum.at(updated, b, smaller)
+        while True:
+            jumped = updated[updated]
+            if np.array_equal(jumped, updated):
+                break
+            updated = jumped
+        if np.array_equal(updated, labels):
+            break
+        labels = updated
+    return labels
+
+class NearDuplicateClusters:
+    # 与 token_store.TokenStore 一样由调用方创建后传入评分函数：collapse 把精确去重后的文本再按近似重复归并，
+    # 之后 row_clusters（每行所属簇）/ cluster_texts（各簇代表评论）/ stats 可用于报告簇大小和按簇去重的汇总
+    def __init__(self, threshold=DEFAULT_THRESHOLD, num_perm=NUM_PERM, bands=LSH_BANDS, shingle=SHINGLE_SIZE):
+        self.threshold = float(threshold)
+        self.num_perm = num_perm
+        self.bands = bands
+        self.shingle = shingle
+        self.row_clusters = None
+        self.cluster_texts = None
+        self.cluster_members = None
+        self.stats = {}
+
+    def params(self):
+        return {'threshold': self.threshold, 'num_perm': self.num_perm, 'bands': self.bands, 'shingle': self.shingle}
+
+    def cluster(self, unique_texts):
+        # 返回每条不重复文本所属簇的代表下标（簇内最早出现的文本）
+        roots = np.arange(len(unique_texts))
+        cores = [core_text(key) for key in unique_texts]
+        eligible = np.array([k for k, core in enumerate(cores) if core], dtype=np.int64)
+        if len(eligible) > 1:
+            signatures = minhash_signatures([cores[k] for k in eligible], self.num_perm, self.shingle)
+            a, b = lsh_candidate_pairs(signatures, self.bands, self.threshold)
+            roots[eligible] = eligible[connected_labels(len(eligible), a, b)]
+        return roots
+
+    def collapse(self, unique_texts, inverse, sentiment_dict):
+        # 输入 / 输出同 collapse_texts：返回 (评分单元文本列表, 每行对应的单元下标)
+        lexicon = compile_sentiment_dict(sentiment_dict)
+        roots = self.cluster(unique_texts)
+        units = np.arange(len(unique_texts))
+        automaton = lexicon.automaton
+        hit_cache = {}
+
+        def lexicon_hits(k):
+            hits = hit_cache.get(k)
+            if hits is None:
+                hits = hit_cache[k] = tuple(hit[2:4] for hit in automaton.findall(unique_texts[k]))
+            return hits
+
+        followers = np.flatnonzero(roots != units)
+        for k in followers:
+            if lexicon_hits(k) == lexicon_hits(roots[k]):
+                units[k] = roots[k]
+
+        unit_ids, unit_of = np.unique(units, return_inverse=True)
+        cluster_ids, cluster_of = np.unique(roots, return_inverse=True)
+        self.row_clusters = cluster_of[inverse].astype(np.int32)
+        self.cluster_texts = [unique_texts[k] for k in cluster_ids]
+        self.cluster_members = np.bincount(cluster_of, minlength=len(cluster_ids))
+        reused = int((units[followers] != followers).sum())
+        self.stats = {
+            'clusters': int((self.cluster_members > 1).sum()),
+            'clustered_texts': int(self.cluster_members[self.cluster_members > 1].sum()),
+            'reused_texts': reused,
+            'rescored_texts': len(followers) - reused
+        }
+        return [unique_texts[k] for k in unit_ids], unit_of[inverse]
+
+    def cluster_sizes(self):
+        # 每簇的行数
+        return np.bincount(self.row_clusters, minlength=len(self.cluster_texts))
+
+    def summary(self, scores, label_codes, labels, top=20):
+        # 按簇去重的汇总：每簇计一次（簇内各行权重为 1/簇行数），以及行数最多的簇
+        sizes = self.cluster_sizes()
+        n_clusters = len(sizes)
+        weights = 1.0 / sizes[self.row_clusters]
+        cluster_means = np.bincount(self.row_clusters, weights=scores, minlength=n_clusters) / sizes
+        label_weights = np.bincount(label_codes, weights=weights, minlength=len(labels))
+        largest = [c for c in np.argsort(-sizes, kind='stable')[:top] if sizes[c] > 1]
+        return {
+            **self.params(),
+            **self.stats,
+            'rows': len(self.row_clusters),
+            'groups': n_clusters,
+            'avg_score': float(cluster_means.mean()) if n_clusters else 5.0,
+            'label_ratios': {label: float(label_weights[i] / n_clusters) if n_clusters else 0.0
+                             for i, label in enumerate(labels)},
+            'largest': [
+                {'rows': int(sizes[c]), 'texts': int(self.cluster_members[c]),
+                 'avg_score': float(cluster_means[c]), 'text': self.cluster_texts[c]}
+                for c in largest
+            ]
+        }
+
+def compare_with_exact(texts, sentiment_dict, threshold=DEFAULT_THRESHOLD):
+    # 归并评分与逐条评分的对比，返回 (归并对象, 逐行得分差的绝对值)
+    lexicon = compile_sentiment_dict(sentiment_dict)
+    unique_texts, inverse = collapse_texts(texts)
+    exact = score_unique_texts(unique_texts, lexicon)[0][inverse]
+    clusters = NearDuplicateClusters(threshold)
+    unit_texts, unit_inverse = clusters.collapse(unique_texts, inverse, lexicon)
+    approx = score_unique_texts(unit_texts, lexicon)[0][unit_inverse]
+    return clusters, np.abs(approx - exact)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="近似重复评论归并：簇统计及与逐条评分的偏差")
+    parser.add_argument('inputs', nargs='*', help="CSV/JSONL 文件（省略时使用合成评论语料）")
+    parser.add_argument('-c', '--column', help="评论内容列名（默认自动识别）")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help="签名相似度阈值（0-1）")
+    parser.add_argument('--synthetic', type=int, default=20000, help="合成语料条数")
+    parser.add_argument('--top', type=int, default=10, help="列出行数最多的簇数")
+    args = parser.parse_args(argv)
+
+    from sentiment_engine import load_integrated_sentiment_dict
+    sentiment_dict = load_integrated_sentiment_dict()
+    if args.inputs:
+        from sentiment_cli import iter_records, resolve_content_field
+        texts = []
+        for record in iter_records(args.inputs, None):
+            texts.append(record.get(resolve_content_field(record, args.column)))
+    else:
+        from loadgen import sample_reviews
+        texts = sample_reviews(args.synthetic)
+
+    clusters, diff = compare_with_exact(texts, sentiment_dict, args.threshold)
+    stats = clusters.stats
+    print(f"🧬 近似重复簇 {stats['clusters']} 个（含 {stats['clustered_texts']} 条不重复文本），"
+          f"沿用代表评论得分 {stats['reused_texts']} 条，词典命中不同而单独评分 {stats['rescored_texts']} 条")
+    print(f"📏 与逐条评分相比：{int((diff > 0).sum())}/{len(diff)} 行得分不同，"
+          f"平均偏差 {diff.mean() if len(diff) else 0.0:.4f}，最大偏差 {diff.max() if len(diff) else 0.0:.2f}")
+    sizes = clusters.cluster_sizes()
+    for c in np.argsort(-sizes, kind='stable')[:args.top]:
+        if sizes[c] > 1:
+            print(f"  {sizes[c]:>6} 行 / {clusters.cluster_members[c]:>4} 种写法  {clusters.cluster_texts[c]!r:.60}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
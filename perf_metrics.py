@@ -0,0 +1,177 @@
+import json
+import time
+import threading
+import contextvars
+
+# ==========================================
+# 性能埋点：分阶段计时器 + 计数器，可导出为 JSON / Prometheus 文本格式
+# 埋点处通过 current_recorder() 取当前记录器；未开启时取到的是空记录器，stage() 返回同一个空上下文，
+# wrap() 原样返回被包装的函数，埋点都在分块 / 分批粒度上，关闭时开销可以忽略
+# 多进程评分时 worker 内的分阶段耗时随结果带回主进程合并（为各进程累计耗时）
+# ==========================================
+
+METRIC_PREFIX = 'sentiment_app'
+
+class NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def add(self, **items):
+        pass
+
+NULL_STAGE = NullStage()
+
+class StageTimer:
+    def __init__(self, recorder, name, items):
+        self.recorder = recorder
+        self.name = name
+        self.items = dict(items)
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.recorder.observe(self.name, time.perf_counter() - self.started, **self.items)
+        return False
+
+    def add(self, **items):
+        # 阶段内累加处理量（如 texts / tokens / rows），用于计算吞吐
+        for unit, value in items.items():
+            self.items[unit] = self.items.get(unit, 0) + value
+
+class PerfRecorder:
+    enabled = True
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started = time.time()
+            self.stages = {}
+            self.counters = {}
+
+    def stage(self, name, **items):
+        return StageTimer(self, name, items)
+
+    def observe(self, name, seconds, calls=1, **items):
+        with self.lock:
+            stat = self.stages.get(name)
+            if stat is None:
+                stat = self.stages[name] = {'calls': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'last_seconds': 0.0, 'items': {}}
+            stat['calls'] += calls
+            stat['seconds'] += seconds
+            stat['max_seconds'] = max(stat['max_seconds'], seconds)
+            stat['last_seconds'] = seconds
+            for unit, value in items.items():
+                stat['items'][unit] = stat['items'].get(unit, 0) + value
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def wrap(self, name, fn):
+        # 给回调（如进度条更新）计时计数
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.observe(name, time.perf_counter() - started)
+        return timed
+
+    def merge(self, snapshot):
+        # 合并其他记录器（如 worker 进程）的 snapshot()
+        for name, stat in snapshot['stages'].items():
+            with self.lock:
+                mine = self.stages.get(name)
+                if mine is None:
+                    mine = self.stages[name] = {'calls': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'last_seconds': 0.0, 'items': {}}
+                mine['calls'] += stat['calls']
+                mine['seconds'] += stat['seconds']
+                mine['max_seconds'] = max(mine['max_seconds'], stat['max_seconds'])
+                mine['last_seconds'] = stat['last_seconds']
+                for unit, value in stat['items'].items():
+                    mine['items'][unit] = mine['items'].get(unit, 0) + value
+        for name, value in snapshot['counters'].items():
+            self.count(name, value)
+
+    def snapshot(self):
+        with self.lock:
+            stages = {}
+            for name, stat in self.stages.items():
+                stages[name] = {**stat, 'items': dict(stat['items']), 'rates': {
+                    f'{unit}_per_second': value / stat['seconds'] for unit, value in stat['items'].items()
+                    if stat['seconds'] > 0
+                }}
+            return {'started_at': self.started, 'uptime_seconds': time.time() - self.started,
+                    'stages': stages, 'counters': dict(self.counters)}
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+
+    def to_prometheus(self, prefix=METRIC_PREFIX):
+        snapshot = self.snapshot()
+        stages = sorted(snapshot['stages'].items())
+        lines = [
+            f'# HELP {prefix}_stage_seconds_total Time spent in each instrumented stage.',
+            f'# TYPE {prefix}_stage_seconds_total counter'
+        ]
+        lines += [f'{prefix}_stage_seconds_total{{stage="{escape_label(name)}"}} {stat["seconds"]:.6f}'
+                  for name, stat in stages]
+        lines += [f'# HELP {prefix}_stage_calls_total Number of times each stage ran.',
+                  f'# TYPE {prefix}_stage_calls_total counter']
+        lines += [f'{prefix}_stage_calls_total{{stage="{escape_label(name)}"}} {stat["calls"]}' for name, stat in stages]
+        lines += [f'# HELP {prefix}_stage_items_total Items processed per stage by unit (rows, texts, tokens).',
+                  f'# TYPE {prefix}_stage_items_total counter']
+        lines += [f'{prefix}_stage_items_total{{stage="{escape_label(name)}",unit="{escape_label(unit)}"}} {value}'
+                  for name, stat in stages for unit, value in sorted(stat['items'].items())]
+        lines += [f'# HELP {prefix}_stage_last_seconds Duration of the most recent run of each stage.',
+                  f'# TYPE {prefix}_stage_last_seconds gauge']
+        lines += [f'{prefix}_stage_last_seconds{{stage="{escape_label(name)}"}} {stat["last_seconds"]:.6f}'
+                  for name, stat in stages]
+        lines += [f'# HELP {prefix}_events_total Instrumentation counters (cache hits and similar).',
+                  f'# TYPE {prefix}_events_total counter']
+        lines += [f'{prefix}_events_total{{name="{escape_label(name)}"}} {value}'
+                  for name, value in sorted(snapshot['counters'].items())]
+        lines += [f'# TYPE {prefix}_uptime_seconds gauge', f'{prefix}_uptime_seconds {snapshot["uptime_seconds"]:.1f}']
+        return '\n'.join(lines) + '\n'
+
+class NullRecorder:
+    enabled = False
+
+    def stage(self, name, **items):
+        return NULL_STAGE
+
+    def observe(self, name, seconds, calls=1, **items):
+        pass
+
+    def count(self, name, value=1):
+        pass
+
+    def wrap(self, name, fn):
+        return fn
+
+    def merge(self, snapshot):
+        pass
+
+NULL_RECORDER = NullRecorder()
+_CURRENT_RECORDER = contextvars.ContextVar('perf_recorder', default=NULL_RECORDER)
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def current_recorder():
+    return _CURRENT_RECORDER.get()
+
+def activate(recorder):
+    # 把 recorder 设为当前上下文（线程）的记录器；返回值交给 deactivate 恢复
+    return _CURRENT_RECORDER.set(recorder if recorder is not None else NULL_RECORDER)
+
+def deactivate(token):
+    _CURRENT_RECORDER.reset(token)
@@ -0,0 +1,90 @@
+import numpy as np
+
+from sentiment_engine import SENTIMENT_LABELS
+from analysis_result import DIM_DEFAULT, LABEL_CODES
+
+# ==========================================
+# 渐进式估计：完整模式的后台任务按分层随机顺序评分，边评分边给出汇总指标的估计值和置信区间
+# 行按位置等分为 SAMPLE_STRATA 层（上传文件常按时间 / 商品排列），层内随机排列后按比例交错成一个行顺序，
+#   该顺序的任一前缀都是按比例分配的分层随机样本；不重复文本按其在该顺序中首次出现的位置分块评分，
+#   每块完成后，顺序中到下一块首条文本之前的所有行都已有得分
+# 估计量：分层均值 Σ W_h·ȳ_h，方差 Σ W_h²·(1 - n_h/N_h)·s_h²/n_h；平均得分、各标签占比（0/1 指示量的均值）、
+#   各维度平均分（未涉及按 5.0 计，与结果页口径一致）都是逐行量的均值，用同一估计量；全部行评分完成时区间宽度为 0
+# ==========================================
+
+SAMPLE_STRATA = 16
+SAMPLE_SEED = 0
+CONFIDENCE_Z = 1.96    # 95% 置信区间
+
+def stratum_ids(n_rows, strata=SAMPLE_STRATA):
+    return (np.arange(n_rows, dtype=np.int64) * strata) // max(n_rows, 1)
+
+def stratified_order(n_rows, strata=SAMPLE_STRATA, seed=SAMPLE_SEED):
+    # 层内随机排列；每行的排序键为「层内名次 / 层大小」，按键交错各层，使任一前缀中各层行数与层大小成比例
+    rng = np.random.default_rng(seed)
+    layer = stratum_ids(n_rows, strata)
+    grouped = np.lexsort((rng.random(n_rows), layer))
+    sizes = np.bincount(layer, minlength=strata)
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    rank = np.empty(n_rows, dtype=np.float64)
+    rank[grouped] = np.arange(n_rows) - starts[layer[grouped]]
+    return np.lexsort((layer, (rank + 0.5) / np.maximum(sizes, 1)[layer]))
+
+def unit_first_positions(inverse, order):
+    # 每个评分单元（不重复文本）在行顺序中首次出现的位置
+    first = np.full(int(inverse.max()) + 1 if len(inverse) else 0, len(order), dtype=np.int64)
+    np.minimum.at(first, inverse[order], np.arange(len(order), dtype=np.int64))
+    return first
+
+class ProgressiveEstimate:
+    # 由评分任务线程更新；snapshot 为最近一次估计（整体替换），页面线程只读
+    def __init__(self, inverse, order, dim_names, strata=SAMPLE_STRATA):
+        self.inverse = np.asarray(inverse, dtype=np.int64)
+        self.order = order
+        self.dim_names = tuple(dim_names)
+        self.strata = strata
+        self.n_rows = len(self.inverse)
+        self.layer = stratum_ids(self.n_rows, strata)
+        self.stratum_sizes = np.bincount(self.layer, minlength=strata)
+        n_units = int(self.inverse.max()) + 1 if self.n_rows else 0
+        # 逐单元的指标：得分、各标签指示量、各维度稠密得分
+        self.unit_values = np.zeros((n_units, 1 + len(SENTIMENT_LABELS) + len(self.dim_names)), dtype=np.float32)
+        self.snapshot = None
+
+    def update(self, units, unique_result, sampled_rows):
+        # units：本块评分单元的下标，unique_result 与之逐条对应；sampled_rows：行顺序中已全部有得分的前缀长度
+        scores, labels, dims, analysis = unique_result
+        values = np.zeros((len(units), self.unit_values.shape[1]), dtype=np.float32)
+        values[:, 0] = scores
+        codes = np.array([LABEL_CODES[label] for label in labels], dtype=np.int64)
+        values[np.arange(len(units)), 1 + codes] = 1.0
+        for j, dim in enumerate(self.dim_names):
+            hit = np.array([dim in item for item in analysis], dtype=bool)
+            values[:, 1 + len(SENTIMENT_LABELS) + j] = np.where(hit, dims[:, j], DIM_DEFAULT)
+        self.unit_values[units] = values
+        if sampled_rows > 0:
+            self.snapshot = self.estimate(sampled_rows)
+
+    def estimate(self, sampled_rows):
+        rows = self.order[:sampled_rows]
+        values = self.unit_values[self.inverse[rows]].astype(np.float64)
+        layer = self.layer[rows]
+        n_h = np.bincount(layer, minlength=self.strata).astype(np.float64)
+        sums = np.stack([np.bincount(layer, weights=values[:, k], minlength=self.strata) for k in range(values.shape[1])], axis=1)
+        squares = np.stack([np.bincount(layer, weights=values[:, k] ** 2, minlength=self.strata) for k in range(values.shape[1])], axis=1)
+        sampled = n_h > 0
+        n_s, N_s = n_h[sampled][:, None], self.stratum_sizes[sampled].astype(np.float64)[:, None]
+        means = sums[sampled] / n_s
+        variances = np.maximum(squares[sampled] - n_s * means ** 2, 0.0) / np.maximum(n_s - 1, 1)
+        weights = N_s / N_s.sum()
+        point = (weights * means).sum(axis=0)
+        half = CONFIDENCE_Z * np.sqrt((weights ** 2 * (1 - n_s / N_s) * variances / n_s).sum(axis=0))
+        n_labels = len(SENTIMENT_LABELS)
+        return {
+            'sampled_rows': int(sampled_rows),
+            'rows': self.n_rows,
+            'avg_score': (float(point[0]), float(half[0])),
+            'label_ratios': {label: (float(point[1 + k]), float(half[1 + k])) for k, label in enumerate(SENTIMENT_LABELS)},
+            'dim_avg_scores': {dim: (float(point[1 + n_labels + j]), float(half[1 + n_labels + j]))
+                               for j, dim in enumerate(self.dim_names)}
+        }
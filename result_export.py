@@ -0,0 +1,205 @@
+import os
+import json
+import hashlib
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from sentiment_engine import SENTIMENT_LABELS
+from analysis_result import LABEL_CODES, dimension_column
+from stream_analysis import SCORE_HIST_EDGES
+
+# ==========================================
+# 分析结果导出：CSV / Parquet / Excel，范围为全部结果、仅消极评论或仅汇总统计
+# 按块（原始列 + 结果列）写到临时文件再原子替换，内存中不出现完整的结果表或完整的文件内容
+# 文件按 (分析结果键, 格式, 范围) 的哈希命名，缓存在 ~/.cache/sentiment-analysis-app/exports/，
+# 同一结果再次导出（含其他会话）直接复用；词典修改后分析结果键变化，自然生成新文件
+# ==========================================
+
+DEFAULT_EXPORT_DIR = Path.home() / '.cache' / 'sentiment-analysis-app' / 'exports'
+MAX_EXPORT_FILES = 32
+EXPORT_FORMAT_VERSION = 2
+EXPORT_CHUNK_ROWS = 50000
+XLSX_MAX_ROWS = 1048576          # 单个工作表的行数上限（含表头），超出后续写到下一个工作表
+XLSX_SHEET_NAME = '分析结果'
+
+EXPORT_FORMATS = {
+    'csv': ('CSV', '.csv', 'text/csv'),
+    'parquet': ('Parquet', '.parquet', 'application/vnd.apache.parquet'),
+    'xlsx': ('Excel', '.xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+}
+EXPORT_SCOPES = {
+    'rows': '全部结果',
+    'negative': '仅消极评论',
+    'aggregates': '仅汇总统计'
+}
+NEGATIVE_LABEL = '消极'
+RESULT_FLOAT_COLUMNS = ('情感得分',)
+SCORE_DECIMALS = 2                # 与评分引擎的取整精度一致
+
+def export_path(key, fmt, scope, export_dir=DEFAULT_EXPORT_DIR):
+    digest = hashlib.blake2b(json.dumps([list(key), fmt, scope], ensure_ascii=False).encode('utf-8'),
+                             digest_size=16).hexdigest()
+    return Path(export_dir) / f'{digest}-{scope}.v{EXPORT_FORMAT_VERSION}{EXPORT_FORMATS[fmt][1]}'
+
+def _prune_exports(export_dir, keep):
+    files = [p for p in Path(export_dir).glob(f'*.v{EXPORT_FORMAT_VERSION}.*') if p.suffix != '.tmp']
+    files.sort(key=lambda p: p.stat().st_mtime, reverse=True)
+    for stale in files[keep:]:
+        try:
+            stale.unlink()
+        except OSError:
+            pass
+
+def result_frames(columns, source, negative_only=False, chunk_rows=EXPORT_CHUNK_ROWS):
+    # 完整模式：source 为原始数据 DataFrame 或按块产出的可迭代对象（ConvertedSheet.iter_frames()），见 ColumnarResult.iter_joined
+    negative = columns.label_codes == LABEL_CODES[NEGATIVE_LABEL] if negative_only else None
+    start = 0
+    for part in columns.iter_joined(source, chunk_rows):
+        rows = len(part)
+        if negative is not None:
+            part = part[negative[start:start + rows]]
+        start += rows
+        yield part
+
+def spill_frames(spill_path, dim_names, negative_only=False, chunk_rows=EXPORT_CHUNK_ROWS):
+    # 流式模式：按块读回逐行结果文件；原始列一律按文本读取，避免各块推断出的类型不一致
+    header = pd.read_csv(spill_path, encoding='utf-8-sig', nrows=0).columns
+    float_columns = set(RESULT_FLOAT_COLUMNS) | {dimension_column(dim) for dim in dim_names}
+    dtype = {col: (np.float32 if col in float_columns else str) for col in header}
+    for part in pd.read_csv(spill_path, encoding='utf-8-sig', dtype=dtype, chunksize=chunk_rows):
+        if negative_only:
+            part = part[part['情感标签'] == NEGATIVE_LABEL]
+        yield part
+
+def _aggregate_row(group, item, count, total, score_sum):
+    return {
+        '分组': group,
+        '项目': item,
+        '评论数': int(count),
+        '占比': float(count) / total if total else 0.0,
+        '平均得分': float(score_sum) / count if count else np.nan
+    }
+
+def _histogram_rows(counts, total):
+    # 得分区间只有评论数，没有区间内的平均得分
+    edges = SCORE_HIST_EDGES
+    return [_aggregate_row('得分区间', f'{edges[i]:.2f}-{edges[i + 1]:.2f}', count, total, np.nan)
+            for i, count in enumerate(counts)]
+
+def aggregate_frame(columns, time_index=None):
+    # 完整模式的汇总统计（长表）：整体、各情感标签、各维度（只含涉及该维度的评论）、得分区间、各日期
+    total = len(columns)
+    scores = columns.scores.astype(np.float64)
+    rows = [_aggregate_row('整体', '全部评论', total, total, scores.sum())]
+    label_counts = np.bincount(columns.label_codes, minlength=len(SENTIMENT_LABELS))
+    label_sums = np.bincount(columns.label_codes, weights=scores, minlength=len(SENTIMENT_LABELS))
+    rows += [_aggregate_row('情感标签', label, label_counts[code], total, label_sums[code])
+             for code, label in enumerate(SENTIMENT_LABELS)]
+    rows += [_aggregate_row('维度', dim, len(values), total, values.sum(dtype=np.float64))
+             for dim, values in zip(columns.dim_names, columns.dim_values)]
+    rows += _histogram_rows(np.histogram(scores, bins=SCORE_HIST_EDGES)[0], total)
+    if time_index is not None:
+        rows += [_aggregate_row('日期', str(day), count, total, score_sum)
+                 for day, count, score_sum in zip(time_index.days, time_index.counts, time_index.score_sums)]
+    return pd.DataFrame(rows, columns=['分组', '项目', '评论数', '占比', '平均得分'])
+
+def stream_aggregate_frame(aggregates):
+    # 流式模式的汇总统计：来自 StreamingAggregates.to_dict()，各标签只有评论数
+    total = aggregates['rows']
+    rows = [_aggregate_row('整体', '全部评论', total, total, aggregates['score_sum'])]
+    rows += [_aggregate_row('情感标签', label, aggregates['label_counts'].get(label, 0), total, np.nan)
+             for label in SENTIMENT_LABELS]
+    rows += [_aggregate_row('维度', dim, aggregates['dim_counts'][dim], total, aggregates['dim_sums'][dim])
+             for dim in aggregates['dim_sums']]
+    rows += _histogram_rows(aggregates['score_hist_counts'], total)
+    return pd.DataFrame(rows, columns=['分组', '项目', '评论数', '占比', '平均得分'])
+
+def write_csv(path, frames):
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        for start, part in enumerate(frames):
+            part.to_csv(f, index=False, header=(start == 0))
+
+def _string_columns(part, string_cols):
+    # 混合类型的文本列统一转为字符串（同 excel_ingest._arrow_compatible），使各块与第一块的 schema 一致
+    for col in string_cols:
+        values = part[col]
+        if pd.api.types.infer_dtype(values, skipna=True) not in ('string', 'empty'):
+            part[col] = values.where(values.isna(), values.astype(str))
+    return part
+
+def write_parquet(path, frames):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    writer = None
+    try:
+        for part in frames:
+            if writer is None:
+                string_cols = [col for col in part.columns if part[col].dtype == object]
+                schema = pa.Schema.from_pandas(part, preserve_index=False)
+                for col in string_cols:
+                    schema = schema.set(schema.get_field_index(col), pa.field(col, pa.string()))
+                writer = pq.ParquetWriter(path, schema)
+            part = _string_columns(part.copy(), string_cols)
+            writer.write_table(pa.Table.from_pandas(part, schema=schema, preserve_index=False))
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        pq.write_table(pa.table({}), path)
+
+def _xlsx_rows(part):
+    # float32 得分列先转 float64 并取两位小数，否则单元格中写入的是 8.850000381469727 这样的 float32 展开值
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+    part = part.copy()
+    for col in part.columns:
+        if part[col].dtype == np.float32:
+            part[col] = part[col].astype(np.float64).round(SCORE_DECIMALS)
+    values = part.astype(object).where(part.notna(), None)
+    for col in values.columns:
+        if part[col].dtype == object:
+            values[col] = values[col].map(lambda v: ILLEGAL_CHARACTERS_RE.sub('', v) if isinstance(v, str) else v)
+    return values.itertuples(index=False, name=None)
+
+def write_xlsx(path, frames):
+    # write_only 模式逐行写出，不保留单元格对象；超过单表行数上限时续写到「分析结果_2」等工作表
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    sheet, header, sheet_rows = None, None, 0
+    for part in frames:
+        if header is None:
+            header = [str(col) for col in part.columns]
+        for row in _xlsx_rows(part):
+            if sheet is None or sheet_rows >= XLSX_MAX_ROWS:
+                name = XLSX_SHEET_NAME if sheet is None else f'{XLSX_SHEET_NAME}_{len(workbook.worksheets) + 1}'
+                sheet = workbook.create_sheet(name)
+                sheet.append(header)
+                sheet_rows = 1
+            sheet.append(row)
+            sheet_rows += 1
+    if sheet is None:
+        sheet = workbook.create_sheet(XLSX_SHEET_NAME)
+        if header is not None:
+            sheet.append(header)
+    workbook.save(path)
+
+EXPORT_WRITERS = {'csv': write_csv, 'parquet': write_parquet, 'xlsx': write_xlsx}
+
+def export_result(key, fmt, scope, frames, export_dir=DEFAULT_EXPORT_DIR):
+    # 返回导出文件路径；frames() 返回按块产出的 DataFrame，只在文件尚不存在时调用
+    path = export_path(key, fmt, scope, export_dir)
+    if path.exists():
+        os.utime(path)
+        return path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    try:
+        EXPORT_WRITERS[fmt](tmp_path, frames())
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+    _prune_exports(export_dir, MAX_EXPORT_FILES)
+    return path
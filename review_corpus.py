@@ -0,0 +1,116 @@
+import sys
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from sentiment_engine import load_integrated_sentiment_dict
+
+# ==========================================
+# 合成电商评论语料：由词典的情感词 / 维度词 / 否定词 / 程度副词 / 明确模式拼成，固定种子下逐条确定
+# 长度分布：大多数 1~4 个分句，少量长评（10 分句以上）；重复率：一部分行是高频短评（"好评" 等）
+# 或按 Zipf 分布重复前面出现过的评论；另有少量空评论
+# 用法：
+#   python review_corpus.py 100000 -o reviews.csv
+#   python review_corpus.py 20000 -o reviews.xlsx
+# ==========================================
+
+DEFAULT_DUPLICATE_RATE = 0.3
+DEFAULT_EMPTY_RATE = 0.01
+LONG_REVIEW_RATE = 0.03
+COMMON_REVIEWS = (
+    '好评', '不错', '五星好评', '默认好评', '很好', '满意', '还行', '挺好的', '质量不错', '物流很快',
+    '一般般', '差评', '不推荐', '好评！', '不错不错', '此用户未填写评价内容'
+)
+OPENERS = ('', '', '', '这次买的', '给家里买的', '第二次回购了，', '总体来说', '用了一周，', '收到了，', '说实话')
+ENDINGS = ('', '', '。', '！', '~', '😊', '👍', '。。。', '！！')
+CONNECTORS = ('，', '，', '。', '；', ' ', '，但是', '，而且')
+SPECS = ('颜色:白色', '颜色:黑色', '规格:大号', '规格:小号', '尺码:M', '尺码:L', '套餐:标准装', '版本:升级款')
+
+def _vocabulary(sentiment_dict):
+    return {
+        'sentiment': [word for words in sentiment_dict['sentiment'].values() for word in words],
+        'dimension': [word for words in sentiment_dict['dimensions'].values() for word in words],
+        'negation': list(sentiment_dict['negations']),
+        'degree': list(sentiment_dict['degrees']),
+        'explicit': list(sentiment_dict['explicit'])
+    }
+
+def _compose_review(rng, vocab):
+    # 一条不重复评论：若干分句，每句 = [维度词] + [否定词] + [程度副词] + 情感词
+    if rng.random() < LONG_REVIEW_RATE:
+        n_clauses = int(rng.integers(10, 30))
+    else:
+        n_clauses = min(int(rng.geometric(0.45)), 8)
+    parts = [OPENERS[rng.integers(len(OPENERS))]]
+    for k in range(n_clauses):
+        clause = ''
+        if rng.random() < 0.7:
+            clause += vocab['dimension'][rng.integers(len(vocab['dimension']))]
+        if rng.random() < 0.2:
+            clause += vocab['negation'][rng.integers(len(vocab['negation']))]
+        if rng.random() < 0.3:
+            clause += vocab['degree'][rng.integers(len(vocab['degree']))]
+        clause += vocab['sentiment'][rng.integers(len(vocab['sentiment']))]
+        if k:
+            parts.append(CONNECTORS[rng.integers(len(CONNECTORS))])
+        parts.append(clause)
+    if rng.random() < 0.05:
+        parts.append('，' + vocab['explicit'][rng.integers(len(vocab['explicit']))])
+    parts.append(ENDINGS[rng.integers(len(ENDINGS))])
+    return ''.join(parts)
+
+def generate_reviews(n, seed=0, duplicate_rate=DEFAULT_DUPLICATE_RATE, empty_rate=DEFAULT_EMPTY_RATE,
+                     sentiment_dict=None):
+    # 返回 n 条评论（列表，空评论为 None）；同样的参数总是得到同样的结果
+    vocab = _vocabulary(sentiment_dict or load_integrated_sentiment_dict())
+    rng = np.random.default_rng(seed)
+    kinds = rng.random(n)
+    reviews = []
+    for i in range(n):
+        if kinds[i] < empty_rate:
+            reviews.append(None)
+        elif kinds[i] < empty_rate + duplicate_rate and reviews:
+            if rng.random() < 0.5:
+                # 高频短评
+                reviews.append(COMMON_REVIEWS[min(int(rng.zipf(1.6)) - 1, len(COMMON_REVIEWS) - 1)])
+            else:
+                # 重复之前出现过的评论：越靠前（越"热门"）的评论越容易被重复
+                reviews.append(reviews[min(int(rng.zipf(1.3)) - 1, len(reviews) - 1)])
+        else:
+            reviews.append(_compose_review(rng, vocab))
+    return reviews
+
+def generate_frame(n, seed=0, duplicate_rate=DEFAULT_DUPLICATE_RATE, empty_rate=DEFAULT_EMPTY_RATE,
+                   start_date='2023-01-01', days=730):
+    # 与店铺导出格式相近的评论表：用户昵称 / 评论内容 / 商品属性（含 "@2023年5月1日" 形式的日期）/ 评分
+    rng = np.random.default_rng(seed + 1)
+    dates = pd.Timestamp(start_date) + pd.to_timedelta(np.sort(rng.integers(0, days, n)), unit='D')
+    specs = np.array(SPECS, dtype=object)[rng.integers(0, len(SPECS), n)]
+    return pd.DataFrame({
+        '用户昵称': [f'用户{i:07d}' for i in rng.permutation(n)],
+        '评论内容': generate_reviews(n, seed, duplicate_rate, empty_rate),
+        '商品属性': [f'{spec}@{date.year}年{date.month}月{date.day}日' for spec, date in zip(specs, dates)],
+        '评分': rng.integers(1, 6, n)
+    })
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="生成合成电商评论语料（CSV / Excel）")
+    parser.add_argument('rows', type=int, help="评论条数")
+    parser.add_argument('-o', '--output', required=True, help="输出文件（.csv 或 .xlsx）")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--duplicate-rate', type=float, default=DEFAULT_DUPLICATE_RATE, help="重复评论占比")
+    parser.add_argument('--empty-rate', type=float, default=DEFAULT_EMPTY_RATE, help="空评论占比")
+    args = parser.parse_args(argv)
+
+    df = generate_frame(args.rows, args.seed, args.duplicate_rate, args.empty_rate)
+    if args.output.endswith('.xlsx'):
+        df.to_excel(args.output, index=False)
+    else:
+        df.to_csv(args.output, index=False, encoding='utf-8-sig')
+    unique = df['评论内容'].nunique()
+    print(f"✅ 已生成 {len(df)} 条评论（不重复 {unique} 条，重复率 {1 - unique / len(df):.1%}）：{args.output}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,217 @@
+import re
+import sys
+
+import numpy as np
+import pandas as pd
+
+from sentiment_engine import SENTIMENT_LABELS
+from analysis_result import DIM_DEFAULT, LABEL_CODES, dimension_column
+from vector_kernel import NON_TEXT_PATTERN
+
+# ==========================================
+# 评论检索索引：分析完成时构建，供「评论检索」页按关键词 / 标签 / 维度 / 得分区间组合筛选并分页浏览
+# 关键词：分词结果的倒排索引（token_store.TokenStore.postings，词 -> 不重复文本）+ 按不重复文本分组的行号表；
+#   关键词先在词表中找出包含它的所有词（如「物流」-> 物流、物流慢），合并这些词的倒排表；
+#   跨越多个词出现的（如分词为「物 / 流贼」），候选文本为含「词尾是关键词开头」的词的文本，再对候选文本做子串确认
+#   （分词结果按精确去重的文本保存，同一不重复文本的各行规范化后相同，取首行确认即可），
+#   结果与对规范化文本逐条做子串查找一致；在词表中找词用 VocabularyIndex，不逐词扫描
+#   含分词时去掉的字符（标点、表情符号等，见 vector_kernel.NON_TEXT_PATTERN）的关键词不会出现在分词结果中，
+#   改为对全部不重复文本逐条做子串查找（如「！！」「😡」「5.0」）
+# 标签 / 维度：每个标签、每个维度（该行涉及此维度）一个按位压缩的行位图（np.packbits）
+# 得分区间：按得分排序的行号表，区间查询为二分查找；维度得分同理（只含涉及该维度的行）
+# 各条件都先转成行位图再做按位与 / 或 / 非，分页时按字节 popcount 前缀和定位，只解包当前页所在的字节
+# ==========================================
+
+POPCOUNT = np.array([bin(b).count('1') for b in range(256)], dtype=np.uint8)
+BIT_VALUES = np.array([0x80 >> b for b in range(8)], dtype=np.float64)
+MAX_CACHED_TERMS = 256
+
+def parse_keywords(expr):
+    # '破损 物流|快递 -退货' -> ([['破损'], ['物流', '快递']], ['退货'])：空格分隔的各组为「且」，组内 | 为「或」，- 前缀为「排除」
+    required, excluded = [], []
+    for group in expr.lower().split():
+        if group.startswith('-'):
+            excluded.extend(term for term in group[1:].split('|') if term)
+        else:
+            terms = [term for term in group.split('|') if term]
+            if terms:
+                required.append(terms)
+    return required, excluded
+
+class VocabularyIndex:
+    # 词表拼成一个长串（每个词后跟一个 \0），在词表中找词交给正则在长串上扫描，不在 Python 中逐词循环：
+    #   包含关键词的词 = 关键词各出现位置所在的词；词尾是关键词前 L 个字的词 = 「前 L 个字 + \0」各出现位置所在的词
+    # 匹配串不含 \0，不会跨越两个词
+    def __init__(self, words):
+        self.joined = ''.join(f'{word}\0' for word in words)
+        self.ends = np.cumsum(np.fromiter((len(word) + 1 for word in words), dtype=np.int64, count=len(words)))
+
+    @property
+    def nbytes(self):
+        return sys.getsizeof(self.joined) + self.ends.nbytes
+
+    def word_ids(self, pattern):
+        # 含 pattern 的词 id（升序）
+        starts = np.fromiter((match.start() for match in re.finditer(re.escape(pattern), self.joined)), dtype=np.int64)
+        return np.unique(np.searchsorted(self.ends, starts, side='right'))
+
+class ReviewIndex:
+    def __init__(self, n_rows, store, texts, text_rows, text_row_starts, columns, term_texts=None, vocabulary=None):
+        self.n_rows = n_rows
+        self.store = store                        # token_store.TokenStore（与分析结果共享，不复制）
+        self.texts = texts                        # 与分析结果逐行对应的原始评论列（子串确认时取回文本）
+        self.text_rows = text_rows                # 按不重复文本分组排列的行号
+        self.text_row_starts = text_row_starts    # 每条不重复文本在 text_rows 中的起始位置
+        self.columns = columns
+        # 关键词 -> 含它的不重复文本；只取决于分词结果和原文，词典修改后仍可沿用
+        self.term_texts = term_texts if term_texts is not None else {}
+        self.vocabulary = vocabulary if vocabulary is not None else VocabularyIndex(store.words)
+        self.all_rows = np.packbits(np.ones(n_rows, dtype=bool))
+        self.label_bitmaps = [np.packbits(columns.label_codes == code) for code in range(len(SENTIMENT_LABELS))]
+        self.dim_bitmaps = [np.packbits(columns.dim_mask[:, j]) for j in range(len(columns.dim_names))]
+        self.score_order = np.argsort(columns.scores, kind='stable').astype(np.int32)
+        self.sorted_scores = columns.scores[self.score_order]
+        # 各维度：涉及该维度的行（升序，与 dim_values 对应）及按维度得分排序后的行
+        self.dim_rows = [np.flatnonzero(columns.dim_mask[:, j]).astype(np.int32) for j in range(len(columns.dim_names))]
+        dim_orders = [np.argsort(values, kind='stable') for values in columns.dim_values]
+        self.dim_sorted_rows = [rows[order] for rows, order in zip(self.dim_rows, dim_orders)]
+        self.dim_sorted_values = [values[order] for values, order in zip(columns.dim_values, dim_orders)]
+
+    @classmethod
+    def build(cls, columns, store, texts):
+        # columns（analysis_result.ColumnarResult）、store、texts 均与分析结果逐行对应
+        text_rows = np.argsort(store.row_index, kind='stable').astype(np.int32)
+        counts = np.bincount(store.row_index, minlength=store.n_unique)
+        text_row_starts = np.concatenate([[0], np.cumsum(counts)])
+        store.postings()
+        return cls(len(columns), store, texts, text_rows, text_row_starts, columns)
+
+    def with_columns(self, columns):
+        # 词典修改后得分变化、分词不变：沿用关键词部分，只重建标签 / 维度 / 得分部分（不修改原对象）
+        return type(self)(self.n_rows, self.store, self.texts, self.text_rows, self.text_row_starts, columns,
+                          self.term_texts, self.vocabulary)
+
+    @property
+    def nbytes(self):
+        arrays = [self.text_rows, self.text_row_starts, self.all_rows, self.score_order, self.sorted_scores,
+                  *self.label_bitmaps, *self.dim_bitmaps, *self.dim_rows, *self.dim_sorted_rows, *self.dim_sorted_values]
+        return (sum(array.nbytes for array in arrays) + sum(array.nbytes for array in self.store.postings())
+                + self.vocabulary.nbytes)
+
+    def rows_bitmap(self, rows):
+        # 行号（互不相同）-> 行位图；同一字节内各位互不重叠，按字节求和即按位或
+        rows = np.asarray(rows, dtype=np.int64)
+        sums = np.bincount(rows >> 3, weights=BIT_VALUES[rows & 7], minlength=len(self.all_rows))
+        return sums.astype(np.uint8)
+
+    def word_postings(self, word_id):
+        starts, postings = self.store.postings()
+        return postings[starts[word_id]:starts[word_id + 1]]
+
+    def texts_matching(self, term):
+        # 含关键词的不重复文本下标（升序）
+        texts = self.term_texts.get(term)
+        if texts is not None:
+            return texts
+        if NON_TEXT_PATTERN.search(term):
+            texts = self.texts_containing(np.arange(self.store.n_unique), term)
+        else:
+            containing, heads = self.match_vocabulary(term)
+            # 各词的倒排表之间有重叠，在不重复文本粒度的掩码上合并
+            hit = np.zeros(self.store.n_unique, dtype=bool)
+            for i in containing:
+                hit[self.word_postings(i)] = True
+            if len(heads):
+                candidates = np.concatenate([self.word_postings(i) for i in heads])
+                candidates = np.unique(candidates[~hit[candidates]])
+                hit[self.texts_containing(candidates, term)] = True
+            texts = np.flatnonzero(hit)
+        if len(self.term_texts) >= MAX_CACHED_TERMS:
+            self.term_texts.pop(next(iter(self.term_texts)))
+        self.term_texts[term] = texts
+        return texts
+
+    def texts_containing(self, candidates, term):
+        # 候选不重复文本（升序）中原文转小写后含关键词的
+        values = np.asarray(self.texts, dtype=object)[self.store.text_first_rows()[candidates]]
+        found = np.array([isinstance(value, str) and term in value.lower() for value in values], dtype=bool)
+        return candidates[found]
+
+    def match_vocabulary(self, term):
+        # 词表中包含关键词的词，以及某个后缀是关键词真前缀的词（跨词出现时的第一个词），后者不含前者
+        containing = self.vocabulary.word_ids(term)
+        heads = [self.vocabulary.word_ids(f'{term[:length]}\0') for length in range(1, len(term))]
+        heads = np.unique(np.concatenate(heads)) if heads else np.zeros(0, dtype=np.int64)
+        return containing, np.setdiff1d(heads, containing, assume_unique=True)
+
+    def keyword_bitmap(self, terms):
+        # 含任一关键词的行
+        if len(terms) == 1:
+            texts = self.texts_matching(terms[0])
+        else:
+            hit = np.zeros(self.store.n_unique, dtype=bool)
+            for term in terms:
+                hit[self.texts_matching(term)] = True
+            texts = np.flatnonzero(hit)
+        lengths = self.text_row_starts[texts + 1] - self.text_row_starts[texts]
+        positions = np.repeat(self.text_row_starts[texts] - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        return self.rows_bitmap(self.text_rows[positions])
+
+    def range_bitmap(self, sorted_values, sorted_rows, low, high):
+        # 区间端点按得分数组的精度（float32）比较，避免 7.28 这样的边界值被排除
+        low, high = np.asarray([low, high], dtype=sorted_values.dtype)
+        start = np.searchsorted(sorted_values, low, side='left')
+        stop = np.searchsorted(sorted_values, high, side='right')
+        return self.rows_bitmap(sorted_rows[start:stop])
+
+    def query(self, keywords='', labels=(), dimensions=(), score_range=None, dimension_range=None):
+        # 返回满足全部条件的行位图：关键词表达式见 parse_keywords；labels 之间为「或」；
+        # dimensions 之间为「且」（行须涉及所选全部维度），dimension_range 对所选每个维度都生效
+        bits = self.all_rows
+        required, excluded = parse_keywords(keywords)
+        for terms in required:
+            bits = bits & self.keyword_bitmap(terms)
+        if excluded:
+            bits = bits & ~self.keyword_bitmap(excluded)
+        if labels:
+            label_bits = np.zeros_like(bits)
+            for label in labels:
+                label_bits |= self.label_bitmaps[LABEL_CODES[label]]
+            bits = bits & label_bits
+        for dim in dimensions:
+            j = self.columns.dim_names.index(dim)
+            if dimension_range is None:
+                bits = bits & self.dim_bitmaps[j]
+            else:
+                bits = bits & self.range_bitmap(self.dim_sorted_values[j], self.dim_sorted_rows[j], *dimension_range)
+        if score_range is not None:
+            bits = bits & self.range_bitmap(self.sorted_scores, self.score_order, *score_range)
+        return bits
+
+    def count(self, bits):
+        return int(POPCOUNT[bits].sum(dtype=np.int64))
+
+    def rows(self, bits, start, stop):
+        # 位图中第 [start, stop) 个命中的行号：前缀和定位所在字节，只解包这一段
+        cumulative = np.cumsum(POPCOUNT[bits], dtype=np.int64)
+        first = int(np.searchsorted(cumulative, start, side='right'))
+        last = min(int(np.searchsorted(cumulative, stop, side='left')) + 1, len(bits))
+        if first >= last:
+            return np.zeros(0, dtype=np.int64)
+        rows = np.flatnonzero(np.unpackbits(bits[first:last])) + first * 8
+        skip = start - (int(cumulative[first - 1]) if first else 0)
+        return rows[skip:skip + stop - start]
+
+    def frame(self, source, rows, content_col):
+        # 给定行的评论内容 + 分析结果列
+        part = pd.DataFrame({'行号': rows, content_col: source[content_col].iloc[rows].to_numpy()})
+        part['情感得分'] = self.columns.scores[rows]
+        part['情感标签'] = [SENTIMENT_LABELS[code] for code in self.columns.label_codes[rows]]
+        for j, dim in enumerate(self.columns.dim_names):
+            hit_rows = self.dim_rows[j]
+            pos = np.minimum(np.searchsorted(hit_rows, rows), max(len(hit_rows) - 1, 0))
+            hit = (hit_rows[pos] == rows) if len(hit_rows) else np.zeros(len(rows), dtype=bool)
+            values = np.full(len(rows), DIM_DEFAULT, dtype=np.float32)
+            values[hit] = self.columns.dim_values[j][pos[hit]]
+            part[dimension_column(dim)] = values
+        return part
@@ -0,0 +1,156 @@
+import json
+import sqlite3
+import time
+import hashlib
+from pathlib import Path
+
+import numpy as np
+
+from sentiment_engine import compile_sentiment_dict, scorer_key
+from perf_metrics import current_recorder
+
+# ==========================================
+# 持久化评分缓存（SQLite）：键 = 规范化文本哈希 + 评分口径（词典指纹 + 分词口径，见 scorer_key）
+# 词典内容、评分算法版本或登记到 jieba 的词条变化后口径随之变化，旧条目不再命中，并最先被 LRU 淘汰
+# ==========================================
+
+DEFAULT_CACHE_PATH = Path.home() / '.cache' / 'sentiment-analysis-app' / 'scores.sqlite3'
+DEFAULT_MAX_ENTRIES = 2_000_000
+SQL_BATCH = 500
+
+def text_hash(key):
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+
+class ScoreCache:
+    def __init__(self, sentiment_dict, path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES):
+        lexicon = compile_sentiment_dict(sentiment_dict)
+        self.fingerprint = scorer_key(lexicon)
+        self.dim_names = lexicon.dimension_names
+        self.max_entries = max_entries
+        self.hits = 0
+        self.lookups = 0
+
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # 多个 Streamlit 会话 / 进程可能同时读写：WAL + 等锁超时
+        self.conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS scores (
+                lexicon TEXT NOT NULL,
+                text_hash BLOB NOT NULL,
+                score REAL NOT NULL,
+                label TEXT NOT NULL,
+                dims TEXT NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (lexicon, text_hash)
+            )
+        ''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_scores_last_used ON scores(last_used)')
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def hit_rate(self):
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    def get_many(self, hashes):
+        # 返回 {哈希: (得分, 标签, 维度字典)}，并刷新命中条目的 last_used
+        found = {}
+        now = time.time()
+        for i in range(0, len(hashes), SQL_BATCH):
+            part = hashes[i:i + SQL_BATCH]
+            marks = ','.join('?' * len(part))
+            rows = self.conn.execute(
+                f'SELECT text_hash, score, label, dims FROM scores WHERE lexicon = ? AND text_hash IN ({marks})',
+                [self.fingerprint, *part]
+            ).fetchall()
+            for h, score, label, dims in rows:
+                found[h] = (score, label, json.loads(dims))
+            if rows:
+                self.conn.execute(
+                    f'UPDATE scores SET last_used = ? WHERE lexicon = ? AND text_hash IN ({",".join("?" * len(rows))})',
+                    [now, self.fingerprint, *[row[0] for row in rows]]
+                )
+        self.conn.commit()
+        return found
+
+    def put_many(self, hashes, unique_result):
+        unique_scores, unique_labels, _, unique_analysis = unique_result
+        now = time.time()
+        self.conn.executemany(
+            'INSERT OR REPLACE INTO scores (lexicon, text_hash, score, label, dims, last_used) VALUES (?, ?, ?, ?, ?, ?)',
+            [
+                (self.fingerprint, h, float(unique_scores[k]), str(unique_labels[k]),
+                 json.dumps(unique_analysis[k], ensure_ascii=False), now)
+                for k, h in enumerate(hashes)
+            ]
+        )
+        self.conn.commit()
+        self.evict()
+
+    def evict(self):
+        # 超出容量时按 last_used 淘汰最久未用的条目，留出 10% 余量避免每次写入都触发
+        count = self.conn.execute('SELECT COUNT(*) FROM scores').fetchone()[0]
+        if count <= self.max_entries:
+            return 0
+        excess = count - int(self.max_entries * 0.9)
+        self.conn.execute(
+            'DELETE FROM scores WHERE rowid IN (SELECT rowid FROM scores ORDER BY last_used LIMIT ?)', (excess,)
+        )
+        self.conn.commit()
+        return excess
+
+    def score_through(self, unique_texts, score_fn):
+        # 先查缓存，只把未命中的文本交给 score_fn，再把新结果写回缓存
+        # 返回与 score_unique_texts 相同结构的 (得分, 标签, 维度矩阵, 维度字典列表)
+        n_unique = len(unique_texts)
+        hashes = [text_hash(key) if key is not None else None for key in unique_texts]
+        cacheable = [h for h in hashes if h is not None]
+        perf = current_recorder()
+        with perf.stage('cache.lookup', texts=len(cacheable)):
+            found = self.get_many(cacheable)
+        self.lookups += len(cacheable)
+        self.hits += len(found)
+        perf.count('cache.score_lookups', len(cacheable))
+        perf.count('cache.score_hits', len(found))
+
+        miss_idx = [k for k, h in enumerate(hashes) if h not in found]
+        miss_result = score_fn([unique_texts[k] for k in miss_idx])
+        stored = [j for j, k in enumerate(miss_idx) if hashes[k] is not None]
+        if stored:
+            self.put_many(
+                [hashes[miss_idx[j]] for j in stored],
+                (miss_result[0][stored], miss_result[1][stored], None, [miss_result[3][j] for j in stored])
+            )
+
+        unique_scores = np.empty(n_unique, dtype=np.float64)
+        unique_labels = np.empty(n_unique, dtype=object)
+        unique_dims = np.full((n_unique, len(self.dim_names)), 5.0)
+        unique_analysis = [None] * n_unique
+
+        unique_scores[miss_idx] = miss_result[0]
+        unique_labels[miss_idx] = miss_result[1]
+        unique_dims[miss_idx] = miss_result[2]
+        for j, k in enumerate(miss_idx):
+            unique_analysis[k] = miss_result[3][j]
+
+        for k, h in enumerate(hashes):
+            if h in found:
+                score, label, dim_analysis = found[h]
+                unique_scores[k] = score
+                unique_labels[k] = label
+                for j, dim in enumerate(self.dim_names):
+                    if dim in dim_analysis:
+                        unique_dims[k, j] = dim_analysis[dim]
+                unique_analysis[k] = dim_analysis
+        return unique_scores, unique_labels, unique_dims, unique_analysis
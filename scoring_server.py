@@ -0,0 +1,350 @@
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from sentiment_engine import (
+    load_integrated_sentiment_dict,
+    compile_sentiment_dict,
+    collapse_texts,
+    score_unique_texts,
+    score_chunk_in_worker,
+    create_scoring_pool,
+    default_worker_count
+)
+
+# ==========================================
+# 本地异步 HTTP 评分服务（仅依赖标准库 asyncio）
+#   POST /score        {"text": "..."}
+#   POST /score/batch  {"texts": ["...", ...]}
+#   GET  /health       服务状态（JSON）
+#   GET  /metrics      Prometheus 文本格式指标
+# 并发请求在 MicroBatcher 中合并成小批次交给 worker 进程池，
+# 合批等待窗口根据 p99 延迟预算和最近的批处理耗时动态收缩
+# 用法：python scoring_server.py --port 8765 --workers 2 --p99-budget-ms 50
+# ==========================================
+
+MAX_BODY_BYTES = 8 * 1024 * 1024
+MAX_TEXTS_PER_REQUEST = 10000
+HTTP_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+class ServiceOverloaded(Exception):
+    pass
+
+class ServiceMetrics:
+    def __init__(self, window=10000):
+        self.started = time.time()
+        self.requests = {}
+        self.latencies = deque(maxlen=window)
+        self.latency_sum = 0.0
+        self.latency_count = 0
+        self.batches = 0
+        self.batched_texts = 0
+        self.batch_seconds = 0.0
+
+    def observe_request(self, endpoint, status, seconds):
+        key = (endpoint, status)
+        self.requests[key] = self.requests.get(key, 0) + 1
+        self.latencies.append(seconds)
+        self.latency_sum += seconds
+        self.latency_count += 1
+
+    def observe_batch(self, size, seconds):
+        self.batches += 1
+        self.batched_texts += size
+        self.batch_seconds += seconds
+
+    def quantile(self, q):
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def to_prometheus(self, batcher):
+        lines = [
+            '# HELP sentiment_requests_total HTTP requests by endpoint and status.',
+            '# TYPE sentiment_requests_total counter'
+        ]
+        for (endpoint, status), count in sorted(self.requests.items()):
+            lines.append(f'sentiment_requests_total{{endpoint="{endpoint}",status="{status}"}} {count}')
+        lines += [
+            '# HELP sentiment_request_latency_seconds Request latency over the recent window.',
+            '# TYPE sentiment_request_latency_seconds summary'
+        ]
+        for q in (0.5, 0.9, 0.99):
+            lines.append(f'sentiment_request_latency_seconds{{quantile="{q}"}} {self.quantile(q):.6f}')
+        lines += [
+            f'sentiment_request_latency_seconds_sum {self.latency_sum:.6f}',
+            f'sentiment_request_latency_seconds_count {self.latency_count}',
+            '# TYPE sentiment_batches_total counter',
+            f'sentiment_batches_total {self.batches}',
+            '# TYPE sentiment_batched_texts_total counter',
+            f'sentiment_batched_texts_total {self.batched_texts}',
+            '# TYPE sentiment_batch_seconds_total counter',
+            f'sentiment_batch_seconds_total {self.batch_seconds:.6f}',
+            '# TYPE sentiment_queue_depth gauge',
+            f'sentiment_queue_depth {batcher.pending_texts}',
+            '# TYPE sentiment_batch_window_seconds gauge',
+            f'sentiment_batch_window_seconds {batcher.current_window():.6f}',
+            '# TYPE sentiment_uptime_seconds gauge',
+            f'sentiment_uptime_seconds {time.time() - self.started:.1f}'
+        ]
+        return '\n'.join(lines) + '\n'
+
+class MicroBatcher:
+    # 把并发请求合并成批次；批次数上限为 worker 数，超过 max_pending 条待评文本时拒绝新请求
+    def __init__(self, executor, score_fn, dim_names, metrics, workers=1,
+                 max_batch=256, p99_budget=0.05, max_pending=20000):
+        self.executor = executor
+        self.score_fn = score_fn
+        self.dim_names = dim_names
+        self.metrics = metrics
+        self.max_batch = max_batch
+        self.p99_budget = p99_budget
+        self.max_pending = max_pending
+        self.pending_texts = 0
+        self.service_ewma = 0.0
+        self.queue = None
+        self.slots = None
+        self.collector = None
+        # 派发中的批次任务：事件循环只弱引用任务，须在此持有，否则可能在运行中被回收（请求永不返回、名额不归还）
+        self.dispatching = set()
+        self.workers = max(1, workers)
+
+    def start(self):
+        self.queue = asyncio.Queue()
+        self.slots = asyncio.Semaphore(self.workers)
+        self.collector = asyncio.create_task(self._collect())
+
+    async def stop(self):
+        if self.collector is not None:
+            self.collector.cancel()
+            try:
+                await self.collector
+            except asyncio.CancelledError:
+                pass
+        # 已派发的批次评完再返回，之后才关闭 worker 进程池
+        if self.dispatching:
+            await asyncio.gather(*self.dispatching, return_exceptions=True)
+
+    def current_window(self):
+        # 预算中扣除预计的批处理耗时，剩余部分的一半用于等待合批；耗时已超预算时立即派发
+        return max(0.0, min(self.p99_budget / 4, (self.p99_budget - self.service_ewma) / 2))
+
+    async def score(self, texts):
+        if self.pending_texts + len(texts) > self.max_pending:
+            raise ServiceOverloaded(f"待评分队列已满（{self.pending_texts} 条）")
+        future = asyncio.get_running_loop().create_future()
+        self.pending_texts += len(texts)
+        await self.queue.put((texts, future))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self.queue.get()]
+            size = len(items[0][0])
+            deadline = loop.time() + self.current_window()
+            while size < self.max_batch:
+                if self.queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self.queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    item = self.queue.get_nowait()
+                items.append(item)
+                size += len(item[0])
+            await self.slots.acquire()
+            task = asyncio.create_task(self._dispatch(items, size))
+            self.dispatching.add(task)
+            task.add_done_callback(self.dispatching.discard)
+
+    async def _dispatch(self, items, size):
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        try:
+            texts = [text for item_texts, _ in items for text in item_texts]
+            unique_texts, inverse = collapse_texts(texts)
+            unique_scores, unique_labels, _, unique_analysis = await loop.run_in_executor(
+                self.executor, self.score_fn, unique_texts
+            )
+            offset = 0
+            for item_texts, future in items:
+                results = []
+                for k in inverse[offset:offset + len(item_texts)]:
+                    results.append({
+                        'score': float(unique_scores[k]),
+                        'label': str(unique_labels[k]),
+                        'dimensions': unique_analysis[k]
+                    })
+                offset += len(item_texts)
+                if not future.done():
+                    future.set_result(results)
+        except Exception as e:
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.service_ewma = elapsed if self.metrics.batches == 0 else 0.8 * self.service_ewma + 0.2 * elapsed
+            self.metrics.observe_batch(size, elapsed)
+            self.pending_texts -= size
+            self.slots.release()
+
+class ScoringService:
+    def __init__(self, batcher, metrics, workers):
+        self.batcher = batcher
+        self.metrics = metrics
+        self.workers = workers
+
+    async def route(self, method, path, body):
+        path = path.split('?', 1)[0]
+        if path == '/health':
+            return 200, {
+                'status': 'ok',
+                'workers': self.workers,
+                'queue_depth': self.batcher.pending_texts,
+                'uptime_seconds': round(time.time() - self.metrics.started, 1)
+            }
+        if path == '/metrics':
+            return 200, self.metrics.to_prometheus(self.batcher)
+        if path not in ('/score', '/score/batch'):
+            return 404, {'error': f'未知路径：{path}'}
+        if method != 'POST':
+            return 405, {'error': '仅支持 POST'}
+
+        try:
+            payload = json.loads(body or b'{}')
+        except json.JSONDecodeError as e:
+            return 400, {'error': f'请求体不是合法 JSON：{e}'}
+        if not isinstance(payload, dict):
+            return 400, {'error': '请求体必须是 JSON 对象'}
+
+        if path == '/score':
+            text = payload.get('text')
+            if not isinstance(text, str):
+                return 400, {'error': '缺少字符串字段 text'}
+            results = await self.batcher.score([text])
+            return 200, results[0]
+
+        texts = payload.get('texts')
+        if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+            return 400, {'error': '缺少字符串数组字段 texts'}
+        if len(texts) > MAX_TEXTS_PER_REQUEST:
+            return 413, {'error': f'单次最多 {MAX_TEXTS_PER_REQUEST} 条'}
+        results = await self.batcher.score(texts) if texts else []
+        return 200, {'results': results}
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                started = time.perf_counter()
+                parts = request_line.decode('latin-1').split()
+                if len(parts) != 3:
+                    break
+                method, path, version = parts
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                length = int(headers.get('content-length') or 0)
+                if length > MAX_BODY_BYTES:
+                    status, payload = 413, {'error': '请求体过大'}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b''
+                    try:
+                        status, payload = await self.route(method, path, body)
+                    except ServiceOverloaded as e:
+                        status, payload = 503, {'error': str(e)}
+                    except Exception as e:
+                        status, payload = 500, {'error': str(e)}
+
+                if isinstance(payload, str):
+                    data = payload.encode('utf-8')
+                    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+                else:
+                    data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                    content_type = 'application/json; charset=utf-8'
+                writer.write(
+                    f'HTTP/1.1 {status} {HTTP_REASONS.get(status, "")}\r\n'
+                    f'Content-Type: {content_type}\r\n'
+                    f'Content-Length: {len(data)}\r\n'
+                    f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n'.encode('latin-1') + data
+                )
+                await writer.drain()
+                self.metrics.observe_request(path.split('?', 1)[0], status, time.perf_counter() - started)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+def create_executor(sentiment_dict, workers):
+    # workers=0 时在本进程的单个线程中评分（调试用），否则使用评分进程池
+    if workers <= 0:
+        lexicon = compile_sentiment_dict(sentiment_dict)
+        return ThreadPoolExecutor(max_workers=1), partial(score_unique_texts, sentiment_dict=lexicon)
+    pool = create_scoring_pool(sentiment_dict, workers)
+    # 预热：让每个 worker 在接收请求前完成 jieba 词典加载
+    for future in [pool.submit(score_chunk_in_worker, ['预热']) for _ in range(workers)]:
+        future.result()
+    return pool, score_chunk_in_worker
+
+async def serve(host='127.0.0.1', port=8765, workers=None, max_batch=256, p99_budget_ms=50.0, ready=None):
+    workers = default_worker_count() if workers is None else workers
+    sentiment_dict = load_integrated_sentiment_dict()
+    executor, score_fn = create_executor(sentiment_dict, workers)
+    metrics = ServiceMetrics()
+    batcher = MicroBatcher(
+        executor, score_fn, tuple(sentiment_dict['dimensions']), metrics,
+        workers=workers, max_batch=max_batch, p99_budget=p99_budget_ms / 1000.0
+    )
+    service = ScoringService(batcher, metrics, workers)
+    batcher.start()
+    server = await asyncio.start_server(service.handle_connection, host, port)
+    print(f"✅ 评分服务已启动：http://{host}:{port}（workers={workers}, p99 预算 {p99_budget_ms:.0f}ms）", file=sys.stderr)
+    if ready is not None:
+        ready.set()
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await batcher.stop()
+        executor.shutdown(cancel_futures=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="电商评论情感分析 - 本地 HTTP 评分服务")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=None, help="评分进程数（0 表示在服务进程内评分）")
+    parser.add_argument('--max-batch', type=int, default=256, help="单个微批次最多合并的文本数")
+    parser.add_argument('--p99-budget-ms', type=float, default=50.0, help="p99 延迟预算（毫秒），决定合批等待窗口")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.max_batch, args.p99_budget_ms))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,194 @@
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from sentiment_engine import (
+    load_integrated_sentiment_dict,
+    score_batch_parallel,
+    SCORING_KERNELS,
+    DEFAULT_KERNEL
+)
+from score_cache import ScoreCache
+from near_duplicates import NearDuplicateClusters, DEFAULT_THRESHOLD
+
+# ==========================================
+# 命令行批量评分：流式读取 CSV / JSONL（文件或 stdin），流式写出评分结果
+# 用法示例：
+#   python sentiment_cli.py reviews.csv -o scored.jsonl
+#   cat reviews.jsonl | python sentiment_cli.py -c content --output-format csv > scored.csv
+# ==========================================
+
+CONTENT_FIELD_CANDIDATES = ['评论内容', '评价内容', '评论文本', '评价文本', 'content', 'text', '评论', '评价']
+
+def detect_format(path, explicit):
+    if explicit:
+        return explicit
+    if path and path != '-' and path.lower().endswith('.csv'):
+        return 'csv'
+    return 'jsonl'
+
+@contextmanager
+def _std_stream(buffer, **kwargs):
+    # 包装 stdin/stdout 的二进制缓冲区；结束时 detach 而不是关闭底层流
+    f = io.TextIOWrapper(buffer, **kwargs)
+    try:
+        yield f
+    finally:
+        f.flush()
+        f.detach()
+
+def open_text_input(path):
+    if path == '-':
+        return _std_stream(sys.stdin.buffer, encoding='utf-8-sig', newline='')
+    return open(path, encoding='utf-8-sig', newline='')
+
+def open_text_output(path):
+    if path in (None, '-'):
+        return _std_stream(sys.stdout.buffer, encoding='utf-8', newline='')
+    return open(path, 'w', encoding='utf-8-sig' if path.lower().endswith('.csv') else 'utf-8', newline='')
+
+def iter_records(paths, input_format):
+    # 逐条产出 dict 记录，不把整个文件读入内存
+    for path in paths:
+        fmt = detect_format(path, input_format)
+        with open_text_input(path) as f:
+            if fmt == 'csv':
+                reader = csv.reader(f)
+                header = next(reader, None)
+                if header is None:
+                    continue
+                header = [col.strip().replace('\u200b', '') for col in header]
+                for row in reader:
+                    yield dict(zip(header, row))
+            else:
+                for line_no, line in enumerate(f, start=1):
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError as e:
+                        raise ValueError(f"{path} 第 {line_no} 行不是合法 JSON：{e}")
+                    if not isinstance(record, dict):
+                        raise ValueError(f"{path} 第 {line_no} 行不是 JSON 对象")
+                    yield record
+
+def iter_batches(records, batch_size):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def resolve_content_field(record, column):
+    if column:
+        if column not in record:
+            raise ValueError(f"输入中没有评论内容列：{column}")
+        return column
+    for candidate in CONTENT_FIELD_CANDIDATES:
+        if candidate in record:
+            return candidate
+    raise ValueError(f"无法自动识别评论内容列，请用 --column 指定（现有列：{', '.join(record)}）")
+
+class RecordWriter:
+    def __init__(self, f, output_format):
+        self.f = f
+        self.output_format = output_format
+        self.csv_writer = None
+
+    def write(self, record):
+        if self.output_format == 'jsonl':
+            self.f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            return
+        if self.csv_writer is None:
+            self.csv_writer = csv.DictWriter(self.f, fieldnames=list(record), extrasaction='ignore')
+            self.csv_writer.writeheader()
+        self.csv_writer.writerow(record)
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="电商评论情感分析 - 命令行批量评分")
+    parser.add_argument('inputs', nargs='*', default=['-'], help="输入文件（CSV/JSONL），省略或 '-' 表示 stdin")
+    parser.add_argument('-o', '--output', default='-', help="输出文件，省略或 '-' 表示 stdout")
+    parser.add_argument('-c', '--column', help="评论内容列名（默认自动识别）")
+    parser.add_argument('--input-format', choices=['csv', 'jsonl'], help="输入格式（默认按扩展名，stdin 为 jsonl）")
+    parser.add_argument('--output-format', choices=['csv', 'jsonl'], help="输出格式（默认按扩展名，stdout 为 jsonl）")
+    parser.add_argument('--batch-size', type=int, default=5000, help="每批评分的行数（批内相同文本只评一次）")
+    parser.add_argument('--workers', type=int, default=1, help="并行评分进程数")
+    parser.add_argument('--kernel', choices=SCORING_KERNELS, default=DEFAULT_KERNEL,
+                        help="评分内核：vector 为向量化批量内核，python 为逐条参考实现（结果一致）")
+    parser.add_argument('--cache', metavar='PATH', help="持久化评分缓存（SQLite）路径，重复文本跨运行复用")
+    parser.add_argument('--near-duplicates', metavar='THRESHOLD', type=float, nargs='?', const=DEFAULT_THRESHOLD,
+                        help=f"批内归并近似重复评论（MinHash/LSH，默认阈值 {DEFAULT_THRESHOLD}），"
+                             "词典命中与代表评论相同的沿用其得分，并输出「近似重复行数」字段")
+    parser.add_argument('-q', '--quiet', action='store_true', help="不在 stderr 输出统计信息")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    output_format = detect_format(args.output, args.output_format)
+    sentiment_dict = load_integrated_sentiment_dict()
+    dim_columns = [f'{dim}维度得分' for dim in sentiment_dict['dimensions']]
+
+    started = time.perf_counter()
+    total = 0
+    content_field = None
+    cache = ScoreCache(sentiment_dict, args.cache) if args.cache else None
+    near_dup_stats = Counter()
+    try:
+        with open_text_output(args.output) as out:
+            writer = RecordWriter(out, output_format)
+            for batch in iter_batches(iter_records(args.inputs, args.input_format), args.batch_size):
+                if content_field is None:
+                    content_field = resolve_content_field(batch[0], args.column)
+                near_duplicates = NearDuplicateClusters(args.near_duplicates) if args.near_duplicates is not None else None
+                columns, _ = score_batch_parallel(
+                    [record.get(content_field) for record in batch], sentiment_dict, workers=args.workers, cache=cache,
+                    kernel=args.kernel, near_duplicates=near_duplicates
+                )
+                scores = columns['情感得分']
+                labels = columns['情感标签']
+                dims = [columns[col] for col in dim_columns]
+                if near_duplicates is not None:
+                    near_dup_stats.update(near_duplicates.stats)
+                    group_rows = near_duplicates.cluster_sizes()[near_duplicates.row_clusters]
+                for i, record in enumerate(batch):
+                    record['情感得分'] = float(scores[i])
+                    record['情感标签'] = labels[i]
+                    for col, values in zip(dim_columns, dims):
+                        record[col] = float(values[i])
+                    if near_duplicates is not None:
+                        record['近似重复行数'] = int(group_rows[i])
+                    writer.write(record)
+                total += len(batch)
+    except BrokenPipeError:
+        # 下游（如 head）提前关闭管道：静默退出，避免解释器退出时再次刷新 stdout 报错
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    except (ValueError, OSError) as e:
+        print(f"❌ 处理失败：{e}", file=sys.stderr)
+        return 1
+    finally:
+        if cache is not None:
+            cache.close()
+
+    if not args.quiet:
+        elapsed = time.perf_counter() - started
+        print(f"✅ 已评分 {total} 条，用时 {elapsed:.1f}s（{total / max(elapsed, 1e-9):.0f} 条/秒）", file=sys.stderr)
+        if cache is not None:
+            print(f"⚡ 缓存命中率 {cache.hit_rate*100:.1f}%（{cache.hits}/{cache.lookups}）", file=sys.stderr)
+        if args.near_duplicates is not None:
+            print(f"🧬 近似重复簇 {near_dup_stats['clusters']} 个，沿用代表评论得分 {near_dup_stats['reused_texts']} 条，"
+                  f"单独评分 {near_dup_stats['rescored_texts']} 条", file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,633 @@
+import re
+import os
+import sys
+import json
+import hashlib
+import threading
+from collections import deque
+from functools import partial
+from types import MappingProxyType
+
+import numpy as np
+
+from perf_metrics import PerfRecorder, current_recorder, activate, deactivate
+
+# ==========================================
+# 情感评分引擎（不依赖 Streamlit / pandas，可被进程池 worker、命令行、批处理任务直接导入）
+# jieba 在第一次分词时才导入，仅查词典或取标签时不承担其导入开销
+# ==========================================
+
+# 评分算法版本：修改 calculate_sentiment_score 的计算口径（含分词口径）时递增，使持久化缓存自动失效
+# 2：词典中的多字词条登记到 jieba 整体切分
+SCORER_VERSION = 2
+
+_jieba = None
+_jieba_lock = threading.Lock()
+_jieba_pending = []       # 等待登记到 jieba 的 (词, 词频)
+_jieba_registered = {}    # 已登记的词条集合键 -> 来源（词典编译产物路径），按登记顺序
+
+def load_jieba():
+    global _jieba
+    if _jieba is None:
+        import jieba
+        _jieba = jieba
+    if _jieba_pending:
+        _flush_jieba_words()
+    return _jieba
+
+def _flush_jieba_words():
+    # 在锁内逐个登记并在全部登记完后才清空，其他线程看到待登记列表非空时会等待，不会用半登记的词表分词
+    with _jieba_lock:
+        for word, freq in _jieba_pending:
+            _jieba.add_word(word, freq)
+        _jieba_pending.clear()
+
+def register_jieba_words(key, entries, source=None):
+    # 登记一组 (词, 词频)，使这些词整体切分；同一个 key 只登记一次（重复登记会改变 jieba 的总词频）
+    # 实际加入推迟到下一次 load_jieba()，不为此提前导入 jieba
+    with _jieba_lock:
+        if key in _jieba_registered:
+            return False
+        _jieba_registered[key] = source
+        _jieba_pending.extend(entries)
+    return True
+
+def registered_lexicon_sources():
+    # 已登记到 jieba 的词典编译产物路径（spawn 启动的 worker 据此重新登记相同的词条）
+    return [source for source in _jieba_registered.values() if source is not None]
+
+def tokenizer_key():
+    # 当前分词口径：已登记到 jieba 的词条集合（按登记顺序）的摘要
+    # jieba 登记是进程全局的，同一进程加载过其他词典源后，所有词典（含内置词典）的分词结果都会随之变化
+    with _jieba_lock:
+        keys = '\0'.join(_jieba_registered)
+    return hashlib.blake2b(keys.encode('utf-8'), digest_size=8).hexdigest()
+
+def scorer_key(sentiment_dict):
+    # 评分结果的完整口径 = 词典指纹 + 分词口径；持久化缓存、任务检查点、分析结果都按它区分，
+    # 不同分词口径下算出的结果不会互相命中
+    return f'{compile_sentiment_dict(sentiment_dict).fingerprint}.{tokenizer_key()}'
+
+def is_missing(value):
+    # 标量版 pd.isna：None / NaN / pd.NA / NaT 视为缺失，但不为此导入 pandas
+    if value is None:
+        return True
+    if isinstance(value, str):
+        return False
+    pd = sys.modules.get('pandas')
+    if pd is not None:
+        return bool(pd.isna(value))
+    return value != value
+
+def load_integrated_sentiment_dict(sources=None):
+    # 内置词典 + 外部词典源，经 lexicon_artifact 编译产物（按来源内容缓存）加载，并登记多字词条到 jieba
+    from lexicon_artifact import load_lexicon
+    return load_lexicon(sources)
+
+def builtin_lexicon_source():
+    # 内置词典的原始分层结构
+    sentiment_words = {
+        'strong_positive': {
+            '完美': 9.5, '极品': 9.8, '顶级': 9.7, '一流': 9.6, '惊艳': 9.4, '震撼': 9.5,
+            '超出预期': 9.3, '物超所值': 9.2, '性价比极高': 9.4, '五星好评': 9.5, '满分': 10.0,
+            '强烈推荐': 9.3, '极力推荐': 9.4, '无限回购': 9.2, '闭眼入': 9.1, '相见恨晚': 9.0,
+            '爱不释手': 9.1, '赞不绝口': 9.0, '质量超好': 9.4, '品质极佳': 9.5, '正品': 9.0,
+            '真材实料': 9.2, '货真价实': 9.1, '次日达': 9.3, '当日达': 9.2, '神速': 9.0,
+            '客服专业': 9.0, '售后无忧': 9.1, '效果惊艳': 9.4, '立竿见影': 9.2,
+            'YYDS': 9.8, '绝绝子': 9.5, '封神': 9.6, '天花板': 9.7
+        },
+        'medium_positive': {
+            '很好': 8.5, '满意': 8.0, '喜欢': 8.2, '好用': 8.3, '实用': 8.0, '耐用': 8.1,
+            '质量不错': 8.2, '与描述一致': 8.0, '符合预期': 7.8, '运行流畅': 8.3, '速度快': 8.1,
+            '版型好': 8.2, '显瘦': 8.1, '好吃': 8.3, '美味': 8.4, '好吸收': 8.2, '保湿好': 8.1,
+            '收纳方便': 8.0, '快递快': 8.2, '发货快': 8.1, '包装好': 8.0, '划算': 8.2,
+            '实惠': 8.1, '便宜': 7.9, '性价比高': 8.3, '物有所值': 8.0,
+            '种草': 8.5, '安利': 8.3, '真香': 8.4
+        },
+        'weak_positive': {
+            '可以': 6.5, '还行': 6.3, '还好': 6.4, '不错': 6.6, '挺好的': 6.7, '蛮好': 6.5,
+            '一般般': 6.0, '无功无过': 6.2, '基本满意': 6.8, '符合价位': 6.7
+        },
+        'neutral': {
+            '收到': 5.0, '已签收': 5.0, '已收货': 5.0, '确认收货': 5.0, '还没用': 5.2,
+            '待使用': 5.1, '未拆封': 5.0, '备用中': 5.0, '囤货': 5.1, '看着还行': 5.5
+        },
+        'weak_negative': {
+            '一般': 4.0, '普通': 3.8, '有点失望': 3.5, '不够理想': 3.6, '有点小': 3.8,
+            '有点薄': 3.7, '色差': 3.5, '轻微瑕疵': 3.4, '味道一般': 3.6, '口感一般': 3.5,
+            '偏贵': 3.2, '有点小贵': 3.3, '效果一般': 3.4
+        },
+        'medium_negative': {
+            '质量差': 2.0, '劣质': 1.5, '次品': 1.2, '瑕疵': 2.5, '破损': 1.8, '断裂': 1.0,
+            '异味': 2.0, '刺鼻': 1.5, '与描述不符': 2.2, '色差大': 2.0, '尺码不准': 2.1,
+            '快递慢': 2.5, '物流慢': 2.4, '包装破损': 2.0, '客服态度差': 1.8, '回复慢': 2.2,
+            '难用': 2.0, '不好用': 1.9, '不舒服': 2.1, '过敏': 1.0, '刺激': 1.2,
+            '踩雷': 2.0, '拔草': 2.2, '翻车': 1.8,
+            '不好': 2.0, '差': 1.5, '版型不好': 2.2, '材质差': 1.8
+        },
+        'strong_negative': {
+            '假货': 0.0, '山寨': 0.1, '盗版': 0.0, '垃圾': 0.0, '废物': 0.1, '破烂': 0.2,
+            '工业垃圾': 0.0, '完全不能用': 0.1, '残次品': 0.2, '三无产品': 0.0, '有毒': 0.0,
+            '骗子': 0.0, '欺骗': 0.1, '欺诈': 0.0, '黑心商家': 0.0, '无良商家': 0.0,
+            '智商税': 0.2, '割韭菜': 0.1, '态度恶劣': 0.1, '威胁': 0.0, '投诉': 0.3,
+            '大冤种': 0.2, '血亏': 0.1, '避雷': 0.3
+        }
+    }
+    
+    dimension_words = {
+        '质量': ['质量', '品质', '做工', '材质', '面料', '用料', '工艺', '细节'],
+        '物流': ['快递', '物流', '发货', '配送', '顺丰', '京东快递', '圆通', '中通'],
+        '包装': ['包装', '盒子', '袋子', '纸箱', '打包', '封装', '包裹'],
+        '价格': ['价格', '贵', '便宜', '性价比', '实惠', '划算', '优惠', '薅羊毛'],
+        '服务': ['客服', '售后', '态度', '回复', '处理', '退换', '保修'],
+        '体验': ['效果', '体验', '感觉', '用着', '穿着', '吃着', '使用'],
+        '外观': ['外观', '颜值', '设计', '款式', '版型', '颜色', '尺寸']
+    }
+    
+    negative_words = {
+        '不': -1.0, '没': -1.0, '无': -1.0, '非': -1.0, '未': -1.0, '否': -1.0,
+        '从未': -1.2, '毫不': -1.3, '压根不': -1.4, '绝不': -1.2, '并非': -1.1
+    }
+    
+    degree_adverbs = {
+        '极其': 1.8, '非常': 1.7, '特别': 1.6, '十分': 1.5, '很': 1.4,
+        '较': 1.2, '稍微': 0.8, '略微': 0.7, '稍欠': 0.6, '有点': 0.9,
+        '超': 1.7, '巨': 1.8, '贼': 1.6, '超赞': 1.7, '贼好用': 1.6
+    }
+    
+    explicit_patterns = {
+        '五星好评': 9.5, '五颗星': 9.3, '全五星': 9.4, '满分': 10.0,
+        '强烈推荐': 9.2, '闭眼买': 9.1, '绝不会回购': 1.0, '再也不买': 1.5,
+        '永远拉黑': 0.5, '避雷': 2.0, '翻车': 1.8, '踩雷': 2.0,
+        '智商税': 1.5, '上当受骗': 1.0, '强烈投诉': 0.5
+    }
+    
+    return {
+        'sentiment': sentiment_words,
+        'dimensions': dimension_words,
+        'negations': negative_words,
+        'degrees': degree_adverbs,
+        'explicit': explicit_patterns
+    }
+
+class PatternAutomaton:
+    # Aho-Corasick 多模式匹配：一次扫描文本即可找出全部词典命中位置
+    def __init__(self, entries):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        
+        for pattern, payload in entries:
+            if not pattern:
+                continue
+            node = 0
+            for ch in pattern:
+                nxt = self.goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[node][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                node = nxt
+            self.output[node].append((len(pattern), payload))
+        
+        # 按层次（BFS）构建失配指针，并把后缀状态的输出合并进来
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self.goto[node].items():
+                queue.append(nxt)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0) if node else 0
+                self.output[nxt] = self.output[nxt] + self.output[self.fail[nxt]]
+    
+    def findall(self, text):
+        goto, fail, output = self.goto, self.fail, self.output
+        hits = []
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for length, payload in output[node]:
+                hits.append((i - length + 1, i + 1) + payload)
+        return hits
+
+STOP_WORDS = frozenset({'的', '了', '在', '是', '我', '有', '和', '就', '不', '人', '都'})
+
+class CompiledLexicon(dict):
+    # 编译后的词典：dict 部分保持原始分层结构（页面展示 / JSON 导出），
+    # 属性部分是打平后的只读哈希表，评分时每个词只需一次 O(1) 查表
+    # fingerprint 已知（如来自词典编译产物）时可直接传入，省去对整个词典求哈希
+    def __init__(self, raw, fingerprint=None):
+        super().__init__(raw)
+        self.dimension_names = tuple(raw['dimensions'].keys())
+        self.origin = None        # 从编译产物加载时为其元信息（路径、来源文件、词条数）
+        
+        # 词典内容指纹：内容或评分算法版本变化时改变，用作缓存键的一部分
+        if fingerprint is None:
+            canonical = json.dumps(raw, ensure_ascii=False, sort_keys=True)
+            fingerprint = hashlib.blake2b(
+                f'{SCORER_VERSION}:{canonical}'.encode('utf-8'), digest_size=16
+            ).hexdigest()
+        self.fingerprint = fingerprint
+        
+        # 词 -> 得分：按强度分层顺序合并，与逐层查找时"先命中者优先"一致
+        word_scores = {}
+        for word_dict in raw['sentiment'].values():
+            for word, score in word_dict.items():
+                word_scores.setdefault(word, score)
+        
+        # 词 -> 所属维度（按维度顺序，第一个即窗口归属维度）
+        word_dimensions = {}
+        for dim, dim_words in raw['dimensions'].items():
+            for word in dim_words:
+                dims = word_dimensions.setdefault(word, [])
+                if dim not in dims:
+                    dims.append(dim)
+        
+        self.word_scores = MappingProxyType(word_scores)
+        self.word_dimensions = MappingProxyType({w: tuple(d) for w, d in word_dimensions.items()})
+        self.negations = MappingProxyType(dict(raw['negations']))
+        self.degrees = MappingProxyType(dict(raw['degrees']))
+        
+        # 明确模式按字典顺序优先（与逐个 `in` 判断时先命中者优先一致）
+        self.explicit_rank = MappingProxyType({p: i for i, p in enumerate(raw['explicit'])})
+        self._automaton = None
+    
+    @property
+    def automaton(self):
+        # 全部词条构建一个自动机（只有逐条评分 / 命中轨迹需要，首次使用时才构建）；评分文本已转小写，因此模式也统一小写
+        if self._automaton is None:
+            entries = [(p.lower(), ('explicit', p, s)) for p, s in self['explicit'].items()]
+            entries += [(w.lower(), ('sentiment', w, s)) for w, s in self.word_scores.items()]
+            entries += [(w.lower(), ('negation', w, s)) for w, s in self['negations'].items()]
+            entries += [(w.lower(), ('degree', w, s)) for w, s in self['degrees'].items()]
+            entries += [(w.lower(), ('dimension', w, d[0])) for w, d in self.word_dimensions.items()]
+            self._automaton = PatternAutomaton(entries)
+        return self._automaton
+
+def compile_sentiment_dict(sentiment_dict):
+    if isinstance(sentiment_dict, CompiledLexicon):
+        return sentiment_dict
+    return CompiledLexicon(sentiment_dict)
+
+def normalize_review_text(text):
+    # 去重 / 抖动共用的规范化键：空值返回 None，其余去首尾空白并转小写
+    if is_missing(text):
+        return None
+    key = str(text).strip().lower()
+    return key or None
+
+def stable_jitter(key, spread=0.15):
+    # 由文本哈希得到的确定性抖动，同一文本无论评分多少次结果都相同
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest()
+    return (int.from_bytes(digest, 'big') / 2**64 * 2 - 1) * spread
+
+def calculate_sentiment_score(text, sentiment_dict, return_trace=False):
+    # return_trace=True 时额外返回词典命中轨迹 [(起, 止, 类型, 词条, 取值), ...]
+    lexicon = compile_sentiment_dict(sentiment_dict)
+    
+    if is_missing(text) or len(str(text).strip()) == 0:
+        return (5.0, {}, []) if return_trace else (5.0, {})
+    
+    text = str(text).lower()
+    original_text = text
+    text = re.sub(r'[^\u4e00-\u9fa5a-zA-Z0-9]', ' ', text)
+    
+    trace = lexicon.automaton.findall(original_text)
+    explicit_hits = [hit[3] for hit in trace if hit[2] == 'explicit']
+    if explicit_hits:
+        pattern = min(explicit_hits, key=lexicon.explicit_rank.__getitem__)
+        score = lexicon['explicit'][pattern]
+        return (score, {}, trace) if return_trace else (score, {})
+    
+    words = list(load_jieba().lcut(text))
+    if not words:
+        return (5.0, {}, trace) if return_trace else (5.0, {})
+    
+    word_scores = lexicon.word_scores
+    word_dimensions = lexicon.word_dimensions
+    degrees = lexicon.degrees
+    negations = lexicon.negations
+    
+    total_score = 0.0
+    word_count = 0
+    dimension_scores = {dim: 0.0 for dim in lexicon.dimension_names}
+    dimension_word_count = {dim: 0 for dim in lexicon.dimension_names}
+    
+    for i, word in enumerate(words):
+        if word in STOP_WORDS or len(word) < 2:
+            continue
+        
+        current_score = word_scores.get(word, 0.0)
+        
+        if current_score == 0.0:
+            for dim in word_dimensions.get(word, ()):
+                dimension_word_count[dim] += 1
+            continue
+        
+        if i > 0 and words[i-1] in degrees:
+            current_score *= degrees[words[i-1]]
+        
+        negation_weight = 1.0
+        for j in range(max(0, i-2), i):
+            if words[j] in negations:
+                negation_weight *= negations[words[j]]
+        current_score *= negation_weight
+        
+        related_dim = None
+        for j in range(max(0, i-1), min(len(words), i+2)):
+            dims = word_dimensions.get(words[j])
+            if dims:
+                related_dim = dims[0]
+                break
+        
+        if related_dim:
+            dimension_scores[related_dim] += current_score
+            dimension_word_count[related_dim] += 1
+        
+        total_score += current_score
+        word_count += 1
+    
+    if word_count == 0:
+        final_score = 5.0
+    else:
+        final_score = total_score / word_count
+    
+    final_score = max(1.0, min(10.0, final_score))
+    
+    dim_analysis = {}
+    for dim in dimension_scores.keys():
+        if dimension_word_count[dim] > 0:
+            dim_score = dimension_scores[dim] / dimension_word_count[dim]
+            dim_score = max(1.0, min(10.0, dim_score))
+            dim_analysis[dim] = round(dim_score, 2)
+    
+    if 4.5 <= final_score <= 5.5:
+        final_score += stable_jitter(original_text.strip())
+    
+    if return_trace:
+        return round(final_score, 2), dim_analysis, trace
+    return round(final_score, 2), dim_analysis
+
+SCORING_KERNELS = ('vector', 'python')
+DEFAULT_KERNEL = 'vector'
+
+def collapse_texts(texts):
+    # 规范化后去重：返回 (不重复文本键列表, 每行对应的键下标)
+    index_of = {}
+    unique_texts = []
+    inverse = np.empty(len(texts), dtype=np.int64)
+    for i, text in enumerate(texts):
+        key = normalize_review_text(text)
+        idx = index_of.get(key)
+        if idx is None:
+            idx = index_of[key] = len(unique_texts)
+            unique_texts.append(key)
+        inverse[i] = idx
+    return unique_texts, inverse
+
+def score_unique_texts(unique_texts, sentiment_dict, progress=None, kernel=DEFAULT_KERNEL, token_sink=None):
+    # 评分不重复文本，返回 (得分数组, 标签数组, 维度得分矩阵, 维度字典列表)
+    # kernel='vector' 走 vector_kernel 的向量化内核，'python' 逐条调用 calculate_sentiment_score，两者结果逐位一致
+    # token_sink 只对向量化内核有效：收集评分时的分词结果（见 token_store.TokenStore）
+    if kernel == 'vector':
+        from vector_kernel import score_unique_vectorized
+        return score_unique_vectorized(unique_texts, sentiment_dict, progress=progress, token_sink=token_sink)
+    
+    lexicon = compile_sentiment_dict(sentiment_dict)
+    n_unique = len(unique_texts)
+    dim_names = lexicon.dimension_names
+    perf_stage = current_recorder().stage('score.python', texts=n_unique)
+    unique_scores = np.empty(n_unique, dtype=np.float64)
+    unique_labels = np.empty(n_unique, dtype=object)
+    unique_dims = np.full((n_unique, len(dim_names)), 5.0)
+    unique_analysis = []
+    step = max(1, n_unique // 100)
+    
+    with perf_stage:
+        for k, key in enumerate(unique_texts):
+            score, dim_analysis = calculate_sentiment_score(key, lexicon)
+            unique_scores[k] = score
+            unique_labels[k] = get_sentiment_label(score)
+            for j, dim in enumerate(dim_names):
+                if dim in dim_analysis:
+                    unique_dims[k, j] = dim_analysis[dim]
+            unique_analysis.append(dim_analysis)
+            if progress is not None and (k + 1) % step == 0:
+                progress((k + 1) / n_unique)
+    
+    return unique_scores, unique_labels, unique_dims, unique_analysis
+
+def broadcast_scores(unique_result, inverse, dim_names):
+    # 把不重复文本的结果按行展开成可直接写入 DataFrame 的列
+    unique_scores, unique_labels, unique_dims, unique_analysis = unique_result
+    columns = {
+        '情感得分': unique_scores[inverse],
+        '情感标签': unique_labels[inverse]
+    }
+    for j, dim in enumerate(dim_names):
+        columns[f'{dim}维度得分'] = unique_dims[inverse, j]
+    dim_analysis_list = [unique_analysis[k] for k in inverse]
+    return columns, dim_analysis_list
+
+def score_batch(texts, sentiment_dict, progress=None, cache=None, kernel=DEFAULT_KERNEL):
+    # 批量评分：相同文本（规范化后）只评一次，再按行广播回去
+    # 返回 ({列名: 数组}, 逐行维度字典列表)，列可直接写入 DataFrame
+    # cache（如 score_cache.ScoreCache）存在时，只对缓存未命中的文本评分
+    lexicon = compile_sentiment_dict(sentiment_dict)
+    unique_texts, inverse = collapse_texts(texts)
+    score_fn = partial(score_unique_texts, sentiment_dict=lexicon, progress=progress, kernel=kernel)
+    unique_result = cache.score_through(unique_texts, score_fn) if cache is not None else score_fn(unique_texts)
+    return broadcast_scores(unique_result, inverse, lexicon.dimension_names)
+
+# ==========================================
+# 多进程评分：每个 worker 只加载一次 jieba 词典和编译词典
+# ==========================================
+
+_WORKER_LEXICON = None
+
+def _init_scoring_worker(raw_dict, fingerprint=None, lexicon_sources=(), artifact=None):
+    global _WORKER_LEXICON
+    # spawn 启动的 worker 不继承主进程状态：重新映射主进程已加载的词典编译产物，登记相同的 jieba 词条
+    # （fork 启动时已继承，这里不会重复登记）
+    if lexicon_sources or artifact is not None:
+        from lexicon_artifact import activate_artifact
+        for path in lexicon_sources:
+            activate_artifact(path)
+    load_jieba().initialize()
+    if artifact is not None:
+        # 词典来自编译产物：只收到产物路径，评分词典由映射的查表数组还原
+        _WORKER_LEXICON = activate_artifact(artifact).scoring_lexicon()
+    else:
+        _WORKER_LEXICON = CompiledLexicon(raw_dict, fingerprint)
+
+def score_chunk_in_worker(unique_texts, kernel=DEFAULT_KERNEL):
+    # 在进程池 worker 中调用：使用 worker 初始化时编译好的词典
+    return score_unique_texts(unique_texts, _WORKER_LEXICON, kernel=kernel)
+
+def score_chunk_with_tokens(unique_texts, kernel=DEFAULT_KERNEL, keep_tokens=False, instrument=False):
+    # 同上，另外返回评分时的分词分块和 worker 内的性能埋点：(评分结果, 分词分块或 None, 埋点快照或 None)
+    token_sink = [] if keep_tokens else None
+    if not instrument:
+        return score_unique_texts(unique_texts, _WORKER_LEXICON, kernel=kernel, token_sink=token_sink), token_sink, None
+    
+    recorder = PerfRecorder()
+    token = activate(recorder)
+    try:
+        result = score_unique_texts(unique_texts, _WORKER_LEXICON, kernel=kernel, token_sink=token_sink)
+    finally:
+        deactivate(token)
+    return result, token_sink, recorder.snapshot()
+
+def default_worker_count():
+    return max(1, (os.cpu_count() or 1) - 1)
+
+def create_scoring_pool(sentiment_dict, workers):
+    # 进程池的每个 worker 启动时加载一次 jieba 词典并编译词典
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    
+    # Streamlit 会把 app.py 注册为 __main__，spawn 启动的 worker 会重新执行整个页面脚本；
+    # 支持 fork 的平台直接 fork（继承已加载的模块），否则退回 spawn
+    start_method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+    lexicon = compile_sentiment_dict(sentiment_dict)
+    sources = registered_lexicon_sources()
+    # 来自已登记编译产物的词典只传产物路径（worker 映射同一个文件）；其他词典（如页面上修改过的）才传原始结构
+    artifact = lexicon.origin['path'] if lexicon.origin is not None and lexicon.origin['path'] in sources else None
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context(start_method),
+        initializer=_init_scoring_worker,
+        initargs=(None if artifact else dict(lexicon), lexicon.fingerprint, sources, artifact)
+    )
+
+class ScoringPool:
+    # 跨多次评分调用共用的进程池（流式分析的各批、后台任务的各块）：第一次真正需要并行评分时才创建，
+    # 退出 with 块（完成、暂停或出错）时关闭，worker 不必每批重新启动、重新加载 jieba 词典和编译词典
+    def __init__(self, sentiment_dict, workers=None):
+        self.lexicon = compile_sentiment_dict(sentiment_dict)
+        self.workers = workers or default_worker_count()
+        self.executor = None
+    
+    def get(self):
+        if self.executor is None:
+            self.executor = create_scoring_pool(self.lexicon, self.workers)
+        return self.executor
+    
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+def score_unique_parallel(unique_texts, sentiment_dict, workers=None, chunk_size=None, progress=None,
+                          kernel=DEFAULT_KERNEL, token_sink=None, pool=None):
+    # 不重复文本分块交给进程池，按顺序拼回；数据量小或单进程时直接串行
+    # pool（ScoringPool）给出时用它的进程池和进程数，用完不关闭
+    lexicon = compile_sentiment_dict(sentiment_dict)
+    if pool is not None:
+        if pool.lexicon.fingerprint != lexicon.fingerprint:
+            raise ValueError("进程池的词典与评分词典不一致")
+        workers = pool.workers
+    workers = workers or default_worker_count()
+    n_unique = len(unique_texts)
+    
+    if chunk_size is None:
+        chunk_size = max(2000, -(-n_unique // (workers * 4)))
+    if workers <= 1 or n_unique <= chunk_size:
+        return score_unique_texts(unique_texts, lexicon, progress=progress, kernel=kernel, token_sink=token_sink)
+    
+    chunks = [unique_texts[i:i + chunk_size] for i in range(0, n_unique, chunk_size)]
+    parts = []
+    perf = current_recorder()
+    run_chunk = partial(score_chunk_with_tokens, kernel=kernel, keep_tokens=token_sink is not None,
+                        instrument=perf.enabled)
+    executor = pool.get() if pool is not None else create_scoring_pool(lexicon, min(workers, len(chunks)))
+    try:
+        for done, (part, chunk_tokens, chunk_perf) in enumerate(executor.map(run_chunk, chunks), start=1):
+            parts.append(part)
+            if chunk_perf is not None:
+                # worker 内各阶段为各进程累计耗时（并行时总和会超过墙钟时间）
+                perf.merge(chunk_perf)
+            if token_sink is not None:
+                # worker 内的下标相对于本块，换算回 unique_texts 中的下标
+                chunk_start = (done - 1) * chunk_size
+                token_sink.extend((positions + chunk_start, *rest) for positions, *rest in chunk_tokens)
+            if progress is not None:
+                progress(done / len(chunks))
+    finally:
+        if pool is None:
+            executor.shutdown()
+    
+    return (
+        np.concatenate([part[0] for part in parts]),
+        np.concatenate([part[1] for part in parts]),
+        np.concatenate([part[2] for part in parts]),
+        [analysis for part in parts for analysis in part[3]]
+    )
+
+def score_collapsed_parallel(texts, sentiment_dict, workers=None, chunk_size=None, progress=None, cache=None,
+                             kernel=DEFAULT_KERNEL, token_store=None, near_duplicates=None, pool=None):
+    # 先在主进程去重（并查缓存），再把待评文本交给进程池
+    # 返回 (不重复文本的结果, inverse)，调用方自行决定按行展开的方式
+    # token_store（token_store.TokenStore）存在时顺带保留评分时的分词结果，缓存命中的文本由它补分词
+    # near_duplicates（near_duplicates.NearDuplicateClusters）存在时再按近似重复归并，返回的是评分单元的结果；
+    # 归并只影响评分，token_store 仍按精确去重的文本保存各自的分词结果（沿用得分的文本在 finalize 时补分词）
+    lexicon = compile_sentiment_dict(sentiment_dict)
+    perf = current_recorder()
+    with perf.stage('score.collapse', rows=len(texts)):
+        exact_texts, exact_inverse = collapse_texts(texts)
+    perf.count('score.unique_texts', len(exact_texts))
+    unique_texts, inverse = exact_texts, exact_inverse
+    if near_duplicates is not None:
+        with perf.stage('score.near_duplicates', texts=len(exact_texts)):
+            unique_texts, inverse = near_duplicates.collapse(exact_texts, exact_inverse, lexicon)
+        perf.count('score.near_duplicate_reused', near_duplicates.stats['reused_texts'])
+    
+    def score_fn(pending_texts):
+        perf.count('score.scored_texts', len(pending_texts))
+        token_sink = [] if token_store is not None else None
+        result = score_unique_parallel(pending_texts, lexicon, workers=workers, chunk_size=chunk_size,
+                                       progress=progress, kernel=kernel, token_sink=token_sink, pool=pool)
+        if token_sink:
+            token_store.collect(pending_texts, token_sink)
+        return result
+    
+    unique_result = cache.score_through(unique_texts, score_fn) if cache is not None else score_fn(unique_texts)
+    if token_store is not None:
+        with perf.stage('score.token_store', texts=len(exact_texts)):
+            token_store.finalize(exact_texts, exact_inverse)
+    return unique_result, inverse
+
+def score_batch_parallel(texts, sentiment_dict, workers=None, chunk_size=None, progress=None, cache=None,
+                         kernel=DEFAULT_KERNEL, near_duplicates=None, pool=None):
+    # 与 score_batch 输出完全一致（near_duplicates 归并时为近似结果）
+    lexicon = compile_sentiment_dict(sentiment_dict)
+    unique_result, inverse = score_collapsed_parallel(texts, lexicon, workers=workers, chunk_size=chunk_size,
+                                                      progress=progress, cache=cache, kernel=kernel,
+                                                      near_duplicates=near_duplicates, pool=pool)
+    return broadcast_scores(unique_result, inverse, lexicon.dimension_names)
+
+SENTIMENT_LABELS = ("非常积极", "积极", "略微积极", "中性", "消极")
+
+def get_sentiment_label(score):
+    if score >= 9.0:
+        return "非常积极"
+    elif score >= 7.5:
+        return "积极"
+    elif score >= 6.0:
+        return "略微积极"
+    elif score >= 4.5:
+        return "中性"
+    else:
+        return "消极"
@@ -0,0 +1,199 @@
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+from sentiment_engine import (
+    compile_sentiment_dict,
+    score_batch_parallel,
+    ScoringPool,
+    SENTIMENT_LABELS
+)
+
+# ==========================================
+# 流式分析：分块读取 CSV，结果落盘，内存中只保留汇总量
+# 分块按 CSV 记录切分原始字节（引号内的换行不算记录边界），每块末尾的字节偏移写入检查点，续跑时直接定位，不重新读已完成的块
+# ==========================================
+
+STREAM_CHUNK_ROWS = 50000
+SCORE_HIST_EDGES = np.linspace(0.0, 10.0, 41)
+
+def clean_columns(df):
+    # 清理列名中的零宽字符 / 不换行空格 / 空格，并丢弃空列名
+    df.columns = [
+        str(col).strip()
+           .replace('\u200b', '')
+           .replace('\xa0', ' ')
+           .replace(' ', '')
+        for col in df.columns
+    ]
+    return df[[col for col in df.columns if col.strip() != '']]
+
+def _open_source(source):
+    # source 可以是本地路径，也可以是 Streamlit 的 UploadedFile 等二进制文件对象
+    if isinstance(source, (str, os.PathLike)):
+        return open(source, 'rb'), True
+    source.seek(0)
+    return source, False
+
+def _read_record(handle):
+    # 读一条完整的 CSV 记录（可能跨多行），文件结束时返回 b''
+    # 引号数为奇数说明还在引号字段内，记录延续到下一行（转义的 "" 成对出现，不影响奇偶）
+    line = handle.readline()
+    record, quotes = line, line.count(b'"')
+    while line and quotes % 2:
+        line = handle.readline()
+        record += line
+        quotes += line.count(b'"')
+    return record
+
+def iter_csv_chunks(handle, chunksize=STREAM_CHUNK_ROWS, offset=None):
+    # 逐块产出 (DataFrame, 该块末尾在文件中的字节偏移)；offset 为此前某块末尾的偏移时从该处继续（表头仍取自文件开头）
+    handle.seek(0)
+    header = _read_record(handle)
+    if offset is not None:
+        handle.seek(offset)
+    while True:
+        records = []
+        while len(records) < chunksize:
+            record = _read_record(handle)
+            if not record:
+                break
+            records.append(record)
+        if not records:
+            return
+        yield pd.read_csv(io.BytesIO(header + b''.join(records)), encoding='utf-8-sig'), handle.tell()
+
+def read_csv_sample(source, nrows=1000):
+    # 只读取前 nrows 行，用于列识别和预览
+    handle, owned = _open_source(source)
+    try:
+        return clean_columns(pd.read_csv(handle, encoding='utf-8-sig', nrows=nrows))
+    finally:
+        if owned:
+            handle.close()
+        else:
+            handle.seek(0)
+
+class StreamingAggregates:
+    # 流式汇总：标签计数、得分直方图、各维度得分和 / 计数
+    def __init__(self, dim_names):
+        self.dim_names = tuple(dim_names)
+        self.rows = 0
+        self.score_sum = 0.0
+        self.label_counts = dict.fromkeys(SENTIMENT_LABELS, 0)
+        self.hist_counts = np.zeros(len(SCORE_HIST_EDGES) - 1, dtype=np.int64)
+        self.dim_sums = dict.fromkeys(self.dim_names, 0.0)
+        self.dim_counts = dict.fromkeys(self.dim_names, 0)
+    
+    def update(self, columns, dim_analysis_list):
+        scores = columns['情感得分']
+        self.rows += len(scores)
+        self.score_sum += float(scores.sum())
+        
+        labels, counts = np.unique(columns['情感标签'].astype(str), return_counts=True)
+        for label, count in zip(labels, counts):
+            self.label_counts[label] = self.label_counts.get(label, 0) + int(count)
+        
+        self.hist_counts += np.histogram(scores, bins=SCORE_HIST_EDGES)[0]
+        
+        for dim_analysis in dim_analysis_list:
+            for dim, dim_score in dim_analysis.items():
+                self.dim_sums[dim] += dim_score
+                self.dim_counts[dim] += 1
+    
+    def mean_score(self):
+        return self.score_sum / self.rows if self.rows else 5.0
+    
+    def label_ratio(self, label):
+        return self.label_counts.get(label, 0) / self.rows if self.rows else 0.0
+    
+    def dimension_mean(self, dim):
+        # 与全量模式的 "{维度}维度得分" 列均值口径一致：未涉及该维度的评论按 5.0 计
+        if not self.rows:
+            return 5.0
+        return (self.dim_sums[dim] + 5.0 * (self.rows - self.dim_counts[dim])) / self.rows
+    
+    def to_dict(self):
+        return {
+            'rows': self.rows,
+            'score_sum': self.score_sum,
+            'mean_score': self.mean_score(),
+            'label_counts': dict(self.label_counts),
+            'score_hist_edges': SCORE_HIST_EDGES.tolist(),
+            'score_hist_counts': self.hist_counts.tolist(),
+            'dim_sums': dict(self.dim_sums),
+            'dim_counts': dict(self.dim_counts)
+        }
+    
+    @classmethod
+    def from_dict(cls, data):
+        # 由 to_dict() 的结果恢复（断点续跑时接着累加）
+        aggregates = cls(data['dim_sums'].keys())
+        aggregates.rows = data['rows']
+        aggregates.score_sum = data['score_sum']
+        aggregates.label_counts.update(data['label_counts'])
+        aggregates.hist_counts = np.array(data['score_hist_counts'], dtype=np.int64)
+        aggregates.dim_sums.update(data['dim_sums'])
+        aggregates.dim_counts.update(data['dim_counts'])
+        return aggregates
+
+def read_spill_preview(spill_path, nrows=20):
+    # 从已写出的逐行结果文件读回前 nrows 行
+    return pd.read_csv(spill_path, encoding='utf-8-sig', nrows=nrows)
+
+def analyze_csv_stream(source, content_col, sentiment_dict, spill_path,
+                       chunksize=STREAM_CHUNK_ROWS, workers=1, progress=None, preview_rows=20, cache=None,
+                       resume=None, checkpoint=None):
+    # 逐块：读取 -> 评分 -> 更新汇总 -> 追加写入 spill_path
+    # 返回 (StreamingAggregates, 前 preview_rows 行结果)
+    # checkpoint(state) 在每块结果写入磁盘后调用，state 可 JSON 序列化；
+    # 把某次收到的 state 作为 resume 传入即从下一块继续：结果文件截断到该块写完时的大小，源文件从该块末尾的偏移接着读
+    # workers > 1 时各块共用一个进程池
+    lexicon = compile_sentiment_dict(sentiment_dict)
+    aggregates = StreamingAggregates(lexicon.dimension_names)
+    preview = None
+    done_chunks = 0
+    source_offset = None
+    if resume is not None:
+        aggregates = StreamingAggregates.from_dict(resume['aggregates'])
+        done_chunks = resume['chunks']
+        source_offset = resume['source_bytes']
+        with open(spill_path, 'r+b') as f:
+            f.truncate(resume['spill_bytes'])
+        preview = read_spill_preview(spill_path, preview_rows) if done_chunks else None
+    
+    handle, owned = _open_source(source)
+    try:
+        handle.seek(0, os.SEEK_END)
+        total_bytes = handle.tell() or 1
+        
+        chunks = iter_csv_chunks(handle, chunksize, source_offset)
+        with ScoringPool(lexicon, workers) as pool:
+            for i, (chunk, chunk_end) in enumerate(chunks, start=done_chunks):
+                chunk = clean_columns(chunk)
+                columns, dim_analysis_list = score_batch_parallel(
+                    chunk[content_col].tolist(), lexicon, workers=workers, cache=cache, pool=pool
+                )
+                for col, values in columns.items():
+                    chunk[col] = values
+                aggregates.update(columns, dim_analysis_list)
+                
+                # 首块写表头和 BOM（Excel 友好），其余块直接追加
+                chunk.to_csv(
+                    spill_path, mode='w' if i == 0 else 'a', header=(i == 0), index=False,
+                    encoding='utf-8-sig' if i == 0 else 'utf-8'
+                )
+                if preview is None:
+                    preview = chunk.head(preview_rows)
+                if checkpoint is not None:
+                    checkpoint({'chunks': i + 1, 'source_bytes': chunk_end, 'spill_bytes': os.path.getsize(spill_path),
+                                'aggregates': aggregates.to_dict()})
+                if progress is not None:
+                    progress(min(1.0, chunk_end / total_bytes))
+    finally:
+        if owned:
+            handle.close()
+    
+    return aggregates, preview
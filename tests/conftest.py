@@ -0,0 +1,49 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sentiment_engine import load_integrated_sentiment_dict, score_collapsed_parallel
+from review_corpus import generate_frame
+from analysis_result import ColumnarResult
+from token_store import TokenStore
+
+# ==========================================
+# 测试共用的词典和合成语料（review_corpus，确定性生成）；词典为内置词典 + 默认外部词典源
+# ==========================================
+
+CORPUS_ROWS = 6000
+
+@pytest.fixture(scope='session')
+def lexicon():
+    return load_integrated_sentiment_dict()
+
+@pytest.fixture(scope='session')
+def corpus(lexicon):
+    return generate_frame(CORPUS_ROWS, seed=7)
+
+@pytest.fixture(scope='session')
+def texts(corpus):
+    return corpus['评论内容'].tolist()
+
+def full_analysis(texts, lexicon, near_duplicates=None):
+    # 一次性评分的参考结果：(列式结果, 分词结果)
+    store = TokenStore()
+    unique_result, inverse = score_collapsed_parallel(texts, lexicon, workers=1, token_store=store,
+                                                      near_duplicates=near_duplicates)
+    return ColumnarResult.from_unique(unique_result, inverse, lexicon.dimension_names), store
+
+def assert_same_columns(actual, expected):
+    np.testing.assert_array_equal(actual.scores, expected.scores)
+    np.testing.assert_array_equal(actual.label_codes, expected.label_codes)
+    np.testing.assert_array_equal(actual.dim_mask, expected.dim_mask)
+    for a, b in zip(actual.dim_values, expected.dim_values):
+        np.testing.assert_array_equal(a, b)
+
+def assert_same_tokens(actual, expected):
+    np.testing.assert_array_equal(actual.row_index, expected.row_index)
+    np.testing.assert_array_equal(actual.offsets, expected.offsets)
+    assert [actual.words[i] for i in actual.ids] == [expected.words[i] for i in expected.ids]
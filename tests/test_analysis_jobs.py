@@ -0,0 +1,93 @@
+import io
+
+import pytest
+
+from analysis_jobs import AnalysisJob, JobStopped, read_manifest, score_with_checkpoints
+from analysis_result import ColumnarResult
+from lexicon_edit import edit_lexicon
+from near_duplicates import NearDuplicateClusters
+from stream_analysis import analyze_csv_stream
+from token_store import TokenStore
+from conftest import assert_same_columns, assert_same_tokens, full_analysis
+
+# ==========================================
+# 后台任务的检查点：中途暂停后从检查点继续，结果与一次性评分逐位一致
+# ==========================================
+
+CHUNK_TEXTS = 1000
+
+def stop_after(job, chunks):
+    # 完成 chunks 块后请求暂停（下一块开始前生效）
+    report = job.report
+
+    def wrapped(done_chunks, total_chunks=None, fraction=0.0):
+        report(done_chunks, total_chunks, fraction)
+        if done_chunks >= chunks and fraction == 0.0:
+            job.stop()
+    job.report = wrapped
+    return job
+
+def run_job(path, texts, lexicon, near_duplicates=None, stop_chunks=None):
+    job = AnalysisJob(('dataset', 'content', 'test'), path)
+    if stop_chunks is not None:
+        stop_after(job, stop_chunks)
+    store = TokenStore()
+    unique_result, inverse = score_with_checkpoints(
+        job, texts, lexicon, workers=1, token_store=store, chunk_texts=CHUNK_TEXTS,
+        near_duplicates=NearDuplicateClusters(near_duplicates) if near_duplicates is not None else None
+    )
+    return job, ColumnarResult.from_unique(unique_result, inverse, lexicon.dimension_names), store
+
+@pytest.mark.parametrize('near_duplicates', [None, 0.8])
+def test_resume_matches_full_analysis(tmp_path, lexicon, texts, near_duplicates):
+    expected, expected_store = full_analysis(
+        texts, lexicon, NearDuplicateClusters(near_duplicates) if near_duplicates is not None else None
+    )
+    with pytest.raises(JobStopped):
+        run_job(tmp_path, texts, lexicon, near_duplicates, stop_chunks=2)
+    assert not read_manifest(tmp_path).get('finished')
+
+    job, columns, store = run_job(tmp_path, texts, lexicon, near_duplicates)
+    assert job.resumed_chunks == 2
+    assert job.done_chunks == job.total_chunks > 2
+    assert read_manifest(tmp_path)['finished']
+    assert_same_columns(columns, expected)
+    assert_same_tokens(store, expected_store)
+
+    # 已完成的任务全部从检查点读回
+    job, columns, store = run_job(tmp_path, texts, lexicon, near_duplicates)
+    assert job.resumed_chunks == job.total_chunks
+    assert_same_columns(columns, expected)
+    assert_same_tokens(store, expected_store)
+
+def test_changed_lexicon_discards_checkpoints(tmp_path, lexicon, texts):
+    with pytest.raises(JobStopped):
+        run_job(tmp_path, texts, lexicon, stop_chunks=2)
+    edited = edit_lexicon(lexicon, 'sentiment', '不错', 3.3, 'weak_positive')
+    job, columns, _ = run_job(tmp_path, texts, edited)
+    assert job.resumed_chunks == 0
+    assert_same_columns(columns, full_analysis(texts, edited)[0])
+
+class StreamStopped(Exception):
+    pass
+
+def test_stream_resume_matches_uninterrupted(tmp_path, lexicon, corpus):
+    data = corpus.to_csv(index=False).encode('utf-8-sig')
+    expected_aggregates, _ = analyze_csv_stream(io.BytesIO(data), '评论内容', lexicon, tmp_path / 'expected.csv',
+                                                chunksize=1000)
+
+    states = []
+
+    def checkpoint(state):
+        states.append(state)
+        if len(states) == 3:
+            raise StreamStopped()
+
+    spill_path = tmp_path / 'resumed.csv'
+    with pytest.raises(StreamStopped):
+        analyze_csv_stream(io.BytesIO(data), '评论内容', lexicon, spill_path, chunksize=1000, checkpoint=checkpoint)
+    aggregates, _ = analyze_csv_stream(io.BytesIO(data), '评论内容', lexicon, spill_path, chunksize=1000,
+                                       resume=states[-1])
+
+    assert aggregates.to_dict() == expected_aggregates.to_dict()
+    assert spill_path.read_bytes() == (tmp_path / 'expected.csv').read_bytes()
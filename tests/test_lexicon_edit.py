@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from lexicon_edit import apply_lexicon_change, edit_lexicon
+from time_index import TimeIndex, extract_review_dates
+from conftest import assert_same_columns, full_analysis
+
+# ==========================================
+# 词典修改后的增量重评分：只重评受影响的文本，结果与用新词典重新完整分析逐位一致
+# ==========================================
+
+EDITS = [
+    ('sentiment', '不错', 3.3, 'weak_positive'),      # 改分
+    ('sentiment', '质量', 8.0, 'medium_positive'),    # 维度词同时成为情感词
+    ('sentiment', '差', None, 'medium_negative'),     # 删除
+    ('sentiment', '绝绝子新词', 9.0, 'strong_positive'),  # 分词结果中没有的新词
+    ('negations', '没', -0.5, None),
+    ('degrees', '很', None, None),
+    ('degrees', '有点', 1.3, None),
+    ('dimensions', '做工', None, '质量'),
+    ('dimensions', '好用', True, '体验'),
+    ('explicit', '好评', 9.0, None),
+    ('explicit', '避雷', None, None),
+]
+
+@pytest.fixture(scope='module')
+def analyzed(lexicon, corpus):
+    columns, store = full_analysis(corpus['评论内容'].tolist(), lexicon)
+    dates = extract_review_dates(corpus['商品属性'])
+    return columns, store, dates
+
+def test_sequential_edits_match_full_analysis(lexicon, corpus, analyzed):
+    columns, store, dates = analyzed
+    texts = corpus['评论内容']
+    time_index = TimeIndex.build(dates, columns)
+    current = lexicon
+    for section, word, value, group in EDITS:
+        edited = edit_lexicon(current, section, word, value, group)
+        columns, time_index, stats = apply_lexicon_change(columns, store, texts, current, edited, time_index)
+        expected, _ = full_analysis(texts.tolist(), edited)
+        assert_same_columns(columns, expected)
+        expected_index = TimeIndex.build(dates, expected)
+        np.testing.assert_array_equal(time_index.label_counts, expected_index.label_counts)
+        np.testing.assert_allclose(time_index.score_sums, expected_index.score_sums)
+        np.testing.assert_array_equal(time_index.dim_counts, expected_index.dim_counts)
+        np.testing.assert_allclose(time_index.dim_sums, expected_index.dim_sums)
+        current = edited
+
+def test_only_affected_rows_change(lexicon, corpus, analyzed):
+    columns, store, _ = analyzed
+    edited = edit_lexicon(lexicon, 'sentiment', '不错', 3.3, 'weak_positive')
+    new_columns, _, stats = apply_lexicon_change(columns, store, corpus['评论内容'], lexicon, edited)
+    assert stats['words'] == ['不错'] and stats['texts'] > 0
+    affected = store.rows_containing('不错')
+    assert stats['rows'] == int(affected.sum())
+    np.testing.assert_array_equal(new_columns.scores[~affected], columns.scores[~affected])
+    # 原结果不做原地修改
+    assert_same_columns(columns, full_analysis(corpus['评论内容'].tolist(), lexicon)[0])
+
+def test_unseen_word_leaves_result_unchanged(lexicon, corpus, analyzed):
+    columns, store, _ = analyzed
+    edited = edit_lexicon(lexicon, 'sentiment', '绝绝子新词', 9.0, 'strong_positive')
+    new_columns, _, stats = apply_lexicon_change(columns, store, corpus['评论内容'], lexicon, edited)
+    assert stats['unseen'] == ['绝绝子新词'] and stats['rows'] == 0
+    assert new_columns is columns
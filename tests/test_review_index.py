@@ -0,0 +1,93 @@
+import re
+import random
+
+import numpy as np
+import pytest
+
+from sentiment_engine import normalize_review_text
+from analysis_result import LABEL_CODES
+from near_duplicates import NearDuplicateClusters
+from review_index import ReviewIndex
+from conftest import full_analysis
+
+# ==========================================
+# 评论检索索引：各种查询与对规范化文本逐条做子串查找 / 逐行筛选的结果一致
+# ==========================================
+
+# 关键词表达式中的一个词：不含空白和 |，不以 - 开头
+TERM = re.compile(r'[^\s|-][^\s|]*')
+FIXED_TERMS = ['物流', '好', '质量很', '不错的', '性价比', '差评', '不存在的关键词', '！！', '。', '~', '😊', '好评！', '5.0']
+
+def sample_terms(keys, n=80, seed=3):
+    # 从评论中随机截取的子串（含标点 / 表情符号的走逐条子串查找）
+    rng = random.Random(seed)
+    keys = [key for key in keys if key]
+    terms = list(FIXED_TERMS)
+    while len(terms) < n:
+        key = rng.choice(keys)
+        start = rng.randrange(len(key))
+        term = key[start:start + rng.randint(1, 5)]
+        if TERM.fullmatch(term):
+            terms.append(term)
+    return terms
+
+@pytest.fixture(scope='module', params=[None, 0.8], ids=['exact', 'near_duplicates'])
+def search(request, lexicon, corpus):
+    texts = corpus['评论内容']
+    near_duplicates = NearDuplicateClusters(request.param) if request.param is not None else None
+    columns, store = full_analysis(texts.tolist(), lexicon, near_duplicates)
+    keys = np.array([normalize_review_text(text) or '' for text in texts], dtype=object)
+    return ReviewIndex.build(columns, store, texts), keys
+
+def substring_rows(keys, terms):
+    return np.array([any(term in key for term in terms) for key in keys], dtype=bool)
+
+def bitmap_rows(index, bits):
+    return np.unpackbits(bits)[:index.n_rows].astype(bool)
+
+def test_keywords_match_substring_search(search):
+    index, keys = search
+    for term in sample_terms(keys):
+        np.testing.assert_array_equal(bitmap_rows(index, index.query(term)), substring_rows(keys, [term]), err_msg=term)
+
+def test_keyword_expression(search):
+    index, keys = search
+    bits = index.query('物流|快递 好 -差')
+    expected = substring_rows(keys, ['物流', '快递']) & substring_rows(keys, ['好']) & ~substring_rows(keys, ['差'])
+    np.testing.assert_array_equal(bitmap_rows(index, bits), expected)
+
+def test_filters_match_row_scan(search):
+    index, keys = search
+    columns = index.columns
+    j = 3
+    bits = index.query('好', labels=('积极', '非常积极', '略微积极'), dimensions=(columns.dim_names[j],),
+                       score_range=(6.0, 9.5), dimension_range=(1.0, 6.0))
+    dim_scores = np.full(len(columns), np.nan, dtype=np.float32)
+    dim_scores[np.flatnonzero(columns.dim_mask[:, j])] = columns.dim_values[j]
+    score_range = np.asarray([6.0, 9.5], dtype=columns.scores.dtype)
+    dimension_range = np.asarray([1.0, 6.0], dtype=np.float32)
+    expected = (substring_rows(keys, ['好'])
+                & np.isin(columns.label_codes, [LABEL_CODES[label] for label in ('积极', '非常积极', '略微积极')])
+                & columns.dim_mask[:, j]
+                & (dim_scores >= dimension_range[0]) & (dim_scores <= dimension_range[1])
+                & (columns.scores >= score_range[0]) & (columns.scores <= score_range[1]))
+    assert expected.any()
+    np.testing.assert_array_equal(bitmap_rows(index, bits), expected)
+
+def test_pages_cover_all_hits(search):
+    index, _ = search
+    bits = index.query('好')
+    hits = np.flatnonzero(bitmap_rows(index, bits))
+    assert index.count(bits) == len(hits)
+    pages = [index.rows(bits, start, start + 50) for start in range(0, len(hits), 50)]
+    np.testing.assert_array_equal(np.concatenate(pages), hits)
+
+def test_vocabulary_index_matches_scan(search):
+    index, keys = search
+    words = index.store.words
+    for term in sample_terms(keys, n=40, seed=5):
+        containing = [i for i, word in enumerate(words) if term in word]
+        heads = [i for i, word in enumerate(words) if term not in word
+                 and any(term.startswith(word[k:]) for k in range(max(0, len(word) - len(term) + 1), len(word)))]
+        actual = index.match_vocabulary(term)
+        assert actual[0].tolist() == containing and actual[1].tolist() == heads, term
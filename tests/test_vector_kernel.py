@@ -0,0 +1,26 @@
+import numpy as np
+
+from sentiment_engine import collapse_texts, score_unique_texts
+from vector_kernel import check_conformance
+from loadgen import sample_reviews
+
+# ==========================================
+# 向量化内核与逐条参考实现逐位一致
+# ==========================================
+
+def test_conformance_on_synthetic_corpus(lexicon, texts):
+    unique_texts, _ = collapse_texts(texts)
+    assert check_conformance(unique_texts, lexicon) == []
+
+def test_conformance_on_lexicon_sentences(lexicon):
+    # 由词典拼出的句子：覆盖否定词 / 程度副词 / 维度词的各种组合
+    assert check_conformance(sample_reviews(3000, seed=11), lexicon) == []
+
+def test_python_and_vector_kernels_agree(lexicon, texts):
+    unique_texts, _ = collapse_texts(texts)
+    python = score_unique_texts(unique_texts, lexicon, kernel='python')
+    vector = score_unique_texts(unique_texts, lexicon, kernel='vector')
+    np.testing.assert_array_equal(python[0], vector[0])
+    assert list(python[1]) == list(vector[1])
+    np.testing.assert_array_equal(python[2], vector[2])
+    assert python[3] == vector[3]
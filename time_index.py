@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+
+from sentiment_engine import SENTIMENT_LABELS
+
+# ==========================================
+# 按天预聚合的时间索引：分析时一次性（向量化）提取评论日期，按天保存得分和 / 评论数 / 各标签数 / 各维度得分和与命中数
+# 日 / 周 / 月走势和各维度走势都由这些加和量汇总得到，不再逐行扫描原始数据
+# ==========================================
+
+DATE_PATTERN = r'@(\d{4}年\d{1,2}月\d{1,2}日)'
+TREND_FREQS = {'日': 'D', '周': 'W', '月': 'M'}
+DIM_DEFAULT = 5.0
+
+def extract_review_dates(values):
+    # 从 "商品属性" 列提取 "@2023年5月1日" 形式的日期；无日期或日期非法时为 NaT
+    matched = pd.Series(values).astype('string').str.extract(DATE_PATTERN, expand=False)
+    return pd.to_datetime(matched, format='%Y年%m月%d日', errors='coerce')
+
+class TimeIndex:
+    def __init__(self, days, counts, score_sums, label_counts, dim_names, dim_sums, dim_counts, rows, row_day=None):
+        self.days = days                  # 有评论的日期（datetime64[D]，升序）
+        self.counts = counts
+        self.score_sums = score_sums
+        self.label_counts = label_counts  # (天数, 标签数)
+        self.dim_names = tuple(dim_names)
+        self.dim_sums = dim_sums          # (天数, 维度数)：只含涉及该维度的评论
+        self.dim_counts = dim_counts
+        self.rows = rows                  # 全部评论数（含无日期的）
+        self.row_day = row_day            # 每行所在的天在 days 中的下标（无日期为 -1），用于部分行重评后修补
+
+    @property
+    def dated_rows(self):
+        return int(self.counts.sum())
+
+    @classmethod
+    def build(cls, dates, columns):
+        # dates 与 columns（analysis_result.ColumnarResult）逐行对应
+        day_values = pd.DatetimeIndex(dates).values.astype('datetime64[D]')
+        dated = ~np.isnat(day_values)
+        days, day_codes = np.unique(day_values[dated], return_inverse=True)
+        n_days = len(days)
+        # 每行所在的天（无日期为 -1），用于把稀疏维度值归到对应的天
+        row_day = np.full(len(columns), -1, dtype=np.int32)
+        row_day[dated] = day_codes
+
+        counts = np.bincount(day_codes, minlength=n_days)
+        score_sums = np.bincount(day_codes, weights=columns.scores[dated].astype(np.float64), minlength=n_days)
+        label_counts = np.bincount(
+            day_codes * len(SENTIMENT_LABELS) + columns.label_codes[dated], minlength=n_days * len(SENTIMENT_LABELS)
+        ).reshape(n_days, len(SENTIMENT_LABELS))
+
+        dim_sums = np.zeros((n_days, len(columns.dim_names)))
+        dim_counts = np.zeros((n_days, len(columns.dim_names)), dtype=np.int64)
+        for j in range(len(columns.dim_names)):
+            value_days = row_day[columns.dim_mask[:, j]]
+            keep = value_days >= 0
+            dim_sums[:, j] = np.bincount(value_days[keep], weights=columns.dim_values[j][keep].astype(np.float64),
+                                         minlength=n_days)
+            dim_counts[:, j] = np.bincount(value_days[keep], minlength=n_days)
+        return cls(days, counts, score_sums, label_counts, columns.dim_names, dim_sums, dim_counts, len(columns),
+                   row_day)
+
+    def patched(self, rows, old_columns, new_columns):
+        # rows 行的结果由 old_columns 变为 new_columns 后的时间索引：只对这些行按天减旧加新，返回新对象
+        day = self.row_day[rows]
+        dated = day >= 0
+        rows, day = np.asarray(rows)[dated], day[dated].astype(np.int64)
+        n_days = len(self.days)
+        n_labels = len(SENTIMENT_LABELS)
+
+        score_sums = self.score_sums + np.bincount(
+            day, weights=new_columns.scores[rows].astype(np.float64) - old_columns.scores[rows], minlength=n_days
+        )
+        label_counts = self.label_counts + (
+            np.bincount(day * n_labels + new_columns.label_codes[rows], minlength=n_days * n_labels)
+            - np.bincount(day * n_labels + old_columns.label_codes[rows], minlength=n_days * n_labels)
+        ).reshape(n_days, n_labels)
+
+        dim_sums = self.dim_sums.copy()
+        dim_counts = self.dim_counts.copy()
+        for j, dim in enumerate(self.dim_names):
+            for columns, sign in ((old_columns, -1), (new_columns, 1)):
+                hit = columns.dim_mask[rows, j]
+                values = columns.dimension_scores(dim)[rows[hit]].astype(np.float64)
+                dim_sums[:, j] += sign * np.bincount(day[hit], weights=values, minlength=n_days)
+                dim_counts[:, j] += sign * np.bincount(day[hit], minlength=n_days)
+        return TimeIndex(self.days, self.counts, score_sums, label_counts, self.dim_names, dim_sums, dim_counts,
+                         self.rows, self.row_day)
+
+    def rollup(self, freq='M'):
+        # 汇总到 日('D') / 周('W') / 月('M')，补齐区间内没有评论的时段（均值为 NaN）
+        # 返回以时段字符串为索引的 DataFrame：评论数、平均得分、各标签占比、各维度平均得分（未涉及按 5.0 计）
+        periods = pd.DatetimeIndex(self.days).to_period(freq)
+        all_periods = pd.period_range(start=periods.min(), end=periods.max(), freq=freq)
+        codes = all_periods.get_indexer(periods)
+        n = len(all_periods)
+
+        counts = np.bincount(codes, weights=self.counts, minlength=n)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            trend = {'评论数': counts.astype(np.int64),
+                     '平均得分': np.bincount(codes, weights=self.score_sums, minlength=n) / counts}
+            for k, label in enumerate(SENTIMENT_LABELS):
+                trend[f'{label}占比'] = np.bincount(codes, weights=self.label_counts[:, k], minlength=n) / counts
+            for j, dim in enumerate(self.dim_names):
+                dim_sum = np.bincount(codes, weights=self.dim_sums[:, j], minlength=n)
+                dim_count = np.bincount(codes, weights=self.dim_counts[:, j], minlength=n)
+                trend[dim] = (dim_sum + DIM_DEFAULT * (counts - dim_count)) / counts
+        return pd.DataFrame(trend, index=all_periods.astype(str))
@@ -0,0 +1,135 @@
+import numpy as np
+
+from sentiment_engine import is_missing
+from vector_kernel import segment_review, pack_tokens
+
+# ==========================================
+# 分词结果存储：评分时的分词结果按不重复文本保存为扁平的整数 id 数组 + 偏移量，词串全局驻留一份
+# 词云、关键词下钻、n-gram 等视图直接基于它统计词频，不再对整列文本重新分词
+# 存的是评分内核实际看到的词序列（含空白词），按行统计时以每条文本出现的行数加权
+# 另可按需构建倒排索引（词 -> 含该词的不重复文本），供关键词下钻和词典修改后的增量重评分使用
+# ==========================================
+
+class TokenStore:
+    def __init__(self):
+        self.words = []           # id -> 词
+        self.word_ids = {}        # 词 -> id
+        self.parts = []           # 定型前暂存的 (文本键列表, 全局词 id, 每条词数)
+        self.ids = None
+        self.offsets = None
+        self.row_index = None     # 每行 -> 不重复文本下标
+        self.index = None         # 倒排索引 (每个词的起始偏移, 不重复文本下标)，首次使用时构建
+        self.first_rows = None    # 每条不重复文本首次出现的行
+
+    def intern_many(self, words):
+        word_ids = self.word_ids
+        for word in words:
+            if word not in word_ids:
+                word_ids[word] = len(self.words)
+                self.words.append(word)
+        return np.fromiter((word_ids[word] for word in words), dtype=np.int32, count=len(words))
+
+    def collect(self, texts, token_parts):
+        # 接收 score_unique_vectorized(token_sink=...) 产出的分块结果；下标相对于传入评分的 texts
+        for positions, words, local_ids, lengths in token_parts:
+            self.parts.append((
+                [texts[p] for p in positions], self.intern_many(words)[local_ids], np.asarray(lengths, dtype=np.int64)
+            ))
+
+    def finalize(self, unique_texts, inverse):
+        # 按不重复文本顺序排成 CSR；评分时没有分词的文本（缓存命中 / 参考内核 / 沿用近似重复代表得分）在这里补分词，每条只分一次
+        index = {key: k for k, key in enumerate(unique_texts)}
+        n_unique = len(unique_texts)
+        seen = np.zeros(n_unique, dtype=bool)
+        for keys, _, _ in self.parts:
+            seen[[index[key] for key in keys]] = True
+
+        pending = [k for k in np.flatnonzero(~seen)
+                   if not is_missing(unique_texts[k]) and len(str(unique_texts[k]).strip()) > 0]
+        if pending:
+            words, local_ids, offsets = pack_tokens([segment_review(str(unique_texts[k]).lower()) for k in pending])
+            self.collect(unique_texts, [(pending, words, local_ids, np.diff(offsets))])
+
+        positions = np.fromiter((index[key] for keys, _, _ in self.parts for key in keys), dtype=np.int64)
+        ids = np.concatenate([part[1] for part in self.parts]) if self.parts else np.zeros(0, dtype=np.int32)
+        src_lengths = np.concatenate([part[2] for part in self.parts]) if self.parts else np.zeros(0, dtype=np.int64)
+
+        # 各分块按文本下标重排成一个扁平数组（未出现的文本长度为 0）
+        lengths = np.zeros(n_unique, dtype=np.int64)
+        lengths[positions] = src_lengths
+        self.offsets = np.concatenate([[0], np.cumsum(lengths)])
+        src_starts = np.cumsum(src_lengths) - src_lengths
+        order = np.argsort(positions, kind='stable')
+        gather = np.repeat(src_starts[order] - self.offsets[positions[order]], src_lengths[order]) + np.arange(len(ids))
+        self.ids = ids[gather].astype(np.int32)
+        self.row_index = np.asarray(inverse, dtype=np.int64)
+        self.parts = []
+        return self
+
+    def __len__(self):
+        return len(self.row_index) if self.row_index is not None else 0
+
+    @property
+    def n_unique(self):
+        return len(self.offsets) - 1
+
+    @property
+    def nbytes(self):
+        return self.ids.nbytes + self.offsets.nbytes + self.row_index.nbytes
+
+    def unique_tokens(self, k):
+        return [self.words[i] for i in self.ids[self.offsets[k]:self.offsets[k + 1]]]
+
+    def row_tokens(self, i):
+        return self.unique_tokens(self.row_index[i])
+
+    def row_multiplicity(self, rows=None):
+        # 每条不重复文本在（选中的）行中出现的次数，统计词频时作为权重
+        row_index = self.row_index if rows is None else self.row_index[rows]
+        return np.bincount(row_index, minlength=self.n_unique)
+
+    def term_frequencies(self, rows=None):
+        # 按词 id 的词频数组（长度 = 词表大小）；rows 为行下标或布尔掩码时只统计这些行
+        weights = np.repeat(self.row_multiplicity(rows), np.diff(self.offsets))
+        return np.bincount(self.ids, weights=weights, minlength=len(self.words)).astype(np.int64)
+
+    def frequency_dict(self, keep=None, rows=None):
+        # {词: 次数}，可直接交给 WordCloud.generate_from_frequencies；keep(词) 为 False 的词被过滤
+        freq = self.term_frequencies(rows)
+        return {
+            self.words[i]: int(freq[i]) for i in np.flatnonzero(freq)
+            if keep is None or keep(self.words[i])
+        }
+
+    def postings(self):
+        # 按词 id 稳定排序后，每个词的出现位置对应的文本下标天然升序，相邻去重即得倒排表
+        if self.index is None:
+            text_of_token = np.repeat(np.arange(self.n_unique, dtype=np.int32), np.diff(self.offsets))
+            order = np.argsort(self.ids, kind='stable')
+            sorted_ids = self.ids[order]
+            sorted_texts = text_of_token[order]
+            keep = np.ones(len(order), dtype=bool)
+            keep[1:] = (sorted_ids[1:] != sorted_ids[:-1]) | (sorted_texts[1:] != sorted_texts[:-1])
+            counts = np.bincount(sorted_ids[keep], minlength=len(self.words))
+            self.index = (np.concatenate([[0], np.cumsum(counts)]), sorted_texts[keep])
+        return self.index
+
+    def texts_containing(self, words):
+        # 含任一给定词的不重复文本下标（升序）；分词结果中没有出现过的词忽略
+        word_ids = [self.word_ids[word] for word in words if word in self.word_ids]
+        if not word_ids:
+            return np.zeros(0, dtype=np.int64)
+        starts, texts = self.postings()
+        return np.unique(np.concatenate([texts[starts[i]:starts[i + 1]] for i in word_ids])).astype(np.int64)
+
+    def text_first_rows(self):
+        # 每条不重复文本首次出现的行号，用于取回文本本身
+        if self.first_rows is None:
+            self.first_rows = np.unique(self.row_index, return_index=True)[1]
+        return self.first_rows
+
+    def rows_containing(self, word):
+        # 含某个词的行的布尔掩码
+        hit = np.zeros(self.n_unique, dtype=bool)
+        hit[self.texts_containing([word])] = True
+        return hit[self.row_index]
@@ -0,0 +1,274 @@
+import re
+import sys
+import argparse
+
+import numpy as np
+
+from sentiment_engine import (
+    STOP_WORDS,
+    SENTIMENT_LABELS,
+    load_jieba,
+    is_missing,
+    stable_jitter,
+    compile_sentiment_dict,
+    calculate_sentiment_score
+)
+from perf_metrics import current_recorder
+
+# ==========================================
+# 向量化评分内核：分词后把词映射为整数 id，一批评论打包成扁平 id 数组 + 偏移量，
+# 情感值 / 程度副词 / 否定词 / 维度归属都用 NumPy 查表和错位数组完成，逐条求均值用分段归约
+# 与 calculate_sentiment_score 逐位一致（可用 python vector_kernel.py 做一致性校验）
+# ==========================================
+
+KERNEL_BLOCK_REVIEWS = 20000
+NON_TEXT_PATTERN = re.compile(r'[^\u4e00-\u9fa5a-zA-Z0-9]')
+
+def segment_review(text):
+    # 评分用的分词：text 须已转小写
+    return load_jieba().lcut(NON_TEXT_PATTERN.sub(' ', text))
+
+class TokenTable:
+    # 词 -> id 以及按 id 查的各项取值；id 0 为词典外的词（不计分、不是否定词 / 程度副词 / 维度词）
+    def __init__(self, lexicon):
+        self.dimension_names = lexicon.dimension_names
+        words = list(dict.fromkeys([*lexicon.word_scores, *lexicon.word_dimensions,
+                                    *lexicon.negations, *lexicon.degrees]))
+        self.vocab = {word: i for i, word in enumerate(words, start=1)}
+        size = len(words) + 1
+
+        self.score = np.zeros(size)
+        self.eligible = np.zeros(size, dtype=bool)
+        self.degree = np.ones(size)
+        self.negation = np.ones(size)
+        self.first_dim = np.full(size, -1, dtype=np.int64)
+        self.dim_member = np.zeros((size, len(self.dimension_names)), dtype=bool)
+        dim_index = {dim: j for j, dim in enumerate(self.dimension_names)}
+
+        for word, i in self.vocab.items():
+            self.score[i] = lexicon.word_scores.get(word, 0.0)
+            self.eligible[i] = word not in STOP_WORDS and len(word) >= 2
+            self.degree[i] = lexicon.degrees.get(word, 1.0)
+            self.negation[i] = lexicon.negations.get(word, 1.0)
+            dims = lexicon.word_dimensions.get(word, ())
+            if dims:
+                self.first_dim[i] = dim_index[dims[0]]
+                self.dim_member[i, [dim_index[dim] for dim in dims]] = True
+
+    @classmethod
+    def from_arrays(cls, dimension_names, words, arrays):
+        # 由词典编译产物中的数组构建（数组可以是只读 mmap 映射，直接引用、不复制）；words[i - 1] 为 id i 的词
+        table = cls.__new__(cls)
+        table.dimension_names = tuple(dimension_names)
+        table.vocab = {word: i for i, word in enumerate(words, start=1)}
+        for name in TOKEN_TABLE_ARRAYS:
+            setattr(table, name, arrays[name])
+        return table
+
+TOKEN_TABLE_ARRAYS = ('score', 'eligible', 'degree', 'negation', 'first_dim', 'dim_member')
+_TOKEN_TABLES = {}
+
+def register_token_table(fingerprint, table):
+    # 登记预先构建好的查表（如来自词典编译产物），之后 get_token_table 对该词典直接返回它
+    return _TOKEN_TABLES.setdefault(fingerprint, table)
+
+def get_token_table(lexicon):
+    # 按词典指纹缓存，同一词典只构建一次
+    table = _TOKEN_TABLES.get(lexicon.fingerprint)
+    if table is None:
+        table = _TOKEN_TABLES[lexicon.fingerprint] = TokenTable(lexicon)
+    return table
+
+def sequential_segment_sum(keys, values, n_keys):
+    # 按 key 分组求和，组内严格按原顺序从左到右累加（与逐词 += 的浮点结果逐位一致）
+    # np.add.reduceat 对浮点是成对求和，末位可能不同，因此这里按"组内第 k 个"分轮累加：
+    # 每一轮对所有组各加一个值，轮数 = 最大组长
+    sums = np.zeros(n_keys)
+    if not len(keys):
+        return sums
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    counts = np.bincount(sorted_keys, minlength=n_keys)
+    starts = np.cumsum(counts) - counts
+    rank = np.arange(len(sorted_keys)) - starts[sorted_keys]
+    by_rank = np.argsort(rank, kind='stable')
+    rank_bounds = np.concatenate([[0], np.cumsum(np.bincount(rank))])
+    for k in range(len(rank_bounds) - 1):
+        take = order[by_rank[rank_bounds[k]:rank_bounds[k + 1]]]
+        sums[keys[take]] += values[take]
+    return sums
+
+def pack_tokens(token_lists):
+    # 一批分词结果打包为 (本批词表, 扁平的本批词 id 数组, 每条评论的起始偏移)
+    lengths = np.fromiter((len(tokens) for tokens in token_lists), dtype=np.int64, count=len(token_lists))
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    local = {}
+    intern = local.setdefault
+    ids = np.fromiter((intern(token, len(local)) for tokens in token_lists for token in tokens),
+                      dtype=np.int32, count=int(offsets[-1]))
+    return list(local), ids, offsets
+
+def lexicon_ids(words, local_ids, vocab):
+    # 本批词 id -> 词典 id：只需对本批不同的词各查一次表
+    return np.array([vocab.get(word, 0) for word in words], dtype=np.int64)[local_ids]
+
+def score_token_ids(ids, offsets, table):
+    # 对打包好的一批评论计算 (情感词得分和, 情感词数, 维度得分和, 维度词数)
+    # 每条评论至少含一个词；相邻评论之间的错位由词在评论内的位置 pos 屏蔽
+    n_reviews = len(offsets) - 1
+    n_dims = len(table.dimension_names)
+    lengths = np.diff(offsets)
+    review = np.repeat(np.arange(n_reviews), lengths)
+    pos = np.arange(len(ids)) - offsets[:-1][review]
+    is_last = pos == lengths[review] - 1
+
+    prev_ids = np.roll(ids, 1)
+    prev2_ids = np.roll(ids, 2)
+    next_ids = np.roll(ids, -1)
+
+    base = table.score[ids]
+    active = table.eligible[ids] & (base != 0.0)
+
+    # 前一个词为程度副词时乘其权重；前两个词中的否定词权重连乘（先 i-2 后 i-1）
+    degree = np.where(pos >= 1, table.degree[prev_ids], 1.0)
+    negation = np.where(pos >= 2, table.negation[prev2_ids], 1.0) * np.where(pos >= 1, table.negation[prev_ids], 1.0)
+    current = base * degree * negation
+
+    # 归属维度：窗口 [i-1, i+1] 内第一个维度词的首个维度
+    dim_prev = np.where(pos >= 1, table.first_dim[prev_ids], -1)
+    dim_next = np.where(~is_last, table.first_dim[next_ids], -1)
+    related = np.where(dim_prev >= 0, dim_prev, np.where(table.first_dim[ids] >= 0, table.first_dim[ids], dim_next))
+
+    word_count = np.add.reduceat(active.astype(np.int64), offsets[:-1])
+    total = sequential_segment_sum(review[active], current[active], n_reviews)
+
+    # 维度：情感词计入归属维度的得分和词数；非情感的维度词只计入其所有维度的词数
+    attributed = active & (related >= 0)
+    dim_keys = review[attributed] * n_dims + related[attributed]
+    dim_sums = sequential_segment_sum(dim_keys, current[attributed], n_reviews * n_dims).reshape(n_reviews, n_dims)
+    dim_counts = np.bincount(dim_keys, minlength=n_reviews * n_dims).reshape(n_reviews, n_dims)
+    bare = table.eligible[ids] & (base == 0.0)
+    dim_counts += np.add.reduceat((table.dim_member[ids] & bare[:, None]).astype(np.int64), offsets[:-1], axis=0)
+    return total, word_count, dim_sums, dim_counts
+
+def block_scores(ids, offsets, table):
+    # 一批评论的 (最终得分（未加抖动、未取整）, 维度均值, 维度词数)
+    total, word_count, dim_sums, dim_counts = score_token_ids(ids, offsets, table)
+    final = np.clip(np.where(word_count > 0, total / np.maximum(word_count, 1), 5.0), 1.0, 10.0)
+    dim_means = np.clip(dim_sums / np.maximum(dim_counts, 1), 1.0, 10.0)
+    return final, dim_means, dim_counts
+
+def assign_block_scores(targets, final, dim_means, dim_counts, dim_names, unique_scores, unique_dims, unique_analysis):
+    # targets 与 final 逐行对应的 (结果下标, 文本)，下标为 None 的行跳过；中性区间加确定性抖动，得分与命中维度保留两位小数
+    for row, (k, text) in enumerate(targets):
+        if k is None:
+            continue
+        score = float(final[row])
+        if 4.5 <= score <= 5.5:
+            score += stable_jitter(text.strip())
+        unique_scores[k] = round(score, 2)
+        analysis = unique_analysis[k]
+        for j in np.flatnonzero(dim_counts[row]):
+            analysis[dim_names[j]] = unique_dims[k, j] = round(float(dim_means[row, j]), 2)
+
+def label_scores(scores):
+    codes = np.select([scores >= 9.0, scores >= 7.5, scores >= 6.0, scores >= 4.5], [0, 1, 2, 3], 4)
+    return np.array(SENTIMENT_LABELS, dtype=object)[codes]
+
+def score_unique_vectorized(unique_texts, sentiment_dict, progress=None, block_reviews=KERNEL_BLOCK_REVIEWS,
+                            token_sink=None):
+    # 与 score_unique_texts 返回结构相同：(得分数组, 标签数组, 维度得分矩阵, 维度字典列表)
+    # token_sink 为列表时，每块追加 (评论在 unique_texts 中的下标, 本批词表, 本批词 id, 每条词数)，
+    # 供 token_store.TokenStore 收集；此时命中明确模式的评论也会分词
+    lexicon = compile_sentiment_dict(sentiment_dict)
+    table = get_token_table(lexicon)
+    dim_names = lexicon.dimension_names
+    # 明确模式按词典顺序取第一个出现的（与自动机命中后取最高优先级等价），只需几次 C 层子串查找
+    explicit = [(pattern.lower(), score) for pattern, score in lexicon['explicit'].items() if pattern]
+    n_unique = len(unique_texts)
+    unique_scores = np.full(n_unique, 5.0)
+    unique_dims = np.full((n_unique, len(dim_names)), 5.0)
+    unique_analysis = [{} for _ in range(n_unique)]
+    perf = current_recorder()
+
+    for block_start in range(0, n_unique, block_reviews):
+        block_end = min(block_start + block_reviews, n_unique)
+        block_texts = []
+        token_lists = []
+        with perf.stage('score.tokenize', texts=block_end - block_start):
+            for k in range(block_start, block_end):
+                text = unique_texts[k]
+                if is_missing(text) or len(str(text).strip()) == 0:
+                    continue
+                text = str(text).lower()
+                explicit_score = next((score for pattern, score in explicit if pattern in text), None)
+                if explicit_score is not None:
+                    unique_scores[k] = explicit_score
+                    if token_sink is None:
+                        continue
+                tokens = segment_review(text)
+                if tokens:
+                    block_texts.append((k, text, explicit_score is not None))
+                    token_lists.append(tokens)
+
+        if token_lists:
+            with perf.stage('score.lookup') as timer:
+                words, local_ids, offsets = pack_tokens(token_lists)
+                ids = lexicon_ids(words, local_ids, table.vocab)
+                timer.add(tokens=len(ids))
+
+            with perf.stage('score.kernel', texts=len(token_lists)):
+                final, dim_means, dim_counts = block_scores(ids, offsets, table)
+
+                if token_sink is not None:
+                    token_sink.append((
+                        np.array([k for k, _, _ in block_texts], dtype=np.int64), words, local_ids, np.diff(offsets)
+                    ))
+
+                # 命中明确模式的评论（只为收集分词而分词）不覆盖已有得分
+                targets = [(None if explicit_hit else k, text) for k, text, explicit_hit in block_texts]
+                assign_block_scores(targets, final, dim_means, dim_counts, dim_names,
+                                    unique_scores, unique_dims, unique_analysis)
+
+        if progress is not None:
+            progress(block_end / n_unique)
+
+    return unique_scores, label_scores(unique_scores), unique_dims, unique_analysis
+
+def check_conformance(texts, sentiment_dict):
+    # 与参考实现逐条比对，返回不一致的 [(文本, 参考结果, 内核结果), ...]
+    lexicon = compile_sentiment_dict(sentiment_dict)
+    scores, _, _, analysis = score_unique_vectorized(texts, lexicon)
+    mismatches = []
+    for k, text in enumerate(texts):
+        expected = calculate_sentiment_score(text, lexicon)
+        if (float(scores[k]), analysis[k]) != expected:
+            mismatches.append((text, expected, (float(scores[k]), analysis[k])))
+    return mismatches
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="向量化评分内核一致性校验")
+    parser.add_argument('inputs', nargs='*', help="CSV 文件（省略时使用合成评论语料）")
+    parser.add_argument('-c', '--column', help="评论内容列名（默认自动识别）")
+    parser.add_argument('--synthetic', type=int, default=20000, help="合成语料条数")
+    args = parser.parse_args(argv)
+
+    from sentiment_engine import load_integrated_sentiment_dict
+    sentiment_dict = load_integrated_sentiment_dict()
+    if args.inputs:
+        from sentiment_cli import iter_records, resolve_content_field
+        texts = []
+        for record in iter_records(args.inputs, None):
+            texts.append(record.get(resolve_content_field(record, args.column)))
+    else:
+        from loadgen import sample_reviews
+        texts = sample_reviews(args.synthetic)
+
+    mismatches = check_conformance(texts, sentiment_dict)
+    for text, expected, actual in mismatches[:20]:
+        print(f"❌ {text!r}: 参考 {expected} / 内核 {actual}")
+    print(f"{'✅' if not mismatches else '❌'} 一致性校验：{len(texts) - len(mismatches)}/{len(texts)} 条一致")
+    return 1 if mismatches else 0
+
+if __name__ == '__main__':
+    sys.exit(main())